@@ -1,4 +1,7 @@
 import pandas as pd
+from gazetteer import resolve
+
+CODE_COLUMNS = ['FIPS', 'ISO2', 'ISO3']
 
 def add_country_codes():
     # Charger le CSV
@@ -12,30 +15,14 @@ def add_country_codes():
         "République tchèque": "Tchéquie"
     }
     
-    # Dictionnaire des codes pays
-    country_codes = {
-        "Tchéquie": {"FIPS": "EZ", "ISO2": "CZ", "ISO3": "CZE"},
-        "Kosovo": {"FIPS": "KV", "ISO2": "XK", "ISO3": "XKX"},
-        "Irlande du Nord": {"FIPS": "UK", "ISO2": "GB-NIR", "ISO3": "GBR"},
-        "Écosse": {"FIPS": "UK", "ISO2": "GB-SCT", "ISO3": "GBR"},
-        "Turquie": {"FIPS": "TU", "ISO2": "TR", "ISO3": "TUR"}
-    }
-    
     # Simplifier d'abord les noms
     df['NAME'] = df['NAME'].replace(name_mapping)
     
-    # Créer une fonction pour appliquer les codes
-    def apply_codes(row):
-        if pd.isnull(row['FIPS']) or pd.isnull(row['ISO2']) or pd.isnull(row['ISO3']):
-            if row['NAME'] in country_codes:
-                codes = country_codes[row['NAME']]
-                row['FIPS'] = codes['FIPS']
-                row['ISO2'] = codes['ISO2']
-                row['ISO3'] = codes['ISO3']
-        return row
-    
-    # Appliquer les codes pays
-    df = df.apply(apply_codes, axis=1)
+    # Codes de la table d'alias partagée (gazetteer.py), résolus en une fois
+    # pour toute la colonne, appliqués aux lignes auxquelles il en manque
+    codes = resolve(df['NAME'], CODE_COLUMNS)
+    missing = df[CODE_COLUMNS].isna().any(axis=1) & codes['ISO3'].notna()
+    df.loc[missing, CODE_COLUMNS] = codes.loc[missing, CODE_COLUMNS]
     
     # Sauvegarder le fichier mis à jour
     output_file = 'merged_crimes_per_hundred_thousand_french_updated.csv'
@@ -44,8 +31,9 @@ def add_country_codes():
     # Afficher les statistiques
     print(f"Mise à jour terminée. Fichier sauvegardé : {output_file}")
     print("\nStatistiques :")
-    for country in country_codes.keys():
-        count = len(df[df['NAME'] == country])
+    if not missing.any():
+        print("Aucune entrée sans code à mettre à jour")
+    for country, count in df.loc[missing, 'NAME'].value_counts().sort_index().items():
         print(f"{country}: {count} entrées trouvées et mises à jour")
     
     # Afficher les noms uniques restants pour vérification
@@ -1,28 +1,36 @@
+import os
+import sys
 import pandas as pd
 
-def replace_coordinates(file_path, output_path):
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gazetteer import coordinate_overrides
+
+def replace_coordinates(file_path, output_path, name_column='Country'):
     """
-    Replace specific coordinates in a CSV file.
+    Replace the coordinates corrected in the gazetteer in a CSV file.
+    
+    Only the rows of the countries of gazetteer.COORDINATE_OVERRIDES (e.g.
+    Croatia on Zagreb) get new lat and lon values, the other coordinates are
+    left as they are.
     
     Args:
         file_path (str): Path to the input CSV file
         output_path (str): Path where the modified CSV will be saved
+        name_column (str): Column holding the country names
     """
     try:
         # Read the CSV file
         df = pd.read_csv(file_path)
         
-        # Replace the specific coordinates
-        # First, convert to string to ensure exact matching
-        df = df.astype(str)
-        
-        # Replace the coordinates wherever they appear in the dataframe
-        df = df.replace('45.0511621486', '45.815399')
-        df = df.replace('16.4117801486', '15.966568')
+        # Corrected coordinates, one lookup for the whole column
+        coordinates = coordinate_overrides(df[name_column])
+        corrected = coordinates['lat'].notna()
+        changed = corrected & ((df['lat'] != coordinates['lat']) | (df['lon'] != coordinates['lon']))
+        df.loc[corrected, ['lat', 'lon']] = coordinates.loc[corrected, ['lat', 'lon']]
         
         # Save the modified dataframe to a new CSV file
         df.to_csv(output_path, index=False)
-        print(f"Coordinates successfully replaced and saved to {output_path}")
+        print(f"Coordinates successfully replaced and saved to {output_path} ({int(changed.sum())} rows changed)")
         
     except FileNotFoundError:
         print(f"Error: The file {file_path} was not found.")
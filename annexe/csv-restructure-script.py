@@ -1,7 +1,11 @@
 import os
+import sys
 import pandas as pd
 import glob
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from file_pool import run_file_tasks, default_workers
+
 def restructure_excel(input_file, output_file):
     try:
         print(f"Reading file: {input_file}")
@@ -25,10 +29,22 @@ def restructure_excel(input_file, output_file):
         print(f"Saving to: {output_file}")
         df_melted.to_csv(output_file, index=False)
         print(f"Successfully processed {input_file}")
+        return True
     except Exception as e:
         print(f"Error processing {input_file}: {str(e)}")
+        return False
+
+def restructure_task(task):
+    """restructure_excel of one (input_file, output_file) pair, for run_file_tasks"""
+    return restructure_excel(*task)
 
-def process_directory(input_dir, output_dir):
+def process_directory(input_dir, output_dir, workers=1):
+    """
+    Restructure every workbook of input_dir, on workers processes
+
+    Returns:
+        list: Workbooks that could not be restructured
+    """
     print(f"Input directory: {input_dir}")
     print(f"Output directory: {output_dir}")
     
@@ -40,17 +56,23 @@ def process_directory(input_dir, output_dir):
         print(f"Creating output directory: {output_dir}")
         os.makedirs(output_dir)
     
-    excel_files = glob.glob(os.path.join(input_dir, '*.xlsx'))
+    excel_files = sorted(glob.glob(os.path.join(input_dir, '*.xlsx')))
     print(f"Found {len(excel_files)} Excel files in the input directory.")
     
     if len(excel_files) == 0:
         print("No Excel files found in the input directory.")
-        return
+        return []
     
+    tasks = []
     for excel_file in excel_files:
         file_name = os.path.basename(excel_file)
         output_file = os.path.join(output_dir, f'restructured_{os.path.splitext(file_name)[0]}.csv')
-        restructure_excel(excel_file, output_file)
+        tasks.append((excel_file, output_file))
+    failed = [excel_file for (excel_file, _), result, error in run_file_tasks(restructure_task, tasks, workers)
+              if error is not None or not result]
+    if failed:
+        print(f"{len(failed)} files could not be restructured: {failed}")
+    return failed
 
 # Usage
 input_directory = 'per_sheets'
@@ -58,5 +80,7 @@ output_directory = 'output_clean_QGIS'
 
 if __name__ == "__main__":
     print("Starting Excel restructuring process...")
-    process_directory(input_directory, output_directory)
+    # Number of processes as first argument (one per CPU by default)
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else default_workers()
+    process_directory(input_directory, output_directory, workers)
     print("Process completed.")
\ No newline at end of file
@@ -1,43 +1,56 @@
 import os
+import sys
 from openpyxl import load_workbook
 
-def remove_excel_cells(directory='per_sheets'):
-    # Ensure the directory exists
-    if not os.path.isdir(directory):
-        print(f"The directory {directory} does not exist.")
-        return
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from file_pool import run_file_tasks, default_workers
 
-    # Get all .xlsx files in the directory
-    excel_files = [f for f in os.listdir(directory) if f.endswith('.xlsx')]
+def clear_excel_file(file_path):
+    """Clear A1:P8 of one workbook and shift the remaining cells up"""
+    # Load the workbook
+    wb = load_workbook(file_path)
+    sheet = wb.active
+
+    # Clear cells from A1 to P8
+    for row in range(1, 9):  # 1 to 8
+        for col in range(1, 17):  # A to P
+            sheet.cell(row=row, column=col).value = None
 
-    for file in excel_files:
-        file_path = os.path.join(directory, file)
-        
-        try:
-            # Load the workbook
-            wb = load_workbook(file_path)
-            sheet = wb.active
+    # Shift cells up
+    for col in range(1, sheet.max_column + 1):
+        column_cells = [cell.value for cell in sheet[chr(64 + col)][8:]]
+        for row, value in enumerate(column_cells, start=1):
+            sheet.cell(row=row, column=col).value = value
 
-            # Clear cells from A1 to P8
-            for row in range(1, 9):  # 1 to 8
-                for col in range(1, 17):  # A to P
-                    sheet.cell(row=row, column=col).value = None
+    # Delete the now-empty rows at the bottom
+    sheet.delete_rows(sheet.max_row - 7, 8)
 
-            # Shift cells up
-            for col in range(1, sheet.max_column + 1):
-                column_cells = [cell.value for cell in sheet[chr(64 + col)][8:]]
-                for row, value in enumerate(column_cells, start=1):
-                    sheet.cell(row=row, column=col).value = value
+    # Save the changes
+    wb.save(file_path)
+    print(f"Removed cells A1:P8 in '{os.path.basename(file_path)}' and shifted remaining cells up")
 
-            # Delete the now-empty rows at the bottom
-            sheet.delete_rows(sheet.max_row - 7, 8)
+def remove_excel_cells(directory='per_sheets', workers=1):
+    """
+    Clear the header of every workbook of directory, on workers processes
 
-            # Save the changes
-            wb.save(file_path)
-            print(f"Removed cells A1:P8 in '{file}' and shifted remaining cells up")
+    Returns:
+        list: Workbooks that could not be processed
+    """
+    # Ensure the directory exists
+    if not os.path.isdir(directory):
+        print(f"The directory {directory} does not exist.")
+        return []
+
+    # Get all .xlsx files in the directory
+    excel_files = sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.xlsx'))
 
-        except Exception as e:
-            print(f"Error processing '{file}': {str(e)}")
+    failed = []
+    for file_path, _, error in run_file_tasks(clear_excel_file, excel_files, workers):
+        if error is not None:
+            print(f"Error processing '{os.path.basename(file_path)}': {error}")
+            failed.append(file_path)
+    return failed
 
 if __name__ == "__main__":
-    remove_excel_cells()
\ No newline at end of file
+    # Number of processes as first argument (one per CPU by default)
+    remove_excel_cells(workers=int(sys.argv[1]) if len(sys.argv) > 1 else default_workers())
\ No newline at end of file
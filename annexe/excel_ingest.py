@@ -0,0 +1,126 @@
+import os
+import sys
+import pandas as pd
+from openpyxl import load_workbook
+
+# Eurostat extraction of crim_off_cat, one sheet per crime type and unit
+SOURCE_WORKBOOK = os.path.join('per_sheets', 'crim_off_cat_spreadsheet.xlsx')
+
+# Header cells of a data sheet (the ones file_name.py used to rename the
+# per-sheet workbooks): time frequency, crime type (ICCS) and unit
+FREQUENCY_CELL = 'C5'
+CRIME_TYPE_CELL = 'C6'
+DATA_TYPE_CELL = 'C7'
+# First cell of the row holding the years, the next row holds 'GEO (Labels)'
+TIME_LABEL = 'TIME'
+
+LONG_COLUMNS = ['Country', 'Year', 'Value', 'Crime Type', 'Data Type']
+
+
+def _cell_position(cell):
+    """'C6' -> (row 6, column index 2)"""
+    column = ''.join(ch for ch in cell if ch.isalpha())
+    row = int(cell[len(column):])
+    index = 0
+    for ch in column.upper():
+        index = index * 26 + ord(ch) - ord('A') + 1
+    return row, index - 1
+
+
+def iter_sheet_rows(sheet, frequency=None):
+    """
+    Stream the long rows of one data sheet in a single pass
+
+    The header cells are read as the rows go by, the year row starts the
+    table and the first row without a country (before the 'Special value'
+    notes) ends it. Values are kept as in the sheet, ':' included, like the
+    CSV files of csv-restructure-script.py. Nothing is yielded for sheets
+    without the header cells or of another time frequency than frequency.
+
+    Yields:
+        tuple: (Country, Year, Value, Crime Type, Data Type)
+    """
+    header_cells = {name: _cell_position(cell) for name, cell in
+                    [('frequency', FREQUENCY_CELL), ('crime', CRIME_TYPE_CELL), ('unit', DATA_TYPE_CELL)]}
+    header = {}
+    years = None
+    for row_number, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+        if years is None:
+            for name, (header_row, column) in header_cells.items():
+                if row_number == header_row and column < len(row) and row[column] is not None:
+                    header[name] = str(row[column]).strip()
+            if row and row[0] == TIME_LABEL:
+                # Flag columns have no year in their header, they are skipped
+                years = [(column, int(year)) for column, year in enumerate(row[1:], start=1)
+                         if year is not None and str(year).strip().isdigit()]
+                if 'crime' not in header or 'unit' not in header:
+                    return
+                if frequency is not None and header.get('frequency') != frequency:
+                    return
+            continue
+        country = row[0] if row else None
+        if country is None:
+            # Blank row after the countries: the notes follow
+            break
+        if country == 'GEO (Labels)':
+            continue
+        for column, year in years:
+            value = row[column] if column < len(row) else None
+            if value is not None:
+                yield country, year, value, header['crime'], header['unit']
+
+
+def iter_workbook_tables(path=SOURCE_WORKBOOK, frequency='Annual'):
+    """
+    Yield the long table of each data sheet, one sheet in memory at a time
+
+    Sheets without the data header (Summary, Structure) or of another time
+    frequency are skipped.
+
+    Yields:
+        DataFrame with the LONG_COLUMNS of one crime type and data type
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in wb.worksheets:
+            sheet_rows = list(iter_sheet_rows(sheet, frequency))
+            if not sheet_rows:
+                continue
+            print(f"{sheet.title}: {len(sheet_rows)} rows ({sheet_rows[0][3]}, {sheet_rows[0][4]})")
+            yield pd.DataFrame(sheet_rows, columns=LONG_COLUMNS)
+    finally:
+        wb.close()
+
+
+def ingest_workbook(path=SOURCE_WORKBOOK, frequency='Annual'):
+    """
+    Read the Eurostat workbook once, in read-only mode, into the long table
+
+    Replaces main.py, file_name.py, excel-cell-clearer.py,
+    excel-a1-a2-clearer.py, csv-restructure-script.py and
+    batch-excel-processor.py, which wrote and rewrote one workbook and one
+    CSV per sheet.
+
+    Args:
+        path: Workbook exported from Eurostat
+        frequency: Time frequency of the sheets to keep (None for all)
+
+    Returns:
+        DataFrame with Country, Year, Value, Crime Type and Data Type columns
+    """
+    tables = list(iter_workbook_tables(path, frequency))
+    if not tables:
+        return pd.DataFrame(columns=LONG_COLUMNS)
+    return pd.concat(tables, ignore_index=True)
+
+
+if __name__ == "__main__":
+    # Usage: python excel_ingest.py [workbook] [output.csv]
+    input_file = sys.argv[1] if len(sys.argv) > 1 else SOURCE_WORKBOOK
+    output_file = sys.argv[2] if len(sys.argv) > 2 else 'crimes_long.csv'
+    if not os.path.exists(input_file):
+        print(f"The workbook {input_file} does not exist.")
+        sys.exit(1)
+    long_df = ingest_workbook(input_file)
+    long_df.to_csv(output_file, index=False)
+    print(f"{len(long_df)} rows written to {output_file}")
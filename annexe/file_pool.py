@@ -0,0 +1,47 @@
+import os
+import functools
+import multiprocessing
+
+
+def _call_isolated(func, task):
+    """Run func(task), returning the exception message instead of raising"""
+    try:
+        return func(task), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {str(e)}"
+
+
+def run_file_tasks(func, tasks, workers=1):
+    """
+    Run a per-file stage sequentially or on a process pool.
+
+    An error in one file does not stop the others: it is returned with the
+    task instead of the result. Results come back in task order whatever
+    the completion order, so merging them is deterministic.
+
+    The fork start method is used when available. Otherwise (Windows) the
+    children import the main script again, which must then keep its work
+    under `if __name__ == "__main__":`.
+
+    Args:
+        func: Function of one task (must be defined at module level)
+        tasks: List of tasks, e.g. file paths
+        workers: Number of processes (1 runs in the current process)
+
+    Returns:
+        list: (task, result, error) per task, error None on success
+    """
+    tasks = list(tasks)
+    isolated = functools.partial(_call_isolated, func)
+    if workers <= 1 or len(tasks) <= 1:
+        outcomes = [isolated(task) for task in tasks]
+    else:
+        method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+        with multiprocessing.get_context(method).Pool(min(workers, len(tasks))) as pool:
+            outcomes = pool.map(isolated, tasks, chunksize=1)
+    return [(task, result, error) for task, (result, error) in zip(tasks, outcomes)]
+
+
+def default_workers():
+    """Worker count of the __main__ blocks: one per CPU"""
+    return os.cpu_count() or 1
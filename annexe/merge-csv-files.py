@@ -1,153 +1,258 @@
 import os
 import pandas as pd
 import glob
-import unicodedata
-import re
+import sys
 
-# Path to the folder containing CSV files
-input_folder = '/home/antec/Documents/data/crime_per_type/output_clean_QGIS'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from crime_dataset import DATASET_DIR
+from excel_ingest import ingest_workbook, iter_workbook_tables
+from file_pool import run_file_tasks, default_workers
+from gazetteer import resolve
+
+# --stream merges the files chunk by chunk with a fixed memory ceiling
+# instead of holding every table until the end (see stream_merge)
+stream = '--stream' in sys.argv
+args = [arg for arg in sys.argv[1:] if arg != '--stream']
+
+# Path to the folder containing CSV files (can be given as first argument).
+# The Eurostat workbook itself can be given instead, it is then read in one
+# pass by excel_ingest.py without writing the per-sheet files.
+input_folder = args[0] if len(args) > 0 else '/home/antec/Documents/data/crime_per_type/output_clean_QGIS'
+# Number of processes reading and enriching the CSV files (second argument)
+workers = int(args[1]) if len(args) > 1 else default_workers()
 
 # Output file names
 output_file_hundred_thousand = 'merged_crimes_per_hundred_thousand.csv'
 output_file_number = 'merged_crimes_number.csv'
 
-# Path to the europe.csv file
+# The columnar dataset read by the later stages (crime_dataset.DATASET_DIR)
+# holds the French labels of the merged_crimes_*_french.csv tables, it is
+# rebuilt from them by crime_dataset.py and never from the English tables
+# written here
+DATASET_NOTE = (f"The columnar dataset {DATASET_DIR} is not modified: rebuild it with "
+                "`python crime_dataset.py` once the French tables are updated.")
+
+# Path to the europe.csv file (entity table of gazetteer.py)
 europe_file = 'europe.csv'
 
-print(f"Input folder: {input_folder}")
-print(f"Input folder exists: {os.path.exists(input_folder)}")
-print(f"Europe file exists: {os.path.exists(europe_file)}")
-
-# Load the europe.csv file
-europe_df = pd.read_csv(europe_file)
-
-# Function to normalize string (remove diacritics and convert to lowercase)
-def normalize_string(s):
-    return ''.join(c for c in unicodedata.normalize('NFD', s)
-                   if unicodedata.category(c) != 'Mn').lower()
-
-# Function to extract lat and lon from the Coordinate column
-def extract_coordinates(coord_string):
-    lat_match = re.search(r'lat:\s*([-\d.]+)', coord_string)
-    lon_match = re.search(r'lon:\s*([-\d.]+)', coord_string)
-    lat = float(lat_match.group(1)) if lat_match else None
-    lon = float(lon_match.group(1)) if lon_match else None
-    return pd.Series({'lat': lat, 'lon': lon})
-
-# Extract lat and lon from the Coordinate column
-europe_df[['lat', 'lon']] = europe_df['Coordinate'].apply(extract_coordinates)
-
-# Create a dictionary for quick lookup of country data
-country_data = {normalize_string(row['NAME']): row.to_dict() 
-                for _, row in europe_df.iterrows()}
-
-# Add custom entry for England and Wales
-country_data['england and wales'] = {
-    'FIPS': 'UKEW',
-    'ISO2': 'XE',  # Custom code
-    'ISO3': 'XEW',  # Custom code
-    'UN': '826',  # Using UK's UN code
-    'NAME': 'England and Wales',
-    'lat': 52.3555,  # Approximate coordinates for England and Wales
-    'lon': -1.1743
-}
-
-# Add name variations
-name_variations = {
-    'czechia': 'czech republic',
-    'Turkey': 'Türkiye',
-    'The former Yugoslav Republic of Macedonia': 'North Macedonia',
-    # Add more variations here if needed
-}
-
-# Function to get country data
-def get_country_data(country):
-    normalized_country = normalize_string(country)
-    if normalized_country in name_variations:
-        normalized_country = name_variations[normalized_country]
-    return country_data.get(normalized_country, {})
-
-# Lists to store dataframes
-hundred_thousand_dataframes = []
-number_dataframes = []
-
-# Check if the folder exists
-if not os.path.exists(input_folder):
-    print(f"The folder {input_folder} does not exist.")
-    exit()
-
-# Get all CSV files in the folder
-csv_files = glob.glob(os.path.join(input_folder, '*.csv'))
-
-print(f"CSV files found: {csv_files}")
-
-if not csv_files:
-    print(f"No CSV files found in the folder {input_folder}")
-    exit()
-
-for file in csv_files:
-    try:
-        # Extract the crime type and data type from the filename
-        filename_parts = os.path.basename(file).split('_')
-        crime_type = ' '.join(filename_parts[2:-1])
-        data_type = filename_parts[-1].replace('.csv', '')
-        
-        # Read the CSV file
-        df = pd.read_csv(file)
-        
+# Columns added to every row from the country name
+COUNTRY_COLUMNS = ['FIPS', 'ISO2', 'ISO3', 'UN', 'NAME', 'lat', 'lon']
+# Columns of the merged files
+OUTPUT_COLUMNS = ['Country', 'FIPS', 'ISO2', 'ISO3', 'UN', 'NAME', 'lat', 'lon', 'Year', 'Value', 'Crime Type', 'Data Type']
+# A row missing one of these is reported at the end
+REQUIRED_COLUMNS = ['FIPS', 'ISO2', 'ISO3', 'UN', 'lat', 'lon']
+
+# Rows read, enriched and written at a time by the streaming merge
+STREAM_CHUNK_ROWS = 100000
+
+def source_types(file):
+    """Crime type and data type of a restructured CSV, taken from its name"""
+    filename_parts = os.path.basename(file).split('_')
+    return ' '.join(filename_parts[2:-1]), filename_parts[-1].replace('.csv', '')
+
+def read_csv_source(file):
+    """Table of one restructured CSV, crime type and data type taken from its name"""
+    df = pd.read_csv(file)
+    df['Crime Type'], df['Data Type'] = source_types(file)
+    return df
+
+def add_country_columns(df):
+    """Add the codes, English name and coordinates of each row's country"""
+    # One lookup for the whole column (see gazetteer.py), unknown names keep
+    # empty codes and their own name
+    countries = resolve(df['Country'], COUNTRY_COLUMNS, europe_file)
+    for column in COUNTRY_COLUMNS:
+        df[column] = countries[column]
+    df['NAME'] = df['NAME'].fillna(df['Country'])
+    return df
+
+def load_csv_source(file):
+    """Read and enrich one CSV file (run in the worker processes)"""
+    df = read_csv_source(file)
+    return add_country_columns(df) if not df.empty else df
+
+def output_file_for(data_type):
+    """Merged CSV file of a data type, None for the other data types"""
+    if 'hundred thousand' in data_type.lower():
+        return output_file_hundred_thousand
+    if 'number' in data_type.lower():
+        return output_file_number
+    return None
+
+def count_missing(df, missing_counts):
+    """Add the rows of df without complete codes or coordinates to missing_counts (Country -> rows)"""
+    incomplete = df[REQUIRED_COLUMNS].isna().any(axis=1)
+    for country, count in df.loc[incomplete, 'Country'].value_counts(sort=False).items():
+        missing_counts[country] = missing_counts.get(country, 0) + int(count)
+
+def report_missing(missing_counts):
+    """Print the countries with missing data"""
+    if missing_counts:
+        print("\nCountries with missing data:")
+        for country, count in missing_counts.items():
+            print(f"{country}: {count} rows")
+
+def iter_source_chunks(source, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Read the sources one after the other, in tables of at most chunk_rows rows
+
+    A file that cannot be read is reported and skipped, the chunks of it
+    already yielded stay in the output.
+
+    Yields:
+        tuple: (source name, chunk with Crime Type and Data Type columns)
+    """
+    if source.endswith('.xlsx'):
+        # The workbook is read sheet by sheet, a sheet holds one crime type and data type
+        for table in iter_workbook_tables(source):
+            name = f"{source} [{table['Crime Type'].iloc[0]}, {table['Data Type'].iloc[0]}]"
+            for start in range(0, len(table), chunk_rows):
+                yield name, table.iloc[start:start + chunk_rows].reset_index(drop=True)
+        return
+
+    csv_files = sorted(glob.glob(os.path.join(source, '*.csv')))
+    print(f"CSV files found: {csv_files}")
+    for file in csv_files:
+        crime_type, data_type = source_types(file)
+        try:
+            for chunk in pd.read_csv(file, chunksize=chunk_rows):
+                chunk['Crime Type'] = crime_type
+                chunk['Data Type'] = data_type
+                yield file, chunk.reset_index(drop=True)
+        except Exception as e:
+            print(f"Error processing file {file}: {type(e).__name__}: {str(e)}")
+
+def stream_merge(source, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Merge the per-crime tables chunk by chunk with a fixed memory ceiling
+
+    Each chunk is enriched, appended to its merged CSV file and counted in
+    the missing data report, then dropped: the memory used depends on
+    chunk_rows, not on the number of files or rows. The files are read one at a time (workers is not used) and the
+    merged files are the same as the ones of the in-memory merge.
+
+    Args:
+        source: Folder of restructured CSV files, or the Eurostat workbook
+        chunk_rows: Rows held in memory at a time
+
+    Returns:
+        tuple: (dict output file -> rows written, dict Country -> rows with missing data)
+    """
+    # The merged files are rewritten from scratch
+    for output_file in [output_file_hundred_thousand, output_file_number]:
+        if os.path.exists(output_file):
+            os.remove(output_file)
+
+    written_rows = {}
+    missing_counts = {}
+    for name, chunk in iter_source_chunks(source, chunk_rows):
+        if chunk.empty:
+            continue
+        output_file = output_file_for(chunk['Data Type'].iloc[0])
+        if output_file is None:
+            continue
+        chunk = add_country_columns(chunk)[OUTPUT_COLUMNS]
+        chunk.to_csv(output_file, mode='a', header=output_file not in written_rows, index=False)
+        count_missing(chunk, missing_counts)
+        written_rows[output_file] = written_rows.get(output_file, 0) + len(chunk)
+        print(f"{name}: {len(chunk)} rows appended to {output_file}")
+    return written_rows, missing_counts
+
+def main():
+    """Merge the per-crime tables into the two merged CSV files"""
+    print(f"Input folder: {input_folder}")
+    print(f"Input folder exists: {os.path.exists(input_folder)}")
+    print(f"Europe file exists: {os.path.exists(europe_file)}")
+
+    # Lists to store dataframes
+    hundred_thousand_dataframes = []
+    number_dataframes = []
+    # Country -> rows without complete codes, counted file by file
+    missing_counts = {}
+
+    # Check if the folder exists
+    if not os.path.exists(input_folder):
+        print(f"The folder {input_folder} does not exist.")
+        exit()
+
+    if stream:
+        written_rows, missing_counts = stream_merge(input_folder)
+        if not written_rows:
+            print("No valid DataFrames were created. Check your CSV files.")
+            exit()
+        for output_file, rows in written_rows.items():
+            print(f"Total rows in {output_file}: {rows}")
+        print("Merging process completed.")
+        print(DATASET_NOTE)
+        report_missing(missing_counts)
+        return
+
+    if input_folder.endswith('.xlsx'):
+        # One table per (crime type, data type) sheet of the workbook, already in memory
+        long_df = ingest_workbook(input_folder)
+        results = [(f"{input_folder} [{crime_type}, {data_type}]",
+                    add_country_columns(table.reset_index(drop=True)), None)
+                   for (crime_type, data_type), table in long_df.groupby(['Crime Type', 'Data Type'], sort=False)]
+    else:
+        # Get all CSV files in the folder, sorted so that the merge order is deterministic
+        csv_files = sorted(glob.glob(os.path.join(input_folder, '*.csv')))
+        print(f"CSV files found: {csv_files}")
+        # Files are read and enriched in parallel, results come back in file order
+        results = run_file_tasks(load_csv_source, csv_files, workers)
+
+    if not results:
+        print(f"No CSV files found in the folder {input_folder}")
+        exit()
+
+    for file, df, error in results:
+        if error is not None:
+            print(f"Error processing file {file}: {error}")
+            continue
         if df.empty:
             print(f"The file {file} is empty and will be ignored.")
             continue
-        
-        # Add columns for crime type and data type
-        df['Crime Type'] = crime_type
-        df['Data Type'] = data_type
-        
-        # Add country data columns
-        df['FIPS'] = df['Country'].map(lambda x: get_country_data(x).get('FIPS', ''))
-        df['ISO2'] = df['Country'].map(lambda x: get_country_data(x).get('ISO2', ''))
-        df['ISO3'] = df['Country'].map(lambda x: get_country_data(x).get('ISO3', ''))
-        df['UN'] = df['Country'].map(lambda x: get_country_data(x).get('UN', ''))
-        df['NAME'] = df['Country'].map(lambda x: get_country_data(x).get('NAME', x))
-        df['lat'] = df['Country'].map(lambda x: get_country_data(x).get('lat', ''))
-        df['lon'] = df['Country'].map(lambda x: get_country_data(x).get('lon', ''))
-        
+        output_file = output_file_for(df['Data Type'].iloc[0])
+
         # Add the dataframe to the appropriate list
-        if 'hundred thousand' in data_type.lower():
+        if output_file == output_file_hundred_thousand:
             hundred_thousand_dataframes.append(df)
-        elif 'number' in data_type.lower():
+        elif output_file == output_file_number:
             number_dataframes.append(df)
-        
+        if output_file is not None:
+            count_missing(df, missing_counts)
+
         print(f"File {file} processed successfully.")
-    except Exception as e:
-        print(f"Error processing file {file}: {str(e)}")
-
-# Check if any valid DataFrames were created
-if not hundred_thousand_dataframes and not number_dataframes:
-    print("No valid DataFrames were created. Check your CSV files.")
-    exit()
-
-# Merge and save "Per hundred thousand inhabitants" data
-if hundred_thousand_dataframes:
-    merged_hundred_thousand = pd.concat(hundred_thousand_dataframes, ignore_index=True)
-    merged_hundred_thousand = merged_hundred_thousand[['Country', 'FIPS', 'ISO2', 'ISO3', 'UN', 'NAME', 'lat', 'lon', 'Year', 'Value', 'Crime Type', 'Data Type']]
-    merged_hundred_thousand.to_csv(output_file_hundred_thousand, index=False)
-    print(f"'Per hundred thousand inhabitants' data merged into {output_file_hundred_thousand}")
-    print(f"Total rows in 'Per hundred thousand inhabitants' file: {len(merged_hundred_thousand)}")
-
-# Merge and save "Number" data
-if number_dataframes:
-    merged_number = pd.concat(number_dataframes, ignore_index=True)
-    merged_number = merged_number[['Country', 'FIPS', 'ISO2', 'ISO3', 'UN', 'NAME', 'lat', 'lon', 'Year', 'Value', 'Crime Type', 'Data Type']]
-    merged_number.to_csv(output_file_number, index=False)
-    print(f"'Number' data merged into {output_file_number}")
-    print(f"Total rows in 'Number' file: {len(merged_number)}")
-
-print("Merging process completed.")
-
-# Print countries with missing data
-all_data = pd.concat([merged_hundred_thousand, merged_number], ignore_index=True)
-missing_data = all_data[all_data['FIPS'].isna() | all_data['ISO2'].isna() | all_data['ISO3'].isna() | all_data['UN'].isna() | all_data['lat'].isna() | all_data['lon'].isna()]
-if not missing_data.empty:
-    print("\nCountries with missing data:")
-    print(missing_data['Country'].unique())
\ No newline at end of file
+
+    # Check if any valid DataFrames were created
+    if not hundred_thousand_dataframes and not number_dataframes:
+        print("No valid DataFrames were created. Check your CSV files.")
+        exit()
+
+    # Merge and save "Per hundred thousand inhabitants" data
+    if hundred_thousand_dataframes:
+        merged_hundred_thousand = pd.concat(hundred_thousand_dataframes, ignore_index=True)
+        merged_hundred_thousand = merged_hundred_thousand[OUTPUT_COLUMNS]
+        merged_hundred_thousand.to_csv(output_file_hundred_thousand, index=False)
+        print(f"'Per hundred thousand inhabitants' data merged into {output_file_hundred_thousand}")
+        print(f"Total rows in 'Per hundred thousand inhabitants' file: {len(merged_hundred_thousand)}")
+
+    # Merge and save "Number" data
+    if number_dataframes:
+        merged_number = pd.concat(number_dataframes, ignore_index=True)
+        merged_number = merged_number[OUTPUT_COLUMNS]
+        merged_number.to_csv(output_file_number, index=False)
+        print(f"'Number' data merged into {output_file_number}")
+        print(f"Total rows in 'Number' file: {len(merged_number)}")
+
+    print("Merging process completed.")
+    print(DATASET_NOTE)
+
+    # Print countries with missing data
+    report_missing(missing_counts)
+
+
+# The work is done in main(): on platforms without fork the worker
+# processes import this script again
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+import os
+import io
+import sys
+import json
+import time
+import runpy
+import shutil
+import platform
+import tempfile
+import statistics
+import subprocess
+import contextlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, 'country_indice_per_date'))
+
+from crime_dataset import clean_crimes
+from crime_cube import CrimeCube
+from crime_index import compute_indices
+from index_cache import IndexCache
+import indice_criminaliter
+import calcule_INDICE
+import map_categorie
+from synthetic_data import generate_dataset, write_dataset
+
+MERGE_SCRIPT = os.path.join(BASE_DIR, 'annexe', 'merge-csv-files.py')
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+
+DEFAULT_REGIONS = [40, 400, 4000]
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    """Temporarily change the current directory (the scripts use relative paths)"""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def prepare(dataset, workdir):
+    """
+    Build the inputs of every stage from a generated dataset, outside of the
+    timed sections.
+    """
+    write_dataset(dataset, workdir)
+
+    rates = clean_crimes(dataset['rates'])
+    map_df = rates.dropna(subset=['lat', 'lon']).sort_values(['NAME', 'Year', 'Crime Type'])
+    map_df = map_df.reset_index(drop=True)
+
+    numbers = clean_crimes(dataset['numbers'])
+    numbers.columns = numbers.columns.str.strip().str.lower().str.replace(' ', '_')
+    population = dataset['population'].copy()
+    population.columns = population.columns.str.strip().str.lower()
+
+    years = sorted(map_df['Year'].unique())
+    return {
+        'workdir': workdir,
+        'map_df': map_df,
+        'numbers': numbers,
+        'population': population,
+        'weights': dataset['weights'],
+        'year': int(years[len(years) // 2]),
+        'output_dir': os.path.join(workdir, 'crime_maps'),
+        'index_cache': IndexCache(os.path.join(workdir, 'index_cache')),
+    }
+
+
+def stage_merge_enrichment(context):
+    """annexe/merge-csv-files.py on the raw per-crime files"""
+    argv = sys.argv
+    sys.argv = [MERGE_SCRIPT, os.path.join(context['workdir'], 'output_clean_QGIS')]
+    try:
+        with working_directory(context['workdir']):
+            runpy.run_path(MERGE_SCRIPT, run_name='__main__')
+    finally:
+        sys.argv = argv
+
+
+def stage_crime_index_weights(context):
+    """indice_criminaliter.calculate_crime_index (weights from poids_crimes.csv)"""
+    indice_criminaliter.calculate_crime_index(context['numbers'].copy(), context['weights'],
+                                              context['population'], use_cache=False)
+
+
+def stage_crime_index_population(context):
+    """country_indice_per_date/calcule_INDICE.calculate_crime_index"""
+    calcule_INDICE.calculate_crime_index(context['numbers'], context['population'], use_cache=False)
+
+
+def stage_crime_index_cached(context):
+    """crime_index.compute_indices served from the result cache (the first run fills it)"""
+    compute_indices(context['numbers'].rename(columns=indice_criminaliter.ENGINE_COLUMNS),
+                    context['population'].rename(columns=indice_criminaliter.ENGINE_COLUMNS),
+                    context['weights'], cache=context['index_cache'])
+
+
+def stage_crime_cube(context):
+    """CrimeCube.from_frame on the map data"""
+    context['cube'] = CrimeCube.from_frame(context['map_df'], map_categorie.get_crime_categories())
+
+
+def stage_trends_page(context):
+    """create_trends_page (replaces the per-country create_crime_trend_graph)"""
+    map_categorie.create_trends_page(context['map_df'], context['output_dir'])
+
+
+def stage_rankings_page(context):
+    """create_rankings_page"""
+    map_categorie.create_rankings_page(context['map_df'], context['output_dir'])
+
+
+def stage_year_map_inline(context):
+    """create_year_map of one year with pre-rendered popups"""
+    map_categorie.create_year_map(context['cube'], context['year'], context['output_dir'], popup_mode='inline')
+
+
+def stage_year_map_lazy(context):
+    """create_year_map of one year with popups rendered in the browser"""
+    map_categorie.create_year_map(context['cube'], context['year'], context['output_dir'], popup_mode='lazy')
+
+
+def stage_year_map_canvas(context):
+    """create_year_map of one year, lazy popups drawn on a canvas with marker clusters"""
+    map_categorie.create_year_map(context['cube'], context['year'], context['output_dir'], popup_mode='lazy',
+                                  render_mode='canvas', cluster=True)
+
+
+# Run in this order: the cube is needed by the year maps, the trends page
+# must exist before a year map is rendered
+STAGES = {
+    'merge_enrichment': stage_merge_enrichment,
+    'crime_index_weights': stage_crime_index_weights,
+    'crime_index_population': stage_crime_index_population,
+    'crime_index_cached': stage_crime_index_cached,
+    'crime_cube': stage_crime_cube,
+    'trends_page': stage_trends_page,
+    'rankings_page': stage_rankings_page,
+    'year_map_inline': stage_year_map_inline,
+    'year_map_lazy': stage_year_map_lazy,
+    'year_map_canvas': stage_year_map_canvas,
+}
+
+
+def time_stage(func, context, repeat):
+    """Run a stage repeat times, its output silenced, and return the durations"""
+    durations = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func(context)
+            durations.append(time.perf_counter() - start)
+    return durations
+
+
+def run_scale(n_regions, years, n_crime_types, stages, repeat, seed=0):
+    """Generate one scale and time the selected stages on it"""
+    dataset = generate_dataset(n_regions, years, n_crime_types, seed=seed)
+    workdir = tempfile.mkdtemp(prefix='crime_benchmark_')
+    try:
+        context = prepare(dataset, workdir)
+        # The year maps need the cube, and the shared assets they link to are
+        # built once here so that they are not part of the timings
+        if any(stage.startswith('year_map') for stage in stages):
+            stages = list(stages) + ['crime_cube']
+            os.makedirs(context['output_dir'], exist_ok=True)
+            with working_directory(BASE_DIR), contextlib.redirect_stdout(io.StringIO()):
+                map_categorie.ensure_geometry_asset(context['output_dir'])
+                map_categorie.create_trends_page(context['map_df'], context['output_dir'])
+        result = {
+            'regions': n_regions,
+            'years': len(years),
+            'crime_types': int(context['map_df']['Crime Type'].nunique()),
+            'rows': len(dataset['rates']),
+            'stages': {}
+        }
+        # The map stages read templates/ and europe.geojson relative to the repository
+        with working_directory(BASE_DIR):
+            for name, func in STAGES.items():
+                if name not in stages:
+                    continue
+                try:
+                    durations = time_stage(func, context, repeat)
+                except Exception as e:
+                    print(f"  {name}: failed ({str(e)})")
+                    result['stages'][name] = {'error': str(e)}
+                    continue
+                result['stages'][name] = {
+                    'seconds': [round(duration, 6) for duration in durations],
+                    'min': round(min(durations), 6),
+                    'median': round(statistics.median(durations), 6)
+                }
+                print(f"  {name}: {min(durations):.3f}s")
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def git_revision():
+    """Current commit (and whether the tree has local changes), None outside git"""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BASE_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip() != ''
+        return revision, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def compare_results(previous, current):
+    """Print the ratio current/previous of the best time of every stage"""
+    previous_scales = {scale['regions']: scale for scale in previous['scales']}
+    print(f"\nComparison with {previous.get('revision')}:")
+    for scale in current['scales']:
+        old_scale = previous_scales.get(scale['regions'])
+        if old_scale is None:
+            continue
+        for name, stage in scale['stages'].items():
+            old_stage = old_scale['stages'].get(name)
+            if not old_stage or 'min' not in old_stage or 'min' not in stage or old_stage['min'] == 0:
+                continue
+            ratio = stage['min'] / old_stage['min']
+            flag = '  <-- slower' if ratio > 1.1 else ''
+            print(f"  {scale['regions']:>6} regions  {name:<24} {old_stage['min']:.3f}s -> "
+                  f"{stage['min']:.3f}s  (x{ratio:.2f}){flag}")
+
+
+def run_benchmarks(regions=DEFAULT_REGIONS, years=range(2008, 2023), n_crime_types=21,
+                   stages=None, repeat=3, output=None, compare=None):
+    """
+    Time every stage at every scale and save the results as JSON.
+
+    Args:
+        regions: List of region counts (40 to 50 000)
+        years: Years of the synthetic data
+        n_crime_types: Number of crime types
+        stages: Names of the stages to run (None for all, see STAGES)
+        repeat: Number of runs of each stage
+        output: JSON file to write (default benchmarks/results/<date>_<revision>.json)
+        compare: Previous results file to compare with
+
+    Returns:
+        dict: The recorded results
+    """
+    stages = list(STAGES) if stages is None else stages
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages: {sorted(unknown)}")
+
+    revision, dirty = git_revision()
+    results = {
+        'revision': revision,
+        'dirty': dirty,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeat': repeat,
+        'scales': []
+    }
+    years = list(years)
+    for n_regions in regions:
+        print(f"{n_regions} regions x {len(years)} years x {n_crime_types} crime types")
+        results['scales'].append(run_scale(n_regions, years, n_crime_types, stages, repeat))
+
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output = os.path.join(RESULTS_DIR, f'{stamp}_{revision or "norev"}.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if compare:
+        with open(compare, 'r', encoding='utf-8') as f:
+            compare_results(json.load(f), results)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time the pipeline stages on synthetic data")
+    parser.add_argument('--regions', type=int, nargs='+', default=DEFAULT_REGIONS)
+    parser.add_argument('--first-year', type=int, default=2008)
+    parser.add_argument('--last-year', type=int, default=2022)
+    parser.add_argument('--crime-types', type=int, default=21)
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--compare', default=None, help="Previous results JSON to compare with")
+    args = parser.parse_args()
+
+    run_benchmarks(args.regions, range(args.first_year, args.last_year + 1), args.crime_types,
+                   args.stages, args.repeat, args.output, args.compare)
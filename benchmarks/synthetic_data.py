@@ -0,0 +1,207 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Crime types of the Eurostat extraction: English name (raw per-crime files
+# read by annexe/merge-csv-files.py) and French name (merged *_french.csv)
+CRIME_TYPES = [
+    ('Intentional homicide', 'Homicide intentionnel'),
+    ('Attempted intentional homicide', "Tentative d'homicide volontaire"),
+    ('Serious assault', 'Attaque grave'),
+    ('Sexual violence', 'Violence sexuelle'),
+    ('Sexual assault', 'Agression sexuelle'),
+    ('Rape', 'Viol'),
+    ('Sexual exploitation', 'Exploitation sexuelle'),
+    ('Theft', 'Vol'),
+    ('Burglary', 'Vol par effraction'),
+    ('Burglary of private residential premises', 'Vol par effraction de résidences privées'),
+    ('Theft of a motorized vehicle or parts thereof', "Vol d'un véhicule motorisé ou de pièces de celui-ci"),
+    ('Robbery', 'Vol qualifié'),
+    ('Fraud', 'Fraude'),
+    ('Participation in an organized criminal group', 'Participation à un groupe criminel organisé'),
+    ('Money laundering', "Blanchiment d'argent"),
+    ('Corruption', 'Corruption'),
+    ('Unlawful acts involving controlled drugs or precursors',
+     'Actes illicites impliquant des drogues ou des précurseurs contrôlés'),
+    ('Acts against computer systems', 'Actes contre les systèmes informatiques'),
+    ('Child pornography', 'Pédopornographie'),
+    ('Kidnapping', 'Enlèvement'),
+    ('Bribery', 'pots-de-vin'),
+]
+
+# Same weights as poids_crimes.csv
+WEIGHTS = [10, 9, 7, 8, 7, 9, 8, 4, 5, 6, 5, 6, 2, 6, 5, 4, 6, 3, 9, 8, 3]
+
+DATA_TYPE_RATE = 'Per hundred thousand inhabitants'
+DATA_TYPE_NUMBER = 'Number'
+
+# Rough extent of the map (lat, lon)
+LAT_RANGE = (35.0, 70.0)
+LON_RANGE = (-10.0, 40.0)
+
+
+def region_names(n_regions):
+    """Synthetic region names, English for the raw files and French for the merged ones"""
+    english = [f'Region {i:05d}' for i in range(n_regions)]
+    french = [f'Région {i:05d}' for i in range(n_regions)]
+    return english, french
+
+
+def generate_dataset(n_regions=40, years=range(2008, 2023), n_crime_types=len(CRIME_TYPES),
+                     missing_rate=0.15, seed=0):
+    """
+    Generate synthetic inputs with the schemas of the project files.
+
+    Args:
+        n_regions: Number of countries/regions (40 to 50 000)
+        years: Years covered
+        n_crime_types: Number of crime types (at most len(CRIME_TYPES))
+        missing_rate: Share of values replaced by the Eurostat ':' marker
+        seed: Random seed, the same arguments always give the same data
+
+    Returns:
+        dict of DataFrames:
+            'rates', 'numbers': merged_crimes_*_french.csv schema
+            'population': long (Country, Year, Population) dimension
+            'population_wide': populations_worldbank.csv schema
+            'merged_pop': merged_data_pop_total_crimes.csv schema
+            'weights': poids_crimes.csv schema
+            'europe': europe.csv schema (English names, for merge-csv-files)
+            'raw': dict file name -> (Country, Year, Value) table, as in output_clean_QGIS
+    """
+    rng = np.random.default_rng(seed)
+    years = [int(year) for year in years]
+    crime_types = CRIME_TYPES[:min(n_crime_types, len(CRIME_TYPES))]
+    english_names, french_names = region_names(n_regions)
+
+    # One row per region
+    lat = rng.uniform(*LAT_RANGE, n_regions).round(10)
+    lon = rng.uniform(*LON_RANGE, n_regions).round(10)
+    codes = [f'R{i:05d}' for i in range(n_regions)]
+    regions = pd.DataFrame({
+        'Country': french_names,
+        'FIPS': codes,
+        'ISO2': codes,
+        'ISO3': codes,
+        'UN': np.arange(n_regions, dtype=float),
+        'NAME': french_names,
+        'lat': lat,
+        'lon': lon,
+    })
+
+    # Population per region and year, slowly drifting
+    base_population = rng.lognormal(mean=14, sigma=1.2, size=n_regions)
+    drift = 1 + rng.normal(0, 0.005, (n_regions, len(years))).cumsum(axis=1)
+    population = (base_population[:, None] * drift).round().astype('int64')
+
+    # Rates per crime type: a level per (region, crime type) and yearly noise
+    level = rng.lognormal(mean=3, sigma=1.5, size=(n_regions, 1, len(crime_types)))
+    noise = rng.lognormal(mean=0, sigma=0.15, size=(n_regions, len(years), len(crime_types)))
+    rate = (level * noise).round(2)
+    number = (rate * population[:, :, None] / 100000).round()
+    missing = rng.random(rate.shape) < missing_rate
+
+    # Long tables, region-major then crime type then year as in the merged CSVs
+    r_idx, c_idx, y_idx = np.meshgrid(np.arange(n_regions), np.arange(len(crime_types)),
+                                      np.arange(len(years)), indexing='ij')
+    r_idx, c_idx, y_idx = r_idx.ravel(), c_idx.ravel(), y_idx.ravel()
+    french_types = np.array([french for _, french in crime_types], dtype=object)
+
+    def long_table(values, data_type):
+        table = regions.iloc[r_idx].reset_index(drop=True)
+        table['Year'] = np.array(years)[y_idx]
+        value = values[r_idx, y_idx, c_idx]
+        table['Value'] = np.where(missing[r_idx, y_idx, c_idx], ':', value.astype(str))
+        table['Crime Type'] = french_types[c_idx]
+        table['Data Type'] = data_type
+        return table
+
+    rates = long_table(rate, DATA_TYPE_RATE)
+    numbers = long_table(number, DATA_TYPE_NUMBER)
+
+    population_long = pd.DataFrame({
+        'Country': np.repeat(french_names, len(years)),
+        'Year': np.tile(years, n_regions),
+        'Population': population.ravel(),
+    })
+    population_wide = pd.DataFrame(population, columns=[f'Population_{year}' for year in years])
+    population_wide.insert(0, 'Country', french_names)
+
+    # merged_data_pop_total_crimes.csv: wide population joined to the lowercased number table
+    merged_pop = population_wide.rename(columns=str.lower).merge(
+        numbers.rename(columns=lambda col: col.lower().replace(' ', '_')),
+        on='country'
+    )
+
+    weights = pd.DataFrame({
+        'Crime': [french for _, french in crime_types],
+        'Poids (1-10)': WEIGHTS[:len(crime_types)],
+    })
+
+    europe = pd.DataFrame({
+        'FIPS': codes,
+        'ISO2': codes,
+        'ISO3': codes,
+        'UN': np.arange(n_regions),
+        'NAME': english_names,
+        'Coordinate': [f'lat: {a}, lon: {b}' for a, b in zip(lat, lon)],
+    })
+
+    # Raw per-crime files, one per (crime type, data type)
+    raw = {}
+    for k, (english, _) in enumerate(crime_types):
+        for data_type, values in [(DATA_TYPE_RATE, rate), (DATA_TYPE_NUMBER, number)]:
+            table = pd.DataFrame({
+                'Country': np.repeat(english_names, len(years)),
+                'Year': np.tile(years, n_regions),
+                'Value': values[:, :, k].ravel(),
+            })
+            table.loc[missing[:, :, k].ravel(), 'Value'] = np.nan
+            raw[f'restructured_Annual_{english}_{data_type}.csv'] = table
+
+    return {
+        'rates': rates,
+        'numbers': numbers,
+        'population': population_long,
+        'population_wide': population_wide,
+        'merged_pop': merged_pop,
+        'weights': weights,
+        'europe': europe,
+        'raw': raw,
+    }
+
+
+def write_dataset(dataset, output_dir):
+    """
+    Write a generated dataset with the project file names.
+
+    The raw per-crime files go to output_dir/output_clean_QGIS, the input
+    folder of annexe/merge-csv-files.py.
+    """
+    os.makedirs(os.path.join(output_dir, 'output_clean_QGIS'), exist_ok=True)
+    dataset['rates'].to_csv(os.path.join(output_dir, 'merged_crimes_per_hundred_thousand_french.csv'), index=False)
+    dataset['numbers'].to_csv(os.path.join(output_dir, 'merged_crimes_number_french.csv'), index=False)
+    dataset['population_wide'].to_csv(os.path.join(output_dir, 'populations_worldbank.csv'), index=False)
+    dataset['merged_pop'].to_csv(os.path.join(output_dir, 'merged_data_pop_total_crimes.csv'), index=False)
+    dataset['weights'].to_csv(os.path.join(output_dir, 'poids_crimes.csv'), index=False)
+    dataset['europe'].to_csv(os.path.join(output_dir, 'europe.csv'), index=False)
+    for filename, table in dataset['raw'].items():
+        table.to_csv(os.path.join(output_dir, 'output_clean_QGIS', filename), index=False)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate synthetic Eurostat-shaped crime data")
+    parser.add_argument('output_dir')
+    parser.add_argument('--regions', type=int, default=40)
+    parser.add_argument('--first-year', type=int, default=2008)
+    parser.add_argument('--last-year', type=int, default=2022)
+    parser.add_argument('--crime-types', type=int, default=len(CRIME_TYPES))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    data = generate_dataset(args.regions, range(args.first_year, args.last_year + 1),
+                            args.crime_types, seed=args.seed)
+    write_dataset(data, args.output_dir)
+    print(f"Synthetic dataset written to {args.output_dir} ({len(data['rates'])} rows per data type)")
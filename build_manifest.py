@@ -0,0 +1,85 @@
+import os
+import json
+import shutil
+import hashlib
+import pandas as pd
+
+MANIFEST_FILE = 'build_manifest.json'
+
+
+def fingerprint(*parts):
+    """
+    Return a stable sha256 digest of the given inputs.
+
+    DataFrames are hashed by content (values and column names, not the
+    index), strings/bytes as is and anything else through its JSON form.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, pd.DataFrame):
+            digest.update(json.dumps(list(map(str, part.columns))).encode('utf-8'))
+            digest.update(pd.util.hash_pandas_object(part, index=False).values.tobytes())
+        elif isinstance(part, bytes):
+            digest.update(part)
+        elif isinstance(part, str):
+            digest.update(part.encode('utf-8'))
+        else:
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def file_fingerprint(path):
+    """Return the sha256 digest of a file content (e.g. an HTML template)"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class BuildManifest:
+    """
+    Record of the input hash each generated artifact was built from.
+
+    An artifact is rebuilt only when its file is missing or when the hash
+    of its inputs differs from the one recorded in the manifest.
+    """
+
+    def __init__(self, output_dir, filename=MANIFEST_FILE):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, filename)
+        self.artifacts = {}
+        self.seen = set()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.artifacts = json.load(f).get('artifacts', {})
+            except (ValueError, OSError) as e:
+                print(f"Ignoring unreadable manifest {self.path}: {str(e)}")
+
+    def is_stale(self, artifact, digest):
+        """Tell whether artifact must be (re)built for inputs hashing to digest"""
+        self.seen.add(artifact)
+        if not os.path.exists(os.path.join(self.output_dir, artifact)):
+            return True
+        return self.artifacts.get(artifact) != digest
+
+    def record(self, artifact, digest):
+        """Remember that artifact has been built from inputs hashing to digest"""
+        self.seen.add(artifact)
+        self.artifacts[artifact] = digest
+
+    def remove_orphans(self):
+        """Delete artifacts (files or directories) built by a previous run that are no longer produced"""
+        removed = []
+        for artifact in sorted(set(self.artifacts) - self.seen):
+            path = os.path.join(self.output_dir, artifact)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+            del self.artifacts[artifact]
+            removed.append(artifact)
+        return removed
+
+    def save(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'artifacts': self.artifacts}, f, indent=2, sort_keys=True)
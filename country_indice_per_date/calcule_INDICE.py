@@ -1,5 +1,15 @@
+import os
+import sys
 import pandas as pd
-import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crime_dataset import load_crimes, load_population, DATA_TYPE_NUMBER
+from crime_index import compute_indices, load_weights
+from index_cache import default_cache
+
+# Lower-case columns of this script -> columns of crime_index.py
+ENGINE_COLUMNS = {'country': 'Country', 'year': 'Year', 'crime_type': 'Crime Type', 'value': 'Value',
+                  'population': 'Population'}
 
 def get_crime_weights():
     """
@@ -30,52 +40,45 @@ def get_crime_weights():
         'fraude': 2
     }
 
-def calculate_crime_index(df):
+def calculate_crime_index(df, population_df, weights=None, use_cache=True):
     """
     Calculate crime index per country per year using the formula:
     Index = Σ(Number of infractions × Weight) / Population
+
+    Population comes from the long (country, year, population) dimension.
+    The counts are pivoted once to a country-year × crime type matrix and
+    Σ(Number of infractions × Weight) is a matrix-vector product
+    (crime_index.py). Country-years without any weighted value are left out.
+    weights is anything accepted by crime_index.load_weights (default
+    get_crime_weights()), crime types are matched without case.
+    With use_cache, unchanged inputs are served from the result cache
+    (index_cache.py) without recomputation.
     """
-    crime_weights = get_crime_weights()
-    df_processed = df.copy()
-    
-    # Convert value column to numeric
-    df_processed['value'] = pd.to_numeric(df_processed['value'], errors='coerce')
-    
-    # Normalize crime type strings
-    df_processed['crime_type'] = df_processed['crime_type'].str.lower().str.strip()
-    
-    # Add weight column based on crime type
-    df_processed['weight'] = df_processed['crime_type'].map(crime_weights)
-    
-    # Calculate weighted infractions (Nombre d'infractions × Poids)
-    df_processed['weighted_infractions'] = df_processed['value'] * df_processed['weight']
-    
-    # Get population for the corresponding year
-    df_processed['population'] = df_processed.apply(
-        lambda row: pd.to_numeric(row[f'population_{row["year"]}'], errors='coerce'), 
-        axis=1
-    )
-    
-    # Remove rows with missing values
-    df_processed = df_processed.dropna(subset=['weighted_infractions', 'population'])
-    
-    # Group by country and year to calculate final index
-    result = (df_processed.groupby(['country', 'year'])
-              .agg({
-                  'weighted_infractions': 'sum',  # Sum of (Nombre d'infractions × Poids)
-                  'population': 'first'
-              })
-              .reset_index())
-    
-    # Calculate final index
-    result['crime_index'] = result['weighted_infractions'] / result['population']
-    
-    return result[['country', 'year', 'crime_index', 'weighted_infractions']]
+    weights = load_weights(get_crime_weights() if weights is None else weights)
+    weights = weights.set_axis(weights.index.str.lower().str.strip())
+    crimes = df.rename(columns=ENGINE_COLUMNS)
+    crimes['Crime Type'] = crimes['Crime Type'].astype(str).str.lower()
+    population = population_df.rename(columns=ENGINE_COLUMNS)
+    indices = compute_indices(crimes, population, weights, formulas=['per_capita'], normalizations=[],
+                              cache=default_cache() if use_cache else None)
+    indices = indices[indices['Weighted_Types'] > 0]
+
+    return pd.DataFrame({
+        'country': indices['Country'],
+        'year': indices['Year'],
+        'crime_index': indices['per_capita'],
+        'weighted_infractions': indices['Weighted_Sum']
+    }).reset_index(drop=True)
 
 def main():
     try:
-        df = pd.read_csv('merged_data_pop_total_crimes.csv')
-        result = calculate_crime_index(df)
+        # Compact types: categorical names, int16 years, float32 counts (exact)
+        df = load_crimes(columns=['Country', 'Year', 'Crime Type', 'Value'], data_types=[DATA_TYPE_NUMBER],
+                         compact=True)
+        population_df = load_population(compact=True)
+        df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_')
+        population_df.columns = population_df.columns.str.strip().str.lower()
+        result = calculate_crime_index(df, population_df)
         result = result.sort_values(['country', 'year'])
         
         # Save results
@@ -4,86 +4,159 @@ import time
 from datetime import datetime
 import numpy as np
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_cache import HttpCache, OFFLINE
+from gazetteer import resolve, resolve_code
+
+# API de la Banque Mondiale. WORLDBANK_API_URL (ou --base-url) permet de
+# viser un serveur local, par exemple un bouchon pour les tests.
+API_URL = os.environ.get('WORLDBANK_API_URL', 'https://api.worldbank.org/v2')
+INDICATOR = 'SP.POP.TOTL'
+START_YEAR = 2008
+END_YEAR = 2022
+OUTPUT_FILE = 'populations_worldbank.csv'
+
+# L'API accepte plusieurs codes séparés par ';' : une requête par lot de
+# pays, quelques lots en parallèle sur des connexions réutilisées
+BATCH_SIZE = 20
+MAX_WORKERS = 4
+TIMEOUT = 30
+# Nouvelles tentatives (429, erreurs 5xx et réseau) avec attente exponentielle
+MAX_RETRIES = 5
+BACKOFF = 0.5
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+COUNTRIES = [
+    "Albanie", "Autriche", "Belgique", "Bosnie-Herzégovine", "Bulgarie",
+    "Croatie", "Chypre", "Tchéquie", "Danemark", "Estonie", "Finlande",
+    "France", "Allemagne", "Grèce", "Hongrie", "Islande", "Irlande",
+    "Italie", "Kosovo", "Lettonie", "Liechtenstein", "Lituanie",
+    "Luxembourg", "Malte", "Monténégro", "Pays-Bas", "Macédoine du Nord",
+    "Norvège", "Pologne", "Portugal", "Roumanie", "Serbie", "Slovaquie",
+    "Slovénie", "Espagne", "Suède", "Suisse", "Turquie"
+]
 
 def get_country_code(country_name):
     """
     Convertit les noms de pays en codes ISO utilisés par la Banque Mondiale
+    (table d'alias partagée de gazetteer.py)
     """
-    country_codes = {
-        "Albanie": "ALB", 
-        "Autriche": "AUT",
-        "Belgique": "BEL",
-        "Bosnie-Herzégovine": "BIH",
-        "Bulgarie": "BGR",
-        "Croatie": "HRV",
-        "Chypre": "CYP",
-        "Tchéquie": "CZE",
-        "Danemark": "DNK",
-        "Estonie": "EST",
-        "Finlande": "FIN",
-        "France": "FRA",
-        "Allemagne": "DEU",
-        "Grèce": "GRC",
-        "Hongrie": "HUN",
-        "Islande": "ISL",
-        "Irlande": "IRL",
-        "Italie": "ITA",
-        "Kosovo": "XKX",
-        "Lettonie": "LVA",
-        "Liechtenstein": "LIE",
-        "Lituanie": "LTU",
-        "Luxembourg": "LUX",
-        "Malte": "MLT",
-        "Monténégro": "MNE",
-        "Pays-Bas": "NLD",
-        "Macédoine du Nord": "MKD",
-        "Norvège": "NOR",
-        "Pologne": "POL",
-        "Portugal": "PRT",
-        "Roumanie": "ROU",
-        "Serbie": "SRB",
-        "Slovaquie": "SVK",
-        "Slovénie": "SVN",
-        "Espagne": "ESP",
-        "Suède": "SWE",
-        "Suisse": "CHE",
-        "Turquie": "TUR"
+    return resolve_code(country_name, 'ISO3')
+
+def create_session(pool_size=MAX_WORKERS, use_cache=True, offline=OFFLINE):
+    """
+    Session HTTP dont les connexions sont réutilisées entre les requêtes
+    (une connexion par thread au plus)
+
+    Avec use_cache, les réponses passent par le cache disque de http_cache.py :
+    les populations changent au plus une fois par an, les lancements suivants
+    ne font donc aucune requête. offline sert uniquement depuis le cache.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return HttpCache(session=session, offline=offline) if use_cache else session
+
+def valid_payload(response):
+    """
+    Vrai si la réponse de l'API n'est pas une erreur. L'API répond aussi 200
+    avec [{"message": [...]}] en cas d'erreur : ces réponses ne sont pas
+    gardées dans le cache, le lot est redemandé au lancement suivant.
+    """
+    try:
+        payload = response.json()
+    except ValueError:
+        return False
+    return isinstance(payload, list) and len(payload) > 0 and \
+        not (isinstance(payload[0], dict) and 'message' in payload[0])
+
+def get_with_retry(session, url, params, max_retries=MAX_RETRIES, backoff=BACKOFF, validate=None):
+    """
+    GET avec nouvelles tentatives sur les erreurs temporaires
+
+    L'attente double à chaque tentative (backoff, 2*backoff, ...), ou suit
+    l'en-tête Retry-After quand le serveur le donne. validate est transmis
+    au cache (voir HttpCache.get) et ignoré par une session sans cache.
+    """
+    options = {'validate': validate} if isinstance(session, HttpCache) else {}
+    for attempt in range(max_retries + 1):
+        try:
+            response = session.get(url, params=params, timeout=TIMEOUT, **options)
+            if response.status_code not in RETRY_STATUS or attempt == max_retries:
+                response.raise_for_status()
+                return response
+            retry_after = response.headers.get('Retry-After')
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else backoff * 2 ** attempt
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == max_retries:
+                raise
+            delay = backoff * 2 ** attempt
+        time.sleep(delay)
+
+def get_population_batch(session, country_codes, start_year=START_YEAR, end_year=END_YEAR, base_url=API_URL):
+    """
+    Récupère les populations de plusieurs pays en une requête (et ses pages)
+
+    Args:
+        session: Session HTTP (voir create_session)
+        country_codes: Codes ISO3 des pays
+        start_year, end_year: Années couvertes
+        base_url: Adresse de l'API
+
+    Returns:
+        dict: {code ISO3: {année: population ou NaN}}
+    """
+    populations = {code: {year: np.nan for year in range(start_year, end_year + 1)} for code in country_codes}
+    url = f"{base_url.rstrip('/')}/country/{';'.join(country_codes)}/indicator/{INDICATOR}"
+    params = {
+        "format": "json",
+        "date": f"{start_year}:{end_year}",
+        "per_page": len(country_codes) * (end_year - start_year + 1),
+        "page": 1
     }
-    return country_codes.get(country_name)
+    while True:
+        payload = get_with_retry(session, url, params, validate=valid_payload).json()
+        # En cas d'erreur l'API répond [{"message": [...]}] sans données
+        if len(payload) < 2 or payload[1] is None:
+            if 'message' in payload[0]:
+                raise ValueError(str(payload[0]['message']))
+            break
+        for entry in payload[1]:
+            code, year = entry.get('countryiso3code'), int(entry['date'])
+            if code in populations and start_year <= year <= end_year and entry['value'] is not None:
+                populations[code][year] = entry['value']
+        if params['page'] >= int(payload[0].get('pages', 1)):
+            break
+        params['page'] += 1
+    return populations
 
-def get_population_data(country_code, start_year=2008, end_year=2022):
+def get_population_data(country_code, start_year=START_YEAR, end_year=END_YEAR):
     """
-    Récupère les données de population depuis l'API de la Banque Mondiale
+    Récupère les données de population d'un seul pays depuis l'API de la Banque Mondiale
     """
     if not country_code:
         return {year: np.nan for year in range(start_year, end_year + 1)}
     
     try:
-        url = f"http://api.worldbank.org/v2/country/{country_code}/indicator/SP.POP.TOTL"
-        params = {
-            "format": "json",
-            "date": f"{start_year}:{end_year}",
-            "per_page": 100
-        }
-        
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        
-        data = response.json()[1] if len(response.json()) > 1 else []
-        
-        populations = {year: np.nan for year in range(start_year, end_year + 1)}
-        
-        for entry in data:
-            year = int(entry['date'])
-            if start_year <= year <= end_year:
-                populations[year] = entry['value']
-        
-        return populations
-        
+        with create_session(1) as session:
+            return get_population_batch(session, [country_code], start_year, end_year)[country_code]
     except Exception as e:
         print(f"Erreur pour {country_code}: {str(e)}")
         return {year: np.nan for year in range(start_year, end_year + 1)}
 
+def append_checkpoint(rows, filename, columns):
+    """
+    Ajoute les lignes d'un lot à la fin du CSV (l'en-tête seulement s'il
+    n'existe pas encore), sans réécrire les lignes déjà sauvegardées
+    """
+    header = not os.path.exists(filename) or os.path.getsize(filename) == 0
+    pd.DataFrame(rows, columns=columns).to_csv(filename, mode='a', header=header, index=False)
+
 def save_df(df, filename):
     """
     Sauvegarde le DataFrame dans un CSV avec gestion des erreurs
@@ -94,64 +167,97 @@ def save_df(df, filename):
     except Exception as e:
         print(f"Erreur lors de la sauvegarde: {str(e)}")
 
-def process_countries():
-    output_file = 'populations_worldbank.csv'
+def process_countries(countries=COUNTRIES, output_file=OUTPUT_FILE, start_year=START_YEAR, end_year=END_YEAR,
+                      base_url=API_URL, batch_size=BATCH_SIZE, workers=MAX_WORKERS, use_cache=True,
+                      offline=OFFLINE):
+    """
+    Télécharge les populations des pays non encore présents dans output_file
+
+    Les pays sont regroupés en lots d'au plus batch_size codes, workers lots
+    sont demandés en parallèle et chaque lot terminé est ajouté au fichier,
+    qui sert de point de reprise. Un lot en échec n'est pas sauvegardé et
+    sera redemandé au prochain lancement. Le fichier est remis dans l'ordre
+    de countries à la fin. Voir create_session pour use_cache et offline.
+
+    Returns:
+        DataFrame: Une ligne par pays, colonnes Country et Population_<année>
+    """
+    columns = ['Country'] + [f'Population_{year}' for year in range(start_year, end_year + 1)]
     
     # Vérifier si le fichier existe déjà
+    processed_countries = set()
     if os.path.exists(output_file):
         try:
-            df = pd.read_csv(output_file)
+            processed_countries = set(pd.read_csv(output_file, usecols=['Country'])['Country'])
             print(f"Reprise du fichier existant: {output_file}")
         except Exception as e:
             print(f"Erreur lors de la lecture du fichier existant: {str(e)}")
-            df = pd.DataFrame(columns=['Country'] + [f'Population_{year}' for year in range(2008, 2023)])
-    else:
-        df = pd.DataFrame(columns=['Country'] + [f'Population_{year}' for year in range(2008, 2023)])
-
-    countries = [
-        "Albanie", "Autriche", "Belgique", "Bosnie-Herzégovine", "Bulgarie",
-        "Croatie", "Chypre", "Tchéquie", "Danemark", "Estonie", "Finlande",
-        "France", "Allemagne", "Grèce", "Hongrie", "Islande", "Irlande",
-        "Italie", "Kosovo", "Lettonie", "Liechtenstein", "Lituanie",
-        "Luxembourg", "Malte", "Monténégro", "Pays-Bas", "Macédoine du Nord",
-        "Norvège", "Pologne", "Portugal", "Roumanie", "Serbie", "Slovaquie",
-        "Slovénie", "Espagne", "Suède", "Suisse", "Turquie"
-    ]
     
     # Filtrer les pays déjà traités
-    processed_countries = df['Country'].tolist() if not df.empty else []
     countries_to_process = [c for c in countries if c not in processed_countries]
-    
     print(f"Pays déjà traités: {len(processed_countries)}")
     print(f"Pays restants à traiter: {len(countries_to_process)}")
     
-    for country in countries_to_process:
-        print(f"\nTraitement de {country}...")
-        country_code = get_country_code(country)
-        
-        if country_code:
-            populations = get_population_data(country_code)
-            
-            data = {'Country': country}
-            data.update({f'Population_{year}': populations[year] for year in range(2008, 2023)})
-            
-            # Ajout de la nouvelle ligne
-            df = pd.concat([df, pd.DataFrame([data])], ignore_index=True)
-            
-            # Sauvegarde après chaque pays
-            save_df(df, output_file)
-            
-            time.sleep(0.5)
+    codes = {}
+    # Tous les noms sont résolus en une seule recherche
+    country_codes = resolve(countries_to_process, ['ISO3'])['ISO3'] if countries_to_process else []
+    for country, country_code in zip(countries_to_process, country_codes):
+        if pd.notna(country_code):
+            codes.setdefault(country_code, []).append(country)
         else:
             print(f"Code pays non trouvé pour {country}")
+    code_list = list(codes)
+    batches = [code_list[i:i + batch_size] for i in range(0, len(code_list), batch_size)]
+    
+    if batches:
+        with create_session(workers, use_cache, offline) as session, ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(get_population_batch, session, batch, start_year, end_year, base_url): batch
+                       for batch in batches}
+            # Les lots sont écrits par le thread principal, dans l'ordre où ils se terminent
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    populations = future.result()
+                except Exception as e:
+                    print(f"Erreur pour {';'.join(batch)}: {str(e)}")
+                    continue
+                rows = [[country] + [populations[code][year] for year in range(start_year, end_year + 1)]
+                        for code in batch for country in codes[code]]
+                append_checkpoint(rows, output_file, columns)
+                print(f"Lot de {len(batch)} pays sauvegardé dans {output_file}")
     
+    if not os.path.exists(output_file):
+        return pd.DataFrame(columns=columns)
+    df = pd.read_csv(output_file)
+    order = {country: i for i, country in enumerate(countries)}
+    df = (df.drop_duplicates('Country', keep='last')
+            .sort_values('Country', key=lambda names: names.map(order).fillna(len(order)), kind='stable')
+            .reset_index(drop=True))
+    if batches:
+        save_df(df, output_file)
     return df
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Populations de la Banque Mondiale (SP.POP.TOTL)")
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--start-year', type=int, default=START_YEAR)
+    parser.add_argument('--end-year', type=int, default=END_YEAR)
+    parser.add_argument('--base-url', default=API_URL, help="Adresse de l'API (serveur local pour les tests)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--no-cache', action='store_true', help="Ne pas utiliser le cache HTTP")
+    parser.add_argument('--offline', action='store_true', default=OFFLINE,
+                        help="Servir uniquement depuis le cache HTTP")
+    args = parser.parse_args()
+
     start_time = datetime.now()
     print(f"Début du traitement: {start_time}")
     
-    result_df = process_countries()
+    result_df = process_countries(output_file=args.output, start_year=args.start_year, end_year=args.end_year,
+                                  base_url=args.base_url, batch_size=args.batch_size, workers=args.workers,
+                                  use_cache=not args.no_cache, offline=args.offline)
     
     end_time = datetime.now()
     print(f"\nFin du traitement: {end_time}")
@@ -1,47 +1,33 @@
+import os
+import sys
 import pandas as pd
 
-# Load the population data
-population_df = pd.read_csv('populations_worldbank.csv')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crime_dataset import load_crimes, build_population_dim, POPULATION_PATH, DATA_TYPE_RATE
+
+# Build the long (Country, Year, Population) dimension from the World Bank export.
+# The index scripts join it on (country, year), so the wide
+# merged_data_pop_total_crimes*.csv files are no longer written.
+population_df = build_population_dim('populations_worldbank.csv', POPULATION_PATH)
 
 # Load the crimes data
-crimes_df = pd.read_csv('merged_crimes_per_hundred_thousand_french.csv')
+crimes_df = load_crimes(columns=['Country', 'Year', 'Value', 'Crime Type'], data_types=[DATA_TYPE_RATE])
 
 # Print column names to check
 print("Population DataFrame columns:", population_df.columns.tolist())
 print("Crimes DataFrame columns:", crimes_df.columns.tolist())
 
-# Clean column names
-population_df.columns = population_df.columns.str.strip().str.lower().str.replace(' ', '_')
-crimes_df.columns = crimes_df.columns.str.strip().str.lower().str.replace(' ', '_')
-
-# Print cleaned column names
-print("\nAfter cleaning:")
-print("Population DataFrame columns:", population_df.columns.tolist())
-print("Crimes DataFrame columns:", crimes_df.columns.tolist())
-
 # Print first few rows of each dataframe to verify data
 print("\nFirst few rows of population data:")
 print(population_df.head())
 print("\nFirst few rows of crimes data:")
 print(crimes_df.head())
 
-# Try to find common column for country
-common_columns = set(population_df.columns) & set(crimes_df.columns)
-print("\nCommon columns between datasets:", common_columns)
-
-# Perform merge with error handling
-try:
-    # First try with 'country'
-    merged_df = pd.merge(population_df, crimes_df, on='country', how='inner')
-except KeyError:
-    try:
-        # Then try with 'country_name' if 'country' fails
-        merged_df = pd.merge(population_df, crimes_df, on='country_name', how='inner')
-    except KeyError:
-        print("Error: Could not find matching country column. Please check the column names.")
-        exit(1)
-
-print(f"\nSuccessfully merged {len(merged_df)} rows")
+# Check the join coverage on (Country, Year)
+merged_df = pd.merge(crimes_df, population_df, on=['Country', 'Year'], how='left', indicator=True)
+unmatched = merged_df[merged_df['_merge'] == 'left_only']
 
-# Save the merged dataframe to a new CSV file
-merged_df.to_csv('merged_data_pop_total_crimes_hundred_thousand.csv', index=False)
+print(f"\nSuccessfully joined {len(merged_df) - len(unmatched)} of {len(merged_df)} rows")
+if not unmatched.empty:
+    print("Countries without population data:")
+    print(sorted(unmatched['Country'].unique()))
@@ -0,0 +1,135 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+ARRAYS = ['values', 'present', 'category_matrix', 'category_totals', 'totals', 'lat', 'lon']
+
+
+class CrimeCube:
+    """
+    Dense country × year × crime type array of values.
+
+    Missing values are NaN and `present` tells which cells had a row in the
+    source table. Category roll-ups are precomputed by multiplying the values
+    with a crime type × category 0/1 mapping matrix, so no per-country
+    filtering is needed when rendering popups and markers.
+    """
+
+    def __init__(self, countries, years, crime_types, categories, values, present,
+                 category_matrix, category_totals, totals, lat, lon, labels=None):
+        self.countries = list(countries)
+        # Display name of each entity (the key itself for countries)
+        self.labels = list(labels) if labels is not None else list(self.countries)
+        self.years = [int(year) for year in years]
+        self.crime_types = list(crime_types)
+        self.categories = list(categories)
+        self.values = values
+        self.present = present
+        self.category_matrix = category_matrix
+        self.category_totals = category_totals
+        self.totals = totals
+        self.lat = lat
+        self.lon = lon
+        self.country_index = {country: i for i, country in enumerate(self.countries)}
+        self.year_index = {year: i for i, year in enumerate(self.years)}
+        self.category_index = {category: i for i, category in enumerate(self.categories)}
+
+    @classmethod
+    def from_frame(cls, df, categories, key='NAME', label=None):
+        """
+        Build the cube from a long crime table.
+
+        Args:
+            df: DataFrame with key, Year, Crime Type, Value, lat and lon columns
+            categories: Dict as returned by get_crime_categories()
+            key: Column identifying the map entity (country name or NUTS code)
+            label: Column holding the display name of the entity (default: key)
+
+        Returns:
+            CrimeCube
+        """
+        # Rows without entity, year or crime type are left out, as by a groupby
+        df = df[df[key].notna() & df['Year'].notna() & df['Crime Type'].notna()]
+        countries = sorted(df[key].unique())
+        years = sorted(int(year) for year in df['Year'].unique())
+        crime_types = sorted(df['Crime Type'].unique())
+        category_names = [name for name, info in categories.items() if info is not None]
+
+        country_codes = pd.Categorical(df[key], categories=countries).codes
+        year_codes = pd.Categorical(df['Year'].astype(int), categories=years).codes
+        crime_codes = pd.Categorical(df['Crime Type'], categories=crime_types).codes
+
+        # Duplicated cells are summed (like CrimeMatrix.from_frame), a cell
+        # stays NaN when none of its rows has a value
+        shape = (len(countries), len(years), len(crime_types))
+        cells = np.ravel_multi_index((country_codes, year_codes, crime_codes), shape)
+        source = df['Value'].to_numpy(dtype=float)
+        size = int(np.prod(shape))
+        values = np.bincount(cells, weights=np.nan_to_num(source), minlength=size).reshape(shape)
+        reported = np.bincount(cells, weights=~np.isnan(source), minlength=size).reshape(shape) > 0
+        values[~reported] = np.nan
+        present = np.bincount(cells, minlength=size).reshape(shape) > 0
+
+        # Crime type → category mapping matrix
+        category_matrix = np.zeros((len(crime_types), len(category_names)))
+        for j, name in enumerate(category_names):
+            for crime in categories[name]['crimes']:
+                if crime in crime_types:
+                    category_matrix[crime_types.index(crime), j] = 1.0
+
+        # Missing values count as 0 in the totals, like DataFrame.sum()
+        filled = np.nan_to_num(values)
+        category_totals = filled @ category_matrix
+        totals = filled.sum(axis=2)
+
+        columns = ['lat', 'lon'] + ([label] if label and label != key else [])
+        coordinates = df.groupby(key)[columns].first().reindex(countries)
+        labels = coordinates[label].fillna(pd.Series(countries, index=coordinates.index)).tolist() \
+            if len(columns) == 3 else None
+        return cls(countries, years, crime_types, category_names, values, present,
+                   category_matrix, category_totals, totals,
+                   coordinates['lat'].to_numpy(dtype=float),
+                   coordinates['lon'].to_numpy(dtype=float),
+                   labels)
+
+    def save(self, directory):
+        """Save the arrays as .npy files so that they can be memory-mapped"""
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+        meta = {
+            'countries': self.countries,
+            'years': self.years,
+            'crime_types': self.crime_types,
+            'categories': self.categories,
+            'labels': self.labels
+        }
+        with open(os.path.join(directory, 'cube.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """Load a saved cube, memory-mapping the arrays by default"""
+        with open(os.path.join(directory, 'cube.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+                  for name in ARRAYS}
+        return cls(meta['countries'], meta['years'], meta['crime_types'], meta['categories'],
+                   labels=meta.get('labels'), **arrays)
+
+    def countries_in_year(self, year):
+        """Indices of the countries having at least one row for year"""
+        y = self.year_index[int(year)]
+        return np.flatnonzero(self.present[:, y, :].any(axis=1))
+
+    def crime_rows(self, c, y, category=None):
+        """
+        Crime rows of one country and year as a list of dicts with
+        'Crime Type' and 'Value', optionally restricted to a category.
+        """
+        mask = self.present[c, y]
+        if category is not None:
+            mask = mask & (self.category_matrix[:, self.category_index[category]] > 0)
+        return [{'Crime Type': self.crime_types[k], 'Value': float(self.values[c, y, k])}
+                for k in np.flatnonzero(mask)]
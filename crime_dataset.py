@@ -0,0 +1,393 @@
+import os
+import pandas as pd
+
+# Canonical columnar copy of the merged_crimes_*_french.csv family.
+# Partitioned on disk as crime_dataset/Data Type=<...>/Year=<...>/*.parquet
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_DIR = os.path.join(BASE_DIR, 'crime_dataset')
+
+SOURCE_FILES = [
+    os.path.join(BASE_DIR, 'merged_crimes_per_hundred_thousand_french.csv'),
+    os.path.join(BASE_DIR, 'merged_crimes_number_french.csv'),
+]
+
+COLUMNS = ['Country', 'FIPS', 'ISO2', 'ISO3', 'UN', 'NAME', 'lat', 'lon',
+           'Year', 'Value', 'Crime Type', 'Data Type']
+PARTITION_COLS = ['Data Type', 'Year']
+
+DATA_TYPE_RATE = 'Per hundred thousand inhabitants'
+DATA_TYPE_NUMBER = 'Number'
+
+# Long (Country, Year, Population) dimension built from the World Bank export
+POPULATION_FILE = os.path.join(BASE_DIR, 'populations_worldbank.csv')
+POPULATION_PATH = os.path.join(BASE_DIR, 'population_dim.parquet')
+
+# Sub-national rows keyed by NUTS region code (GEO). The NUTS level is the
+# code length minus the two letters of the country (AT = 0, AT1 = 1,
+# AT13 = 2, AT130 = 3). Partitioned as
+# crime_dataset_regions/Data Type=<...>/Level=<...>/Year=<...>/*.parquet
+REGION_DATASET_DIR = os.path.join(BASE_DIR, 'crime_dataset_regions')
+REGION_SOURCE_FILES = [
+    os.path.join(BASE_DIR, 'merged_crimes_regions_french.csv'),
+]
+REGION_COLUMNS = ['GEO', 'Level', 'Country', 'NAME', 'lat', 'lon',
+                  'Year', 'Value', 'Crime Type', 'Data Type']
+REGION_PARTITION_COLS = ['Data Type', 'Level', 'Year']
+
+# Long (GEO, Year, Population) dimension of the regions (Eurostat demo_r_pjangrp3)
+REGION_POPULATION_FILE = os.path.join(BASE_DIR, 'populations_nuts.csv')
+REGION_POPULATION_PATH = os.path.join(BASE_DIR, 'population_nuts_dim.parquet')
+
+# Compact in-memory types (compact=True of the loaders, read_table): the
+# repeated strings become categorical codes, the years small integers and
+# the measures masked float32/integers (pd.NA where missing). Offence counts
+# are exact in float32 (below 2**24), rates keep 7 significant digits.
+CRIME_SCHEMA = {
+    'Country': 'category', 'FIPS': 'category', 'ISO2': 'category', 'ISO3': 'category',
+    'UN': 'Int16', 'NAME': 'category', 'lat': 'Float32', 'lon': 'Float32',
+    'Year': 'int16', 'Value': 'Float32', 'Crime Type': 'category', 'Data Type': 'category',
+}
+REGION_SCHEMA = {
+    'GEO': 'category', 'Level': 'int8', 'Country': 'category', 'NAME': 'category',
+    'lat': 'Float32', 'lon': 'Float32', 'Year': 'int16', 'Value': 'Float32',
+    'Crime Type': 'category', 'Data Type': 'category',
+}
+POPULATION_SCHEMA = {'Country': 'category', 'GEO': 'category', 'Year': 'int16', 'Population': 'Int32'}
+
+
+def clean_crimes(df):
+    """
+    Coerce a merged crime table to the canonical types once, so that readers
+    of the dataset never have to call pd.to_numeric again.
+
+    Args:
+        df: DataFrame with the merged_crimes_*.csv columns
+
+    Returns:
+        DataFrame restricted to COLUMNS with numeric Year/Value/lat/lon
+    """
+    df = df.copy()
+    # Eurostat marks missing values with ':'
+    df['Value'] = pd.to_numeric(df['Value'].replace(':', None), errors='coerce')
+    for col in ['lat', 'lon', 'UN']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df['Year'] = pd.to_numeric(df['Year'], errors='coerce').astype('int64')
+    df['Crime Type'] = df['Crime Type'].str.strip()
+    for col in ['Country', 'FIPS', 'ISO2', 'ISO3', 'NAME', 'Data Type']:
+        df[col] = df[col].astype(str).where(df[col].notna(), None)
+    return df[COLUMNS]
+
+
+def clean_regions(df, centroids=None):
+    """
+    Coerce a regional crime table to the canonical types.
+
+    Args:
+        df: DataFrame with at least GEO, Year, Value, Crime Type and Data Type
+        centroids: Optional DataFrame GEO, lat, lon filling missing coordinates
+
+    Returns:
+        DataFrame restricted to REGION_COLUMNS
+    """
+    df = df.copy()
+    df['GEO'] = df['GEO'].astype(str).str.strip().str.upper()
+    df['Value'] = pd.to_numeric(df['Value'].replace(':', None), errors='coerce')
+    df['Year'] = pd.to_numeric(df['Year'], errors='coerce').astype('int64')
+    df['Level'] = (df['GEO'].str.len() - 2).astype('int64')
+    if 'Country' not in df.columns:
+        df['Country'] = df['GEO'].str[:2]
+    if 'NAME' not in df.columns:
+        df['NAME'] = df['GEO']
+    for col in ['lat', 'lon']:
+        df[col] = pd.to_numeric(df[col], errors='coerce') if col in df.columns else float('nan')
+    if centroids is not None:
+        located = df[['GEO']].merge(centroids, on='GEO', how='left')
+        df['lat'] = df['lat'].fillna(pd.Series(located['lat'].to_numpy(), index=df.index))
+        df['lon'] = df['lon'].fillna(pd.Series(located['lon'].to_numpy(), index=df.index))
+    df['Crime Type'] = df['Crime Type'].str.strip()
+    for col in ['Country', 'NAME', 'Data Type']:
+        df[col] = df[col].astype(str).where(df[col].notna(), None)
+    return df[REGION_COLUMNS]
+
+
+def apply_schema(df, schema=CRIME_SCHEMA):
+    """
+    Cast the columns of a table to the compact types of schema.
+
+    Columns missing from schema are left as they are, string measures are
+    parsed first (':' and other non-numeric values become missing).
+
+    Args:
+        df: DataFrame, e.g. the result of load_crimes or pd.read_csv
+        schema: Column -> dtype (CRIME_SCHEMA, REGION_SCHEMA, POPULATION_SCHEMA)
+
+    Returns:
+        DataFrame with the same columns and rows
+    """
+    df = df.copy()
+    for col, dtype in schema.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        values = df[col]
+        if dtype != 'category' and not pd.api.types.is_numeric_dtype(values):
+            values = pd.to_numeric(values.replace(':', None), errors='coerce')
+        df[col] = values.astype(dtype)
+    return df
+
+
+def read_table(path, schema=CRIME_SCHEMA, **kwargs):
+    """
+    Read a CSV table directly into the compact types of schema.
+
+    The dimension columns are parsed straight to categoricals, so the
+    repeated strings are never held as Python objects.
+
+    Args:
+        path: CSV file, e.g. merged_crimes_number_french.csv
+        schema: Column -> dtype
+        **kwargs: Passed to pd.read_csv (usecols, ...)
+    """
+    categories = {col: 'category' for col, dtype in schema.items() if dtype == 'category'}
+    df = pd.read_csv(path, encoding='utf-8', dtype=categories, **kwargs)
+    return apply_schema(df, schema)
+
+
+def memory_report(tables):
+    """
+    Memory used by each table, strings included
+
+    Args:
+        tables: Dict name -> DataFrame
+
+    Returns:
+        DataFrame indexed by table name with Rows, Columns, MB and Bytes/row
+    """
+    rows = []
+    for name, df in tables.items():
+        size = int(df.memory_usage(deep=True, index=False).sum())
+        rows.append({'Table': name, 'Rows': len(df), 'Columns': len(df.columns), 'MB': round(size / 1024 / 1024, 3),
+                     'Bytes/row': round(size / len(df), 1) if len(df) else 0.0})
+    return pd.DataFrame(rows, columns=['Table', 'Rows', 'Columns', 'MB', 'Bytes/row']).set_index('Table')
+
+
+def _write_partitions(df, dataset_dir, partition_cols):
+    """Overwrite the partitions of dataset_dir covered by df"""
+    df.to_parquet(
+        dataset_dir,
+        engine='pyarrow',
+        index=False,
+        partition_cols=partition_cols,
+        existing_data_behavior='delete_matching'
+    )
+    print(f"Dataset updated: {dataset_dir} ({len(df)} rows)")
+
+
+def write_crimes(df, dataset_dir=DATASET_DIR):
+    """
+    Write (or replace) the partitions covered by df in the dataset.
+
+    Only the (Data Type, Year) partitions present in df are overwritten,
+    the rest of the dataset is left untouched.
+    """
+    _write_partitions(clean_crimes(df), dataset_dir, PARTITION_COLS)
+
+
+def write_regions(df, dataset_dir=REGION_DATASET_DIR, centroids=None):
+    """Write (or replace) the (Data Type, Level, Year) partitions covered by df"""
+    _write_partitions(clean_regions(df, centroids), dataset_dir, REGION_PARTITION_COLS)
+
+
+def build_dataset(source_files=SOURCE_FILES, dataset_dir=DATASET_DIR):
+    """Build the columnar dataset from the merged CSV files"""
+    for source_file in source_files:
+        if not os.path.exists(source_file):
+            print(f"Source file not found, skipped: {source_file}")
+            continue
+        write_crimes(pd.read_csv(source_file, encoding='utf-8'), dataset_dir)
+
+
+def build_region_dataset(source_files=REGION_SOURCE_FILES, dataset_dir=REGION_DATASET_DIR,
+                         geometry_sources=None):
+    """
+    Build the regional dataset from the merged regional CSV files.
+
+    Regions without coordinates are placed on the centroid of their
+    geometry (see geometry_assets.REGION_GEOMETRY_SOURCES).
+    """
+    from geometry_assets import REGION_GEOMETRY_SOURCES, REGION_KEY_PROPERTY, feature_centroids
+
+    centroids = []
+    for source in (geometry_sources or REGION_GEOMETRY_SOURCES).values():
+        source = os.path.join(BASE_DIR, source)
+        if os.path.exists(source):
+            centroids.append(feature_centroids(source, REGION_KEY_PROPERTY))
+    centroids = pd.concat(centroids).drop_duplicates('GEO') if centroids else None
+
+    for source_file in source_files:
+        if not os.path.exists(source_file):
+            print(f"Source file not found, skipped: {source_file}")
+            continue
+        write_regions(pd.read_csv(source_file, encoding='utf-8'), dataset_dir, centroids)
+
+
+def _read_dataset(dataset_dir, ordered_columns, columns, predicates, schema=None):
+    """
+    Read a partitioned dataset with pushed-down filters and plain partition
+    types, or the compact types of schema when given
+    """
+    options = {}
+    if schema is not None:
+        # Dictionary-encoded string columns come back as categoricals
+        # without building a Python string per row
+        options['read_dictionary'] = [col for col in (columns or ordered_columns)
+                                      if schema.get(col) == 'category' and col not in ['Data Type', 'Year', 'Level']]
+    df = pd.read_parquet(
+        dataset_dir,
+        engine='pyarrow',
+        columns=columns,
+        filters=predicates or None,
+        **options
+    )
+
+    # Partition keys come back as categoricals, restore the plain types
+    for col in ['Year', 'Level']:
+        if col in df.columns:
+            df[col] = df[col].astype('int64')
+    if 'Data Type' in df.columns:
+        df['Data Type'] = df['Data Type'].astype(str)
+
+    if columns is not None:
+        df = df[columns]
+    else:
+        df = df[[col for col in ordered_columns if col in df.columns]]
+    df = df.reset_index(drop=True)
+    return apply_schema(df, schema) if schema is not None else df
+
+
+def load_crimes(columns=None, years=None, data_types=None, filters=None,
+                dataset_dir=DATASET_DIR, compact=False):
+    """
+    Load crime rows from the columnar dataset.
+
+    Partition filters (years, data_types) prune whole directories and
+    any other filter is pushed down to the parquet row groups, so only the
+    requested slice is read from disk.
+
+    Args:
+        columns: List of columns to read (None for all)
+        years: Iterable of years to keep (None for all)
+        data_types: Iterable of data types to keep (None for all)
+        filters: Extra pyarrow filters, e.g. [('NAME', '==', 'France')]
+        dataset_dir: Location of the dataset
+        compact: Return the compact types of CRIME_SCHEMA (categorical
+            dimensions, int16 years, float32 measures) instead of strings,
+            int64 and float64
+
+    Returns:
+        DataFrame with the requested columns and rows
+    """
+    if not os.path.exists(dataset_dir):
+        print(f"Dataset not found, building it in {dataset_dir}")
+        build_dataset(dataset_dir=dataset_dir)
+
+    predicates = list(filters or [])
+    if years is not None:
+        predicates.append(('Year', 'in', [int(year) for year in years]))
+    if data_types is not None:
+        predicates.append(('Data Type', 'in', list(data_types)))
+
+    return _read_dataset(dataset_dir, COLUMNS, columns, predicates, CRIME_SCHEMA if compact else None)
+
+
+def load_regions(columns=None, years=None, data_types=None, levels=None, filters=None,
+                 dataset_dir=REGION_DATASET_DIR, compact=False):
+    """
+    Load regional crime rows, same arguments as load_crimes plus the NUTS
+    levels to keep (e.g. [2] or [3]), which prune whole directories.
+    compact gives the types of REGION_SCHEMA.
+    """
+    if not os.path.exists(dataset_dir):
+        print(f"Regional dataset not found, building it in {dataset_dir}")
+        build_region_dataset(dataset_dir=dataset_dir)
+        if not os.path.exists(dataset_dir):
+            empty = pd.DataFrame(columns=columns or REGION_COLUMNS)
+            return apply_schema(empty, REGION_SCHEMA) if compact else empty
+
+    predicates = list(filters or [])
+    if years is not None:
+        predicates.append(('Year', 'in', [int(year) for year in years]))
+    if data_types is not None:
+        predicates.append(('Data Type', 'in', list(data_types)))
+    if levels is not None:
+        predicates.append(('Level', 'in', [int(level) for level in levels]))
+
+    return _read_dataset(dataset_dir, REGION_COLUMNS, columns, predicates, REGION_SCHEMA if compact else None)
+
+
+def build_population_dim(source_file=POPULATION_FILE, output_path=POPULATION_PATH, key='Country'):
+    """
+    Melt the wide Population_2008..Population_2022 table into a long
+    (key, Year, Population) dimension and store it as parquet.
+
+    A source that is already long (key, Year, Population) is stored as is.
+
+    Returns:
+        DataFrame with one row per key and year
+    """
+    source = pd.read_csv(source_file, encoding='utf-8')
+    if 'Population' in source.columns and 'Year' in source.columns:
+        population = source[[key, 'Year', 'Population']].copy()
+    else:
+        population = source.melt(id_vars=key, var_name='Year', value_name='Population')
+        population['Year'] = population['Year'].str.extract(r'(\d{4})', expand=False)
+    population['Year'] = pd.to_numeric(population['Year'], errors='coerce').astype('int64')
+    population['Population'] = pd.to_numeric(population['Population'], errors='coerce')
+    population = population.sort_values([key, 'Year']).reset_index(drop=True)
+    population.to_parquet(output_path, engine='pyarrow', index=False)
+    print(f"Population dimension saved: {output_path} ({len(population)} rows)")
+    return population
+
+
+def load_population(path=POPULATION_PATH, compact=False):
+    """Load the long population dimension, building it on first use (compact: POPULATION_SCHEMA types)"""
+    if not os.path.exists(path):
+        population = build_population_dim(output_path=path)
+    else:
+        population = pd.read_parquet(path, engine='pyarrow')
+    return apply_schema(population, POPULATION_SCHEMA) if compact else population
+
+
+def load_region_population(path=REGION_POPULATION_PATH, compact=False):
+    """Load the long (GEO, Year, Population) dimension of the regions"""
+    if not os.path.exists(path):
+        population = build_population_dim(REGION_POPULATION_FILE, path, key='GEO')
+    else:
+        population = pd.read_parquet(path, engine='pyarrow')
+    return apply_schema(population, POPULATION_SCHEMA) if compact else population
+
+
+def compare_memory():
+    """Memory of the tables with the plain and the compact types"""
+    tables = {}
+    for compact in [False, True]:
+        suffix = ' (compact)' if compact else ''
+        tables['crimes' + suffix] = load_crimes(compact=compact)
+        tables['population' + suffix] = load_population(compact=compact)
+        if os.path.exists(REGION_DATASET_DIR):
+            tables['regions' + suffix] = load_regions(compact=compact)
+    return memory_report(tables)
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python crime_dataset.py memory: memory report of the loaded tables
+    if len(sys.argv) > 1 and sys.argv[1] == 'memory':
+        print(compare_memory().to_string())
+        sys.exit()
+
+    build_dataset()
+    build_population_dim()
+    build_region_dataset()
+    if os.path.exists(REGION_POPULATION_FILE):
+        build_population_dim(REGION_POPULATION_FILE, REGION_POPULATION_PATH, key='GEO')
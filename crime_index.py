@@ -0,0 +1,309 @@
+import os
+import numpy as np
+import pandas as pd
+
+from index_cache import frame_fingerprint, weights_fingerprint
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Weight (1-10) of each crime type
+WEIGHTS_FILE = os.path.join(BASE_DIR, 'poids_crimes.csv')
+WEIGHT_CRIME_COLUMN = 'Crime'
+WEIGHT_COLUMN = 'Poids (1-10)'
+
+# Every index of every normalization, one row per country and year
+VARIANTS_FILE = 'crime_index_variants.csv'
+
+# Part of the key of the cached results (index_cache.py): bump it when a
+# formula, a normalization or the matching of the weights changes so that
+# older results are not reused
+FORMULA_VERSION = 2
+
+
+def _weighted_rate(terms):
+    """Σ(rate per 100 000 × weight), the Crime_Index of indice_criminaliter.py"""
+    return terms['weighted_sum'] / terms['population'] * 100000
+
+
+def _per_capita(terms):
+    """Σ(number of offences × weight) / population, the index of calcule_INDICE.py"""
+    return terms['weighted_sum'] / terms['population']
+
+
+def _weighted_mean_rate(terms):
+    """Rate per 100 000 averaged over the reported crime types, weighted"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(terms['reported_weight'] > 0,
+                        terms['weighted_sum'] / terms['population'] * 100000 / terms['reported_weight'],
+                        np.nan)
+
+
+# Index formulas, computed from the terms of CrimeMatrix.terms():
+#   weighted_sum     counts @ weights
+#   reported_weight  reported @ weights (sum of the weights of the reported crime types)
+#   population       population of the country-year
+FORMULAS = {
+    'weighted_rate': _weighted_rate,
+    'per_capita': _per_capita,
+    'weighted_mean_rate': _weighted_mean_rate,
+}
+
+
+# Normalizations of the values of a formula, a vector or a (country-year,
+# scenario) array normalized scenario by scenario
+def _normalize_global(values, years):
+    """0-100, 100 being the highest index of all countries and years"""
+    return values / np.nanmax(values, axis=0) * 100
+
+
+def _normalize_per_year(values, years):
+    """0-100, 100 being the highest index of the year"""
+    maxima = pd.DataFrame(values).groupby(years).transform('max').to_numpy()
+    return values / maxima.reshape(values.shape) * 100
+
+
+def _normalize_zscore(values, years):
+    """Distance to the mean of all countries and years, in standard deviations"""
+    return (values - np.nanmean(values, axis=0)) / np.nanstd(values, axis=0, ddof=1)
+
+
+NORMALIZATIONS = {
+    'global': _normalize_global,
+    'per_year': _normalize_per_year,
+    'zscore': _normalize_zscore,
+}
+
+
+def _sorted_categories(values):
+    """Categories of compact tables (crime_dataset.py) sorted, so factorize(sort=True) orders them like strings"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.set_categories(values.cat.categories.sort_values())
+    return values
+
+
+def load_weights(weights=WEIGHTS_FILE, crime_column=WEIGHT_CRIME_COLUMN, weight_column=WEIGHT_COLUMN):
+    """
+    Weight of each crime type
+
+    Args:
+        weights: CSV file (poids_crimes.csv by default), DataFrame with
+            crime_column and weight_column, dict or Series crime type -> weight
+        crime_column: Column of the crime types in a table
+        weight_column: Column of the weights in a table
+
+    Returns:
+        Series of float weights indexed by crime type
+    """
+    if isinstance(weights, str):
+        weights = pd.read_csv(weights, encoding='utf-8')
+    if isinstance(weights, pd.DataFrame):
+        weights = pd.Series(weights[weight_column].to_numpy(), index=weights[crime_column])
+    return pd.Series(weights, dtype=float)
+
+
+class CrimeMatrix:
+    """
+    Country-year × crime type matrix of offence counts.
+
+    The long table is pivoted once, rows are the (country, year) pairs
+    having a population. Missing values count as 0 in `counts` and
+    `reported` tells which cells had a value, so every index formula is a
+    product of these matrices with a weight vector instead of a row-wise
+    apply.
+    """
+
+    def __init__(self, countries, years, crime_types, counts, reported, population, lat=None, lon=None):
+        self.countries = np.asarray(countries, dtype=object)
+        self.years = np.asarray(years, dtype='int64')
+        self.crime_types = list(crime_types)
+        self.counts = counts
+        self.reported = reported
+        self.population = population
+        self.lat = lat
+        self.lon = lon
+
+    @classmethod
+    def from_frame(cls, df, population_df, key='Country'):
+        """
+        Build the matrix from a long crime table.
+
+        Args:
+            df: DataFrame with key, Year, Crime Type, Value and optionally
+                lat and lon columns (':' or NaN for missing values)
+            population_df: Long DataFrame with key, Year and Population columns
+            key: Column identifying the country
+
+        Returns:
+            CrimeMatrix
+        """
+        # Rows without country or year are left out, as by a groupby
+        df = df[df[key].notna() & df['Year'].notna()]
+        values = pd.to_numeric(df['Value'].replace(':', np.nan), errors='coerce').to_numpy(dtype=float)
+        crime_types = df['Crime Type'].astype(str).str.strip()
+        # Rows are the distinct (country, year) pairs, combined from integer codes
+        country_codes, country_keys = pd.factorize(_sorted_categories(df[key]), sort=True)
+        year_codes, year_keys = pd.factorize(pd.to_numeric(df['Year']).astype('int64'), sort=True)
+        pairs, row_codes = np.unique(country_codes * len(year_keys) + year_codes, return_inverse=True)
+        row_keys = pd.MultiIndex.from_arrays([np.asarray(country_keys)[pairs // len(year_keys)],
+                                              np.asarray(year_keys)[pairs % len(year_keys)]])
+        crime_codes, crime_keys = pd.factorize(crime_types, sort=True)
+
+        # Duplicated cells are summed, like the groupby of the former scripts
+        shape = (len(row_keys), len(crime_keys))
+        cells = row_codes * shape[1] + crime_codes
+        counts = np.bincount(cells, weights=np.nan_to_num(values), minlength=shape[0] * shape[1]).reshape(shape)
+        reported = np.bincount(cells, weights=~np.isnan(values), minlength=shape[0] * shape[1]).reshape(shape) > 0
+
+        # Population of each row (inner join on country and year)
+        population = pd.Series(population_df['Population'].to_numpy(dtype=float),
+                               index=pd.MultiIndex.from_arrays([population_df[key],
+                                                                population_df['Year'].astype('int64')]))
+        population = population[~population.index.duplicated()].reindex(row_keys).to_numpy()
+        keep = ~np.isnan(population)
+
+        lat = lon = None
+        if 'lat' in df.columns and 'lon' in df.columns:
+            first = pd.DataFrame({'row': row_codes, 'lat': pd.to_numeric(df['lat'], errors='coerce').to_numpy(),
+                                  'lon': pd.to_numeric(df['lon'], errors='coerce').to_numpy()})
+            first = first.groupby('row').first().reindex(range(shape[0]))
+            lat, lon = first['lat'].to_numpy()[keep], first['lon'].to_numpy()[keep]
+
+        return cls(row_keys.get_level_values(0)[keep], row_keys.get_level_values(1)[keep], list(crime_keys),
+                   counts[keep], reported[keep], population[keep], lat, lon)
+
+    def _align(self, weights):
+        """
+        Rows of weights (Series or DataFrame indexed by crime type) aligned
+        with the crime type columns, 0 for unknown types.
+
+        Crime types are matched exactly, on the stripped labels of the data.
+
+        Returns:
+            tuple: (weights array, boolean array of the known crime types)
+        """
+        weights = weights[~weights.index.duplicated()]
+        aligned = weights.reindex(self.crime_types)
+        known = aligned.notna().to_numpy()
+        return aligned.fillna(0).to_numpy(dtype=float), known if known.ndim == 1 else known.all(axis=1)
+
+    def weight_vector(self, weights):
+        """Weights (anything accepted by load_weights) aligned with the crime type columns"""
+        return self._align(load_weights(weights))
+
+    def weight_matrix(self, scenarios):
+        """
+        Crime type × scenario matrix of a table of weight scenarios
+
+        Args:
+            scenarios: DataFrame indexed by crime type, one column of
+                weights per scenario
+
+        Returns:
+            tuple: (weights array of shape (crime types, scenarios), known crime types)
+        """
+        return self._align(scenarios.astype(float))
+
+    def terms(self, weights):
+        """Matrix-vector products shared by all the formulas (see FORMULAS)"""
+        return self._terms(*self.weight_vector(weights))
+
+    def scenario_terms(self, scenarios):
+        """
+        Terms of every scenario at once: a single matrix product of the
+        counts with the crime type × scenario weight matrix. Each term is a
+        (country-year, scenario) array, so the FORMULAS apply unchanged.
+        """
+        return self._terms(*self.weight_matrix(scenarios))
+
+    def _terms(self, w, known):
+        return {
+            'weighted_sum': self.counts @ w,
+            'reported_weight': self.reported @ w,
+            'weighted_types': self.reported @ known.astype(float),
+            'population': self.population if w.ndim == 1 else self.population[:, np.newaxis],
+        }
+
+    def compute(self, weights=WEIGHTS_FILE, formulas=None, normalizations=None):
+        """
+        Compute every index formula and normalization in one pass.
+
+        Args:
+            weights: Weights, anything accepted by load_weights
+            formulas: Names of FORMULAS to compute (default all)
+            normalizations: Names of NORMALIZATIONS to apply (default all)
+
+        Returns:
+            DataFrame with Country, Year, Population, Weighted_Sum,
+            Weighted_Types (reported crime types having a weight) and, per
+            formula, the raw index and one <formula>_<normalization> column
+            per normalization
+        """
+        formulas = list(FORMULAS) if formulas is None else list(formulas)
+        normalizations = list(NORMALIZATIONS) if normalizations is None else list(normalizations)
+        terms = self.terms(weights)
+
+        result = pd.DataFrame({
+            'Country': self.countries,
+            'Year': self.years,
+            'Population': self.population,
+            'Weighted_Sum': terms['weighted_sum'],
+            'Weighted_Types': terms['weighted_types'].astype('int64'),
+        })
+        if self.lat is not None:
+            result['lat'] = self.lat
+            result['lon'] = self.lon
+        for formula in formulas:
+            values = np.asarray(FORMULAS[formula](terms), dtype=float)
+            result[formula] = values
+            for normalization in normalizations:
+                result[f'{formula}_{normalization}'] = NORMALIZATIONS[normalization](values, self.years)
+        return result
+
+
+def compute_indices(df, population_df, weights=WEIGHTS_FILE, formulas=None, normalizations=None, key='Country',
+                    cache=None):
+    """
+    Pivot a long crime table once and compute all the index variants
+
+    Args:
+        df: Long table of offence counts (Country, Year, Crime Type, Value)
+        population_df: Long (Country, Year, Population) dimension
+        weights: Weights, anything accepted by load_weights
+        formulas: Names of FORMULAS to compute (default all)
+        normalizations: Names of NORMALIZATIONS to apply (default all)
+        key: Column identifying the country
+        cache: IndexCache returning the result of inputs already computed
+            (None to always compute)
+
+    Returns:
+        DataFrame, see CrimeMatrix.compute
+    """
+    formulas = list(FORMULAS) if formulas is None else list(formulas)
+    normalizations = list(NORMALIZATIONS) if normalizations is None else list(normalizations)
+    weights = load_weights(weights)
+
+    if cache is not None:
+        # Only the columns read by the engine are part of the fingerprint
+        columns = [key, 'Year', 'Crime Type', 'Value'] + [col for col in ['lat', 'lon'] if col in df.columns]
+        cache_key = cache.key(FORMULA_VERSION, frame_fingerprint(df[columns]),
+                              frame_fingerprint(population_df[[key, 'Year', 'Population']]),
+                              weights_fingerprint(weights), formulas, normalizations, key)
+        result = cache.get(cache_key)
+        if result is not None:
+            return result
+
+    matrix = CrimeMatrix.from_frame(df, population_df, key)
+    result = matrix.compute(weights, formulas, normalizations)
+    if cache is not None:
+        cache.put(cache_key, result)
+    return result
+
+
+if __name__ == "__main__":
+    from crime_dataset import load_crimes, load_population, DATA_TYPE_NUMBER
+
+    numbers = load_crimes(columns=['Country', 'Year', 'Crime Type', 'Value', 'lat', 'lon'],
+                          data_types=[DATA_TYPE_NUMBER])
+    indices = compute_indices(numbers, load_population())
+    indices.to_csv(VARIANTS_FILE, index=False, encoding='utf-8')
+    print(f"{len(indices)} country-years, {len(indices.columns)} columns saved to {VARIANTS_FILE}")
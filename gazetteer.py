@@ -0,0 +1,190 @@
+import os
+import re
+import unicodedata
+import functools
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Countries of the map with their codes and centroid ('lat: .., lon: ..')
+EUROPE_FILE = os.path.join(BASE_DIR, 'europe.csv')
+
+ENTITY_COLUMNS = ['FIPS', 'ISO2', 'ISO3', 'UN', 'NAME', 'NAME_FR', 'lat', 'lon']
+
+# Entities of the Eurostat tables missing from europe.csv. ISO2 identifies
+# an entity: the parts of the United Kingdom share the ISO3 code GBR.
+# Kosovo, Northern Ireland and Scotland have no English NAME, so the merged
+# tables keep their Eurostat label in the NAME column.
+EXTRA_ENTITIES = [
+    {'FIPS': 'UKEW', 'ISO2': 'XE', 'ISO3': 'XEW', 'UN': 826, 'NAME': 'England and Wales',
+     'lat': 52.3555, 'lon': -1.1743},
+    {'FIPS': 'KV', 'ISO2': 'XK', 'ISO3': 'XKX'},
+    {'FIPS': 'UK', 'ISO2': 'GB-NIR', 'ISO3': 'GBR', 'UN': 826},
+    {'FIPS': 'UK', 'ISO2': 'GB-SCT', 'ISO3': 'GBR', 'UN': 826},
+]
+
+# Centroids corrected after the export of europe.csv, applied to the merged
+# tables by csv-coordinate-replacer.py (see coordinate_overrides)
+COORDINATE_OVERRIDES = {
+    'HR': (45.815399, 15.966568),
+}
+
+# French names, as written in the *_french.csv tables (the Country column)
+FRENCH_NAMES = {
+    'AL': 'Albanie', 'AT': 'Autriche', 'BE': 'Belgique', 'BA': 'Bosnie-Herzégovine', 'BG': 'Bulgarie',
+    'HR': 'Croatie', 'CY': 'Chypre', 'CZ': 'Tchéquie', 'DK': 'Danemark', 'XE': 'Angleterre et Pays de Galles',
+    'EE': 'Estonie', 'FI': 'Finlande', 'FR': 'France', 'DE': 'Allemagne', 'GR': 'Grèce', 'HU': 'Hongrie',
+    'IS': 'Islande', 'IE': 'Irlande', 'IT': 'Italie', 'XK': 'Kosovo*', 'LV': 'Lettonie',
+    'LI': 'Liechtenstein', 'LT': 'Lituanie', 'LU': 'Luxembourg', 'MT': 'Malte', 'ME': 'Monténégro',
+    'NL': 'Pays-Bas', 'MK': 'Macédoine du Nord', 'GB-NIR': 'Irlande du Nord (Royaume-Uni) (NUTS 2021)',
+    'NO': 'Norvège', 'PL': 'Pologne', 'PT': 'Portugal', 'RO': 'Roumanie', 'GB-SCT': 'Écosse (NUTS 2021)',
+    'RS': 'Serbie', 'SK': 'Slovaquie', 'SI': 'Slovénie', 'ES': 'Espagne', 'SE': 'Suède', 'CH': 'Suisse',
+    'TR': 'Turquie', 'GB': 'Royaume-Uni', 'MD': 'Moldavie', 'UA': 'Ukraine', 'BY': 'Biélorussie',
+    'GE': 'Géorgie', 'AM': 'Arménie', 'AZ': 'Azerbaïdjan',
+}
+
+# Other spellings met in the sources (Eurostat labels, older exports, NUTS
+# country and NUTS-1 codes), by ISO2. The English and French names above
+# are aliases already.
+ALIASES = {
+    'CZ': ['Czechia', 'Czech Republic', 'République tchèque'],
+    'XK': ['Kosovo', 'Kosovo (under UNSCR 1244)', 'Kosovo under UNSCR 1244/99'],
+    'GB-NIR': ['Irlande du Nord', 'Northern Ireland', 'Northern Ireland (UK) (NUTS 2021)', 'Northern Ireland (UK)',
+               'UKN'],
+    'GB-SCT': ['Écosse', 'Scotland', 'Scotland (NUTS 2021)', 'UKM'],
+    'TR': ['Turkey', 'Türkiye'],
+    'MK': ['North Macedonia', 'The former Yugoslav Republic of Macedonia', 'Macedonia'],
+    'GR': ['EL'],
+    'GB': ['UK'],
+    'MD': ['Moldova', 'Republic of Moldova'],
+}
+
+
+def normalize_name(name):
+    """Lowercase name without diacritics, footnote marks and extra spaces"""
+    name = unicodedata.normalize('NFD', str(name))
+    name = ''.join(c for c in name if unicodedata.category(c) != 'Mn').lower()
+    return re.sub(r'\s+', ' ', name.replace('*', '')).strip()
+
+
+def _parse_coordinates(coordinates):
+    """'lat: 41.14, lon: 20.06' column -> (lat, lon) float columns"""
+    parts = coordinates.str.extract(r'lat:\s*([-\d.]+).*lon:\s*([-\d.]+)')
+    return parts[0].astype(float), parts[1].astype(float)
+
+
+@functools.lru_cache(maxsize=None)
+def load_entities(europe_file=EUROPE_FILE):
+    """
+    Entity table: codes, English and French names and centroid per ISO2
+
+    Args:
+        europe_file: europe.csv export (FIPS, ISO2, ISO3, UN, NAME and
+            optionally Coordinate columns)
+
+    Returns:
+        DataFrame indexed by ISO2 with the ENTITY_COLUMNS (ISO2 included)
+    """
+    entities = pd.read_csv(europe_file, keep_default_na=False, na_values=[''])
+    if 'Coordinate' in entities.columns:
+        entities['lat'], entities['lon'] = _parse_coordinates(entities['Coordinate'].astype(str))
+    extra = pd.DataFrame(EXTRA_ENTITIES)
+    entities = pd.concat([entities, extra[~extra['ISO2'].isin(entities['ISO2'])]], ignore_index=True)
+    entities = entities.reindex(columns=ENTITY_COLUMNS)
+    entities['NAME_FR'] = entities['ISO2'].map(FRENCH_NAMES)
+    return entities.drop_duplicates('ISO2').set_index('ISO2', drop=False)
+
+
+@functools.lru_cache(maxsize=None)
+def alias_table(europe_file=EUROPE_FILE):
+    """
+    Normalized name -> ISO2 lookup of every entity
+
+    Built from the English and French names, the aliases and the codes
+    themselves (ISO2, ISO3 when it identifies a single entity).
+
+    Returns:
+        Series indexed by normalized name
+    """
+    entities = load_entities(europe_file)
+    pairs = [(name, iso2) for iso2, name in entities['NAME'].dropna().items()]
+    pairs += [(name, iso2) for iso2, name in entities['NAME_FR'].dropna().items()]
+    pairs += [(name, iso2) for iso2, names in ALIASES.items() if iso2 in entities.index for name in names]
+    pairs += [(iso2, iso2) for iso2 in entities.index]
+    unique_iso3 = entities['ISO3'].dropna().drop_duplicates(keep=False)
+    pairs += [(iso3, iso2) for iso2, iso3 in unique_iso3.items()]
+    table = pd.DataFrame(pairs, columns=['alias', 'ISO2'])
+    table['alias'] = table['alias'].map(normalize_name)
+    # The first spelling wins: names before aliases before codes
+    return table.drop_duplicates('alias').set_index('alias')['ISO2']
+
+
+def resolve(names, columns=None, europe_file=EUROPE_FILE):
+    """
+    Resolve a whole column of country names (or codes) in one lookup
+
+    Only the distinct names are normalized, the rows are then matched with
+    a single categorical take, so the cost does not grow with Python calls
+    per row.
+
+    Args:
+        names: Series (or list) of names in any known spelling
+        columns: Entity columns to return (default ENTITY_COLUMNS)
+        europe_file: europe.csv export of the entity table
+
+    Returns:
+        DataFrame aligned with names, NaN where a name is unknown (UN is
+        an Int64 column, written without decimals)
+    """
+    names = pd.Series(names)
+    columns = ENTITY_COLUMNS if columns is None else list(columns)
+    entities = load_entities(europe_file)
+    codes, uniques = pd.factorize(names)
+    iso2 = pd.Series(uniques, dtype=object).map(normalize_name).map(alias_table(europe_file))
+    resolved = entities.reindex(iso2)[columns].reset_index(drop=True)
+    # -1 (missing name) takes the extra all-NaN row
+    resolved = pd.concat([resolved, pd.DataFrame(np.nan, index=[len(resolved)], columns=columns)])
+    result = resolved.iloc[np.where(codes < 0, len(uniques), codes)].reset_index(drop=True)
+    result.index = names.index
+    if 'UN' in result.columns:
+        result['UN'] = result['UN'].astype('Int64')
+    return result
+
+
+def coordinate_overrides(names, europe_file=EUROPE_FILE):
+    """
+    Corrected centroids (COORDINATE_OVERRIDES) of a column of names
+
+    Returns:
+        DataFrame aligned with names with lat and lon columns, NaN for the
+        countries without a correction
+    """
+    iso2 = resolve(names, ['ISO2'], europe_file)['ISO2']
+    overrides = pd.DataFrame.from_dict(COORDINATE_OVERRIDES, orient='index', columns=['lat', 'lon'])
+    return overrides.reindex(iso2).set_axis(iso2.index)
+
+
+def resolve_code(name, column='ISO3', europe_file=EUROPE_FILE):
+    """Code (or other entity column) of a single name, None when unknown"""
+    value = resolve([name], [column], europe_file)[column].iloc[0]
+    return None if pd.isna(value) else value
+
+
+def unresolved(names, europe_file=EUROPE_FILE):
+    """Distinct names that the gazetteer does not know"""
+    names = pd.Series(names).dropna().unique()
+    return sorted(name for name, iso2 in
+                  zip(names, resolve(names, ['ISO2'], europe_file)['ISO2']) if pd.isna(iso2))
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Usage: python gazetteer.py file.csv [column], lists the unknown names
+    if len(sys.argv) > 1:
+        column = sys.argv[2] if len(sys.argv) > 2 else 'Country'
+        missing = unresolved(pd.read_csv(sys.argv[1], usecols=[column])[column])
+        print(f"{len(missing)} unknown names in {sys.argv[1]}: {missing}")
+    else:
+        print(load_entities().to_string())
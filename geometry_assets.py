@@ -0,0 +1,368 @@
+import os
+import json
+import math
+import numpy as np
+
+# Source geometry and the simplification levels built from it.
+# Tolerances are in degrees (Douglas-Peucker distance).
+GEOMETRY_SOURCE = 'europe.geojson'
+TOLERANCES = {
+    'high': 0.005,
+    'medium': 0.02,
+    'low': 0.08
+}
+# Number of grid steps across the bounding box (same meaning as topojson -q)
+QUANTIZATION = 100000
+# Global variable holding the geometry in the generated .js assets
+JS_VARIABLE = 'EUROPE_GEOMETRY'
+
+# Regional geometry (GISCO NUTS boundaries, EPSG:4326 GeoJSON), one file per
+# NUTS level next to europa.gpkg. Features are identified by NUTS_ID.
+REGION_GEOMETRY_SOURCES = {
+    2: 'NUTS_RG_20M_2021_4326_LEVL_2.geojson',
+    3: 'NUTS_RG_20M_2021_4326_LEVL_3.geojson'
+}
+REGION_KEY_PROPERTY = 'NUTS_ID'
+
+
+def _douglas_peucker(points, tolerance):
+    """Return the indices of points kept by Douglas-Peucker (ends always kept)"""
+    n = len(points)
+    if n <= 2:
+        return list(range(n))
+    pts = np.asarray(points, dtype=float)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = pts[end] - pts[start]
+        offsets = pts[start + 1:end] - pts[start]
+        length = math.hypot(segment[0], segment[1])
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        i = int(np.argmax(distances))
+        if distances[i] > tolerance:
+            index = start + 1 + i
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    return list(np.flatnonzero(keep))
+
+
+def _polygons(geometry):
+    """List of polygons (list of rings) of a Polygon or MultiPolygon"""
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    return geometry['coordinates']
+
+
+def _ring_centroid(ring):
+    """Area-weighted centroid (x, y) and absolute area of a ring (shoelace formula)"""
+    pts = np.asarray(ring, dtype=float)
+    x, y = pts[:, 0], pts[:, 1]
+    x1, y1 = np.roll(x, -1), np.roll(y, -1)
+    cross = x * y1 - x1 * y
+    area = cross.sum() / 2
+    if area == 0:
+        return (float(x.mean()), float(y.mean())), 0.0
+    cx = ((x + x1) * cross).sum() / (6 * area)
+    cy = ((y + y1) * cross).sum() / (6 * area)
+    return (float(cx), float(cy)), abs(float(area))
+
+
+def feature_centroids(source, key_property=REGION_KEY_PROPERTY):
+    """
+    Marker position of every feature of a GeoJSON file: the centroid of its
+    largest polygon, so that overseas parts do not pull the marker away.
+
+    Returns:
+        DataFrame with GEO, lat and lon columns
+    """
+    import pandas as pd
+
+    with open(source, 'r', encoding='utf-8') as f:
+        features = json.load(f)['features']
+
+    rows = []
+    for feature in features:
+        if not feature.get('geometry'):
+            continue
+        best = None
+        for polygon in _polygons(feature['geometry']):
+            (x, y), area = _ring_centroid(polygon[0])
+            if best is None or area > best[1]:
+                best = ((x, y), area)
+        if best is not None:
+            (x, y), _ = best
+            rows.append({'GEO': feature['properties'][key_property], 'lat': y, 'lon': x})
+    return pd.DataFrame(rows, columns=['GEO', 'lat', 'lon'])
+
+
+class _Topology:
+    """
+    Quantized rings split into arcs at the junctions between features.
+
+    A vertex is a junction when the set of rings using it differs from the
+    set of one of its neighbours. Each arc shared by two features is stored
+    once and simplified once, so neighbouring borders stay identical.
+    """
+
+    def __init__(self, features, quantization):
+        xs, ys = [], []
+        for feature in features:
+            for polygon in _polygons(feature['geometry']):
+                for ring in polygon:
+                    for x, y in ring:
+                        xs.append(x)
+                        ys.append(y)
+        self.x0, self.y0 = min(xs), min(ys)
+        self.kx = (max(xs) - self.x0) / (quantization - 1) or 1
+        self.ky = (max(ys) - self.y0) / (quantization - 1) or 1
+
+        # Quantize every ring, dropping the closing point and duplicates
+        self.rings = []
+        self.shapes = []
+        for feature in features:
+            shape = []
+            for polygon in _polygons(feature['geometry']):
+                ring_ids = []
+                for ring in polygon:
+                    quantized = []
+                    for x, y in ring:
+                        point = (round((x - self.x0) / self.kx), round((y - self.y0) / self.ky))
+                        if not quantized or quantized[-1] != point:
+                            quantized.append(point)
+                    if len(quantized) > 1 and quantized[0] == quantized[-1]:
+                        quantized.pop()
+                    if len(quantized) >= 3:
+                        ring_ids.append(len(self.rings))
+                        self.rings.append(quantized)
+                if ring_ids:
+                    shape.append(ring_ids)
+            self.shapes.append(shape)
+
+        owners = {}
+        for ring_id, ring in enumerate(self.rings):
+            for point in ring:
+                owners.setdefault(point, set()).add(ring_id)
+        self.owners = {point: frozenset(ids) for point, ids in owners.items()}
+
+        self.arcs = []
+        self.arc_index = {}
+        self.ring_arcs = [self._split(ring) for ring in self.rings]
+
+    def _split(self, ring):
+        """Split a ring into arcs and return their signed indices"""
+        n = len(ring)
+        fixed = [i for i in range(n)
+                 if self.owners[ring[i]] != self.owners[ring[i - 1]]
+                 or self.owners[ring[i]] != self.owners[ring[(i + 1) % n]]]
+        if not fixed:
+            # Isolated ring: cut at the first vertex and the farthest one
+            start = np.asarray(ring[0], dtype=float)
+            distances = np.hypot(*(np.asarray(ring, dtype=float) - start).T)
+            fixed = sorted({0, int(np.argmax(distances))})
+        if len(fixed) == 1:
+            fixed.append((fixed[0] + n // 2) % n)
+            fixed.sort()
+
+        refs = []
+        for j, start in enumerate(fixed):
+            end = fixed[(j + 1) % len(fixed)]
+            if end > start:
+                arc = ring[start:end + 1]
+            else:
+                arc = ring[start:] + ring[:end + 1]
+            refs.append(self._register(arc))
+        return refs
+
+    def _register(self, arc):
+        """Store an arc once whatever its direction, return its signed index"""
+        arc = tuple(arc)
+        reverse = arc[::-1]
+        if arc in self.arc_index:
+            return self.arc_index[arc]
+        if reverse in self.arc_index:
+            return ~self.arc_index[reverse]
+        self.arc_index[arc] = len(self.arcs)
+        self.arcs.append(arc)
+        return self.arc_index[arc]
+
+    def simplified_arcs(self, tolerance):
+        """Simplify every arc with a tolerance given in degrees"""
+        grid_tolerance = tolerance / min(self.kx, self.ky)
+        return [[arc[i] for i in _douglas_peucker(arc, grid_tolerance)] for arc in self.arcs]
+
+    def ring_points(self, ring_id, arcs):
+        """Rebuild a closed ring from its (simplified) arcs, None if it collapsed"""
+        points = []
+        for ref in self.ring_arcs[ring_id]:
+            arc = arcs[ref] if ref >= 0 else arcs[~ref][::-1]
+            points.extend(arc if not points else arc[1:])
+        if len(set(points)) < 3:
+            return None
+        return points
+
+    def simplified_shape(self, shape, arcs):
+        """
+        Polygons of a feature after simplification, as lists of
+        (ring_id, points). Polygons whose exterior ring collapsed are
+        dropped, holes that collapsed are removed. A feature is never
+        emptied: if every polygon collapsed its original rings are kept
+        with points set to None.
+        """
+        polygons = []
+        for ring_ids in shape:
+            exterior = self.ring_points(ring_ids[0], arcs)
+            if exterior is None:
+                continue
+            polygon = [(ring_ids[0], exterior)]
+            for ring_id in ring_ids[1:]:
+                points = self.ring_points(ring_id, arcs)
+                if points is not None:
+                    polygon.append((ring_id, points))
+            polygons.append(polygon)
+        if not polygons and shape:
+            polygons = [[(ring_id, None) for ring_id in ring_ids] for ring_ids in shape]
+        return polygons
+
+    def original_ring(self, ring_id):
+        """Closed, unsimplified quantized ring"""
+        return self.rings[ring_id] + [self.rings[ring_id][0]]
+
+
+def _decimals(step):
+    """Number of decimals needed to represent a quantization step"""
+    return max(0, int(math.ceil(-math.log10(step))) + 1)
+
+
+def to_geojson(topology, features, arcs):
+    """Dequantized GeoJSON FeatureCollection from simplified arcs"""
+    digits_x, digits_y = _decimals(topology.kx), _decimals(topology.ky)
+    output = []
+    for feature, shape in zip(features, topology.shapes):
+        polygons = []
+        for polygon in topology.simplified_shape(shape, arcs):
+            polygons.append([
+                [[round(topology.x0 + x * topology.kx, digits_x), round(topology.y0 + y * topology.ky, digits_y)]
+                 for x, y in (points if points is not None else topology.original_ring(ring_id))]
+                for ring_id, points in polygon
+            ])
+        if not polygons:
+            continue
+        if len(polygons) == 1:
+            geometry = {'type': 'Polygon', 'coordinates': polygons[0]}
+        else:
+            geometry = {'type': 'MultiPolygon', 'coordinates': polygons}
+        output.append({'type': 'Feature', 'properties': feature['properties'], 'geometry': geometry})
+    return {'type': 'FeatureCollection', 'features': output}
+
+
+def to_topojson(topology, features, arcs, object_name='europe'):
+    """TopoJSON topology with quantized, delta-encoded arcs"""
+    arcs = list(arcs)
+    geometries = []
+    for feature, shape in zip(features, topology.shapes):
+        polygons = []
+        for polygon in topology.simplified_shape(shape, arcs):
+            rings = []
+            for ring_id, points in polygon:
+                if points is None:
+                    # Collapsed feature kept at full resolution as its own arc
+                    arcs.append(topology.original_ring(ring_id))
+                    rings.append([len(arcs) - 1])
+                else:
+                    rings.append(topology.ring_arcs[ring_id])
+            polygons.append(rings)
+        if not polygons:
+            continue
+        if len(polygons) == 1:
+            geometry = {'type': 'Polygon', 'arcs': polygons[0]}
+        else:
+            geometry = {'type': 'MultiPolygon', 'arcs': polygons}
+        geometry['properties'] = feature['properties']
+        geometries.append(geometry)
+
+    encoded = []
+    for arc in arcs:
+        previous = (0, 0)
+        deltas = []
+        for point in arc:
+            deltas.append([point[0] - previous[0], point[1] - previous[1]])
+            previous = point
+        encoded.append(deltas)
+
+    return {
+        'type': 'Topology',
+        'transform': {'scale': [topology.kx, topology.ky], 'translate': [topology.x0, topology.y0]},
+        'objects': {object_name: {'type': 'GeometryCollection', 'geometries': geometries}},
+        'arcs': encoded
+    }
+
+
+def geometry_asset_name(level, fmt='geojson', name='europe'):
+    """Relative path (from the site root) of the .js asset of a level"""
+    return f'assets/{name}_{level}_{fmt}.js'
+
+
+def build_geometry_assets(output_dir, source=GEOMETRY_SOURCE, tolerances=TOLERANCES,
+                          fmt='geojson', quantization=QUANTIZATION, name='europe', properties=None):
+    """
+    Build the simplified geometry assets of every level.
+
+    For each level two files are written in output_dir/assets: the plain
+    .geojson/.topojson document and a .js wrapper assigning it to
+    window.EUROPE_GEOMETRY, which the year maps load with a <script> tag so
+    that it is downloaded once, cached by the browser and works from file://.
+
+    Args:
+        output_dir: Site directory (e.g. 'crime_maps')
+        source: Source GeoJSON file
+        tolerances: Dict level -> simplification tolerance in degrees
+        fmt: 'geojson' or 'topojson'
+        quantization: Number of grid steps across the bounding box
+        name: Prefix of the asset files (e.g. 'nuts3' for the regions)
+        properties: Feature properties to keep (None keeps them all), which
+            keeps the regional assets small
+
+    Returns:
+        dict: level -> list of written paths, relative to output_dir
+    """
+    with open(source, 'r', encoding='utf-8') as f:
+        features = json.load(f)['features']
+    features = [feature for feature in features if feature.get('geometry')]
+    if properties is not None:
+        features = [dict(feature, properties={key: feature['properties'].get(key) for key in properties})
+                    for feature in features]
+
+    topology = _Topology(features, quantization)
+    os.makedirs(os.path.join(output_dir, 'assets'), exist_ok=True)
+
+    written = {}
+    for level, tolerance in tolerances.items():
+        arcs = topology.simplified_arcs(tolerance)
+        if fmt == 'topojson':
+            document = to_topojson(topology, features, arcs, object_name=name)
+        else:
+            document = to_geojson(topology, features, arcs)
+        payload = json.dumps(document, separators=(',', ':'), ensure_ascii=False)
+
+        data_file = f'assets/{name}_{level}.{fmt}'
+        js_file = geometry_asset_name(level, fmt, name)
+        with open(os.path.join(output_dir, data_file), 'w', encoding='utf-8') as f:
+            f.write(payload)
+        with open(os.path.join(output_dir, js_file), 'w', encoding='utf-8') as f:
+            f.write(f'window.{JS_VARIABLE} = {payload};\n')
+        written[level] = [data_file, js_file]
+        print(f"Geometry {name} '{level}' ({fmt}): {len(payload) / 1024:.0f} KB")
+    return written
+
+
+if __name__ == "__main__":
+    build_geometry_assets('crime_maps')
+    build_geometry_assets('crime_maps', fmt='topojson')
@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import requests
+from requests.structures import CaseInsensitiveDict
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Responses of the reference data APIs (World Bank, Eurostat, gazetteers),
+# which change at most once a year
+CACHE_DIR = os.path.join(BASE_DIR, 'http_cache')
+# Age after which an entry is revalidated with the server (ETag / Last-Modified)
+DEFAULT_TTL = 30 * 24 * 3600
+# Least recently used entries are evicted above this total size
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+# HTTP_CACHE_OFFLINE=1 serves everything from the cache, without any request
+OFFLINE = os.environ.get('HTTP_CACHE_OFFLINE', '') not in ('', '0')
+
+# Response headers kept with the body
+STORED_HEADERS = ['Content-Type', 'ETag', 'Last-Modified']
+
+
+class OfflineError(requests.RequestException):
+    """Raised in offline mode when a request has no cached response"""
+
+
+class HttpCache:
+    """
+    Persistent cache of GET responses, keyed by URL and query parameters.
+
+    It is used in place of a requests.Session (same get() signature) and
+    returns requests.Response objects, with from_cache set to True when no
+    request was made. Fresh entries (younger than ttl) are served directly,
+    older ones are revalidated with If-None-Match / If-Modified-Since and
+    served again on a 304. Only 200 responses are stored, so errors are
+    retried by the caller as before. APIs answering errors with a 200 (e.g.
+    the World Bank) need a validate callback: a body it rejects is not
+    stored, and a cached one it rejects is dropped and requested again.
+
+    Each entry is a <key>.body file and a <key>.json file holding the URL,
+    the parameters, the kept headers and the storage time. The modification
+    time of the body is the last use, from which the least recently used
+    entries are evicted when the cache exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=MAX_CACHE_BYTES, offline=OFFLINE,
+                 session=None):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.session = session if session is not None else requests.Session()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    @staticmethod
+    def key(url, params=None):
+        """Digest identifying a request, independent of the parameter order"""
+        items = sorted((str(name), str(value)) for name, value in (params or {}).items())
+        return hashlib.sha256(json.dumps([url, items]).encode('utf-8')).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + '.body', base + '.json'
+
+    def _read(self, key):
+        """Metadata and body of an entry, None when absent or unreadable"""
+        body_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return meta, body
+
+    def _write(self, key, meta, body=None):
+        """Atomically replace the metadata (and the body when given) of an entry"""
+        body_path, meta_path = self._paths(key)
+        suffix = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        if body is not None:
+            with open(body_path + suffix, 'wb') as f:
+                f.write(body)
+            os.replace(body_path + suffix, body_path)
+        with open(meta_path + suffix, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + suffix, meta_path)
+
+    def _remove(self, key):
+        """Delete the files of an entry"""
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _touch(self, key):
+        """Mark an entry as just used (for the LRU eviction)"""
+        try:
+            os.utime(self._paths(key)[0])
+        except OSError:
+            pass
+
+    @staticmethod
+    def _response(meta, body, from_cache):
+        response = requests.Response()
+        response._content = body
+        response.status_code = 200
+        response.url = meta['url']
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.from_cache = from_cache
+        return response
+
+    def get(self, url, params=None, validate=None, **kwargs):
+        """
+        GET url with params through the cache.
+
+        Args:
+            url: Requested URL
+            params: Query parameters (part of the cache key)
+            validate: Function response -> bool telling whether a 200
+                response is worth caching (None: every 200 is)
+            **kwargs: Passed to requests.Session.get (timeout, ...)
+
+        Returns:
+            requests.Response
+        """
+        key = self.key(url, params)
+        entry = self._read(key)
+        if entry is not None and validate is not None and not validate(self._response(*entry, True)):
+            # Error body stored before the caller could reject it
+            self._remove(key)
+            entry = None
+        if entry is not None:
+            meta, body = entry
+            if self.offline or time.time() - meta['stored_at'] < self.ttl:
+                self._touch(key)
+                return self._response(meta, body, True)
+        elif self.offline:
+            raise OfflineError(f"Offline mode, no cached response for {url} {params or ''}")
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry is not None:
+            if meta['headers'].get('ETag'):
+                headers['If-None-Match'] = meta['headers']['ETag']
+            if meta['headers'].get('Last-Modified'):
+                headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+        try:
+            response = self.session.get(url, params=params, headers=headers, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if entry is None:
+                raise
+            # A stale copy is better than nothing for reference data
+            print(f"Serving stale cached response for {url}: {str(e)}")
+            self._touch(key)
+            return self._response(meta, body, True)
+
+        if response.status_code == 304 and entry is not None:
+            meta['stored_at'] = time.time()
+            self._write(key, meta)
+            self._touch(key)
+            return self._response(meta, body, True)
+        if response.status_code == 200 and (validate is None or validate(response)):
+            meta = {
+                'url': url,
+                'params': {str(name): str(value) for name, value in (params or {}).items()},
+                'headers': {name: response.headers[name] for name in STORED_HEADERS if name in response.headers},
+                'stored_at': time.time()
+            }
+            self._write(key, meta, response.content)
+            self.evict()
+        response.from_cache = False
+        return response
+
+    def size(self):
+        """Total size of the cached bodies, in bytes"""
+        return sum(entry.stat().st_size for entry in os.scandir(self.cache_dir) if entry.name.endswith('.body'))
+
+    def evict(self, max_bytes=None):
+        """
+        Delete the least recently used entries until the cache fits in max_bytes
+
+        Returns:
+            int: Number of deleted entries
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            bodies = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.body')]
+            stats = sorted(((entry.stat().st_mtime, entry.stat().st_size, entry.name[:-len('.body')])
+                            for entry in bodies))
+            total = sum(size for _, size, _ in stats)
+            removed = 0
+            for _, size, key in stats:
+                if total <= max_bytes:
+                    break
+                self._remove(key)
+                total -= size
+                removed += 1
+            return removed
+
+    def clear(self):
+        """Delete every entry"""
+        return self.evict(0)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="HTTP response cache of the reference data")
+    parser.add_argument('command', choices=['info', 'clear'])
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args()
+
+    cache = HttpCache(args.cache_dir)
+    if args.command == 'clear':
+        print(f"{cache.clear()} cached responses deleted from {args.cache_dir}")
+    else:
+        entries = sum(1 for entry in os.scandir(args.cache_dir) if entry.name.endswith('.body'))
+        print(f"{entries} cached responses, {cache.size() / 1024 / 1024:.1f} MB in {args.cache_dir}")
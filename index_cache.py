@@ -0,0 +1,150 @@
+import os
+import json
+import hashlib
+import threading
+import pandas as pd
+import pyarrow as pa
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Results of crime_index.compute_indices, one parquet file per input combination
+CACHE_DIR = os.path.join(BASE_DIR, 'index_cache')
+# Least recently used results are evicted above this total size
+MAX_CACHE_BYTES = 100 * 1024 * 1024
+
+_default_cache = None
+
+
+def _hash_array(digest, array):
+    """Feed the Arrow buffers of array (and of its dictionary) to digest"""
+    digest.update(f'{array.offset}:{len(array)}'.encode('utf-8'))
+    for buffer in array.buffers():
+        if buffer is not None:
+            digest.update(buffer)
+    if pa.types.is_dictionary(array.type):
+        _hash_array(digest, array.dictionary)
+
+
+def frame_fingerprint(df):
+    """
+    Digest of the content of a DataFrame (columns, types and values)
+
+    The Arrow buffers of the columns are hashed as they are, without
+    hashing the values one by one, so a fingerprint costs about a copy of
+    the data. Equal frames stored differently (e.g. a slice of a larger
+    one) may get different digests, which only costs a recomputation.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    digest = hashlib.sha256(json.dumps([[field.name, str(field.type)] for field in table.schema]).encode('utf-8'))
+    for column in table.columns:
+        for chunk in column.chunks:
+            _hash_array(digest, chunk)
+    return digest.hexdigest()
+
+
+def weights_fingerprint(weights):
+    """Digest of a set of weights (Series indexed by crime type), independent of their order"""
+    items = sorted((str(crime), float(weight)) for crime, weight in weights.items())
+    return hashlib.sha256(json.dumps(items).encode('utf-8')).hexdigest()
+
+
+class IndexCache:
+    """
+    Persistent cache of the crime index results.
+
+    An entry is keyed by the fingerprints of the crime table, of the
+    population and of the weights, by the formula version of crime_index.py
+    and by the requested formulas and normalizations, so any change of the
+    inputs or of the formulas gives a new key and an unchanged call is
+    served from disk without recomputation. The modification time of an
+    entry is its last use, from which the least recently used entries are
+    evicted when the cache exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        """Digest identifying a computation from its fingerprints and arguments"""
+        return hashlib.sha256(json.dumps(parts, default=str).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.parquet')
+
+    def get(self, key):
+        """Cached result of key, None when absent or unreadable"""
+        path = self._path(key)
+        try:
+            result = pd.read_parquet(path, engine='pyarrow')
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return result
+
+    def put(self, key, result):
+        """Store a result (atomically replacing any previous one) and evict the old entries"""
+        path = self._path(key)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        result.to_parquet(temp_path, engine='pyarrow', index=False)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def size(self):
+        """Total size of the cached results, in bytes"""
+        return sum(entry.stat().st_size for entry in os.scandir(self.cache_dir) if entry.name.endswith('.parquet'))
+
+    def evict(self, max_bytes=None):
+        """
+        Delete the least recently used entries until the cache fits in max_bytes
+
+        Returns:
+            int: Number of deleted entries
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            entries = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                             for entry in os.scandir(self.cache_dir) if entry.name.endswith('.parquet'))
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in entries:
+                if total <= max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+                removed += 1
+            return removed
+
+    def clear(self):
+        """Delete every entry"""
+        return self.evict(0)
+
+
+def default_cache():
+    """Cache in CACHE_DIR shared by the scripts of a process"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = IndexCache()
+    return _default_cache
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cache of the crime index results")
+    parser.add_argument('command', choices=['info', 'clear'])
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args()
+
+    cache = IndexCache(args.cache_dir)
+    if args.command == 'clear':
+        print(f"{cache.clear()} cached results deleted from {args.cache_dir}")
+    else:
+        entries = sum(1 for entry in os.scandir(args.cache_dir) if entry.name.endswith('.parquet'))
+        print(f"{entries} cached results, {cache.size() / 1024 / 1024:.1f} MB in {args.cache_dir}")
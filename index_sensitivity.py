@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+from crime_index import (CrimeMatrix, FORMULAS, NORMALIZATIONS, WEIGHTS_FILE, WEIGHT_CRIME_COLUMN,
+                         load_weights)
+
+# Ranking of each country-year under the weight scenarios
+SENSITIVITY_FILE = 'crime_index_sensitivity.csv'
+
+# Monte Carlo perturbations of poids_crimes.csv: each weight plus a normal
+# noise of DEFAULT_SPREAD points, kept within the 1-10 scale
+DEFAULT_SAMPLES = 1000
+DEFAULT_SPREAD = 1.0
+WEIGHT_RANGE = (1, 10)
+
+# Confidence band of the normalized index and of the rank
+BAND_QUANTILES = (0.05, 0.95)
+
+
+def sample_scenarios(weights=WEIGHTS_FILE, samples=DEFAULT_SAMPLES, spread=DEFAULT_SPREAD, seed=0,
+                     weight_range=WEIGHT_RANGE):
+    """
+    Monte Carlo perturbations of a set of weights
+
+    Args:
+        weights: Reference weights, anything accepted by load_weights
+        samples: Number of scenarios
+        spread: Standard deviation of the noise added to each weight
+        seed: Random seed, the same arguments always give the same scenarios
+        weight_range: (min, max) the perturbed weights are clipped to
+
+    Returns:
+        DataFrame indexed by crime type, one column of weights per scenario
+    """
+    weights = load_weights(weights)
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(0, spread, size=(len(weights), samples))
+    values = np.clip(weights.to_numpy()[:, np.newaxis] + noise, *weight_range)
+    return pd.DataFrame(values, index=weights.index, columns=[f'scenario_{i}' for i in range(samples)])
+
+
+def load_scenarios(path, crime_column=WEIGHT_CRIME_COLUMN):
+    """
+    User-supplied weight scenarios: a table like poids_crimes.csv with one
+    weight column per scenario
+
+    Returns:
+        DataFrame indexed by crime type, one column of weights per scenario
+    """
+    return pd.read_csv(path, encoding='utf-8').set_index(crime_column).astype(float)
+
+
+def rank_within_years(values, years):
+    """Rank of each country in its year (1 = highest index), scenario by scenario"""
+    return pd.DataFrame(values).groupby(years).rank(ascending=False, method='min').to_numpy()
+
+
+def _neighbours(baseline, years):
+    """Row of the country ranked just above each row in its year by the baseline, -1 for the first"""
+    order = np.lexsort((-np.nan_to_num(baseline, nan=-np.inf), years))
+    above = np.full(len(baseline), -1)
+    same_year = years[order][1:] == years[order][:-1]
+    above[order[1:][same_year]] = order[:-1][same_year]
+    return above
+
+
+def analyse_scenarios(matrix, scenarios, base_weights=WEIGHTS_FILE, formula='weighted_rate',
+                      normalization='per_year', quantiles=BAND_QUANTILES):
+    """
+    Evaluate all the weight scenarios at once and summarize the rankings
+
+    The index of every country-year under every scenario comes from one
+    product of the crime matrix with the crime type × scenario weight
+    matrix, then the countries are ranked within each year, scenario by
+    scenario, and compared with the ranking of the reference weights.
+
+    Args:
+        matrix: CrimeMatrix of the offence counts
+        scenarios: DataFrame indexed by crime type, one weight column per scenario
+        base_weights: Reference weights the rankings are compared with
+        formula: Name of the index formula (see crime_index.FORMULAS)
+        normalization: Normalization of the index (see crime_index.NORMALIZATIONS)
+        quantiles: (low, high) quantiles of the confidence bands
+
+    Returns:
+        DataFrame per country and year with the reference Index and Rank,
+        the Index_Low/Index_Median/Index_High band, the Rank_Mean, Rank_Std
+        and Rank_Low/Rank_High band, Rank_Stability (share of scenarios
+        keeping the reference rank) and the rank-flip frequencies
+        Flip_Above (share of scenarios where the country passes the one
+        ranked just above it) and Flip_Below (where the one just below
+        passes it)
+    """
+    normalize = NORMALIZATIONS[normalization]
+    baseline = normalize(np.asarray(FORMULAS[formula](matrix.terms(base_weights)), dtype=float), matrix.years)
+    values = normalize(np.asarray(FORMULAS[formula](matrix.scenario_terms(scenarios)), dtype=float),
+                       matrix.years)
+
+    base_rank = rank_within_years(baseline, matrix.years)[:, 0]
+    ranks = rank_within_years(values, matrix.years)
+
+    # Rank flips with the neighbours of the reference ranking
+    above = _neighbours(baseline, matrix.years)
+    has_above = above >= 0
+    flip_above = np.full(len(baseline), np.nan)
+    flip_above[has_above] = (values[has_above] > values[above[has_above]]).mean(axis=1)
+    flip_below = np.full(len(baseline), np.nan)
+    flip_below[above[has_above]] = flip_above[has_above]
+
+    low, high = quantiles
+    with np.errstate(invalid='ignore'):
+        return pd.DataFrame({
+            'Country': matrix.countries,
+            'Year': matrix.years,
+            'Index': baseline,
+            'Rank': base_rank,
+            'Index_Low': np.nanquantile(values, low, axis=1),
+            'Index_Median': np.nanquantile(values, 0.5, axis=1),
+            'Index_High': np.nanquantile(values, high, axis=1),
+            'Rank_Mean': np.nanmean(ranks, axis=1),
+            'Rank_Std': np.nanstd(ranks, axis=1),
+            'Rank_Low': np.nanquantile(ranks, low, axis=1),
+            'Rank_High': np.nanquantile(ranks, high, axis=1),
+            'Rank_Stability': (ranks == base_rank[:, np.newaxis]).mean(axis=1),
+            'Flip_Above': flip_above,
+            'Flip_Below': flip_below,
+        }).sort_values(['Year', 'Rank']).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    from crime_dataset import load_crimes, load_population, DATA_TYPE_NUMBER
+
+    parser = argparse.ArgumentParser(description="Sensitivity of the crime index rankings to the crime weights")
+    parser.add_argument('--scenarios', default=None,
+                        help="CSV of weight scenarios (Crime column and one column per scenario), "
+                             "default: Monte Carlo perturbations of poids_crimes.csv")
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES)
+    parser.add_argument('--spread', type=float, default=DEFAULT_SPREAD)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--formula', choices=list(FORMULAS), default='weighted_rate')
+    parser.add_argument('--normalization', choices=list(NORMALIZATIONS), default='per_year')
+    parser.add_argument('--output', default=SENSITIVITY_FILE)
+    args = parser.parse_args()
+
+    numbers = load_crimes(columns=['Country', 'Year', 'Crime Type', 'Value'], data_types=[DATA_TYPE_NUMBER],
+                          compact=True)
+    matrix = CrimeMatrix.from_frame(numbers, load_population(compact=True))
+    if args.scenarios:
+        scenarios = load_scenarios(args.scenarios)
+    else:
+        scenarios = sample_scenarios(samples=args.samples, spread=args.spread, seed=args.seed)
+
+    report = analyse_scenarios(matrix, scenarios, formula=args.formula, normalization=args.normalization)
+    report.to_csv(args.output, index=False, encoding='utf-8')
+    print(f"{scenarios.shape[1]} weight scenarios, {len(report)} country-years saved to {args.output}")
+    print(f"Mean rank stability: {report['Rank_Stability'].mean():.1%}")
@@ -1,86 +1,46 @@
 import pandas as pd
-import numpy as np
-from datetime import datetime
+from crime_dataset import load_crimes, load_population, DATA_TYPE_NUMBER
+from crime_index import compute_indices, WEIGHTS_FILE
+from index_cache import default_cache
 
-def calculate_crime_index(merged_df, weights_df):
+# Lower-case columns of this script -> columns of crime_index.py
+ENGINE_COLUMNS = {'country': 'Country', 'year': 'Year', 'crime_type': 'Crime Type', 'value': 'Value',
+                  'population': 'Population'}
+
+def calculate_crime_index(merged_df, weights_df, population_df, use_cache=True):
     """
-    Calculate crime index based on crime rates and their weights using merged data
-    that already contains population information.
+    Calculate crime index based on crime rates and their weights, joining the
+    population of each (country, year) from the long population dimension.
     
     Parameters:
-    merged_df: DataFrame with both crime and population data
+    merged_df: DataFrame with crime data (country, year, value, crime_type, lat, lon)
     weights_df: DataFrame with crime weights
+    population_df: DataFrame with columns country, year, population
+    use_cache: Serve unchanged inputs from the result cache (index_cache.py)
     
     Returns:
     DataFrame with calculated crime indices by country and year
     """
-    # Add helper function for ISO 8601 conversion
-    def convert_to_iso8601(year):
-        # Convert year to ISO 8601 format (assuming start of year)
-        return datetime(int(year), 1, 1).isoformat()
-
     # Print column names for debugging
     print("Available columns:", merged_df.columns.tolist())
-    
-    # Convert weights to dictionary for easier lookup
-    weights_dict = dict(zip(weights_df['Crime'], weights_df['Poids (1-10)']))
-    
-    # Clean up the value column
-    merged_df['value'] = merged_df['value'].replace(':', np.nan)
-    merged_df['value'] = pd.to_numeric(merged_df['value'], errors='coerce')
-    
-    # Helper function to get population for a specific row
-    def get_population(row):
-        year = int(row['year'])
-        pop_col = f'population_{year}'
-        return row[pop_col]
-
-    # Add population column before grouping
-    merged_df['population'] = merged_df.apply(get_population, axis=1)
-
-    # First, calculate total crimes per type for each country/year
-    country_totals = merged_df.groupby(['country', 'year', 'crime_type']).agg({
-        'value': 'sum',
-        'population': 'first',
-        'lat': 'first',
-        'lon': 'first'
-    }).reset_index()
-
-    # Calculate crime rate per 100,000 population for each crime type
-    country_totals['Crime_Rate'] = (country_totals['value'] / country_totals['population']) * 100000
 
-    # Convert weights to dictionary
-    weights_dict = dict(zip(weights_df['Crime'], weights_df['Poids (1-10)']))
-
-    # Apply weights to each crime type
-    country_totals['Weighted_Value'] = country_totals.apply(
-        lambda row: row['Crime_Rate'] * weights_dict.get(row['crime_type'], 0)
-        if pd.notnull(row['Crime_Rate']) else 0,
-        axis=1
-    )
-
-    # Modify the final groupby to include lat and lon
-    crime_index = country_totals.groupby(['country', 'year']).agg({
-        'Weighted_Value': 'sum',
-        'lat': 'first',
-        'lon': 'first'
-    }).reset_index()
-
-    # Rename columns (now including lat and lon)
-    crime_index.columns = ['Country', 'Year', 'Crime_Index', 'Latitude', 'Longitude']
-
-    # Normalize to 0-100 scale
-    max_index = crime_index['Crime_Index'].max()
-    crime_index['Normalized_Index'] = (crime_index['Crime_Index'] / max_index) * 100
-
-    # Don't drop latitude and longitude when dropping Crime_Index
-    crime_index = crime_index[['Country', 'Year', 'Normalized_Index', 'Latitude', 'Longitude']]
-
-    # Convert Year to ISO 8601 format
-    crime_index['Year'] = crime_index['Year'].apply(convert_to_iso8601)
-
-    # Ensure proper column order with formatted date
-    crime_index = crime_index[['Country', 'Year', 'Normalized_Index', 'Latitude', 'Longitude']]
+    # The counts are pivoted once to a country-year x crime type matrix and
+    # Σ(rate per 100 000 x weight) is a matrix-vector product (crime_index.py)
+    crimes = merged_df.rename(columns=ENGINE_COLUMNS)
+    population = population_df.rename(columns=ENGINE_COLUMNS)
+    indices = compute_indices(crimes, population, weights_df,
+                              formulas=['weighted_rate'], normalizations=['global'],
+                              cache=default_cache() if use_cache else None)
+
+    # Normalized to a 0-100 scale (100 = highest index of all countries and years)
+    crime_index = pd.DataFrame({
+        'Country': indices['Country'],
+        # Year in ISO 8601 format (start of year), as datetime(year, 1, 1).isoformat()
+        'Year': indices['Year'].astype(str) + '-01-01T00:00:00',
+        'Normalized_Index': indices['weighted_rate_global'],
+        'Latitude': indices['lat'],
+        'Longitude': indices['lon']
+    })
 
     # Sort by country alphabetically and year in reverse order
     crime_index = crime_index.sort_values(['Country', 'Year'], ascending=[True, False])
@@ -89,12 +49,18 @@ def calculate_crime_index(merged_df, weights_df):
 
 # Remove the separate normalize_crime_index function since it's now integrated
 
-# Example usage:
-merged_df = pd.read_csv('merged_data_pop_total_crimes.csv', encoding='utf-8')
-weights_df = pd.read_csv('poids_crimes.csv', encoding='utf-8')
+if __name__ == "__main__":
+    # Example usage:
+    merged_df = load_crimes(data_types=[DATA_TYPE_NUMBER])
+    population_df = load_population()
+    weights_df = pd.read_csv(WEIGHTS_FILE, encoding='utf-8')
+
+    # Same column cleaning as jointure_popWORLDBANK_total_per_crimes.py
+    merged_df.columns = merged_df.columns.str.strip().str.lower().str.replace(' ', '_')
+    population_df.columns = population_df.columns.str.strip().str.lower()
 
-# Calculate crime index (normalization is now included)
-crime_index = calculate_crime_index(merged_df, weights_df)
+    # Calculate crime index (normalization is now included)
+    crime_index = calculate_crime_index(merged_df, weights_df, population_df)
 
-# Save results with UTF-8 encoding
-crime_index.to_csv('crime_index_results.csv', index=False, encoding='utf-8')
\ No newline at end of file
+    # Save results with UTF-8 encoding
+    crime_index.to_csv('crime_index_results.csv', index=False, encoding='utf-8')
\ No newline at end of file
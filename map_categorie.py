@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 import folium 
 import os
 from datetime import datetime
@@ -7,710 +8,286 @@ import json
 import plotly.express as px
 import plotly.io as pio
 from folium import plugins
+from folium.map import Layer
+from branca.element import MacroElement
+from folium.template import Template
 import plotly.graph_objs as go
+import multiprocessing
+from urllib.parse import quote
+from crime_dataset import load_crimes, load_regions, DATA_TYPE_RATE
+from build_manifest import BuildManifest, fingerprint, file_fingerprint
+from crime_cube import CrimeCube
+from geometry_assets import (build_geometry_assets, geometry_asset_name, GEOMETRY_SOURCE,
+                             TOLERANCES, QUANTIZATION, JS_VARIABLE,
+                             REGION_GEOMETRY_SOURCES, REGION_KEY_PROPERTY)
+from vector_tiles import (build_vector_tiles, export_tile_directory, TILES_FILE, TILES_DIR, TILES_URL,
+                          SHAPES_SOURCE, SHAPES_TABLE, SHAPES_LAYER, POINTS_LAYER, CRIMES_SOURCE,
+                          MINZOOM as TILES_MINZOOM, MAXZOOM as TILES_MAXZOOM, EXTENT as TILES_EXTENT)
+
+# Bump when the HTML generated by this module changes, so that the
+# incremental build regenerates every page
+TEMPLATE_VERSION = 3
+
+# Simplified geometry shared by all the year maps (see geometry_assets.py).
+# Default geometry_format of the builders: 'geojson', 'topojson' or 'mvt'
+# for vector tiles (see vector_tiles.py), which must be served over http
+# (python vector_tiles.py serve crime_maps).
+GEOMETRY_LEVEL = 'medium'
+GEOMETRY_FORMAT = 'geojson'
+# Layers of the tiles not drawn by the base layer, an empty style hides them
+HIDDEN_TILE_LAYERS = [POINTS_LAYER]
+TOPOJSON_CLIENT_URL = 'https://cdn.jsdelivr.net/npm/topojson-client@3'
+VECTORGRID_URL = 'https://unpkg.com/leaflet.vectorgrid@1.3.0/dist/Leaflet.VectorGrid.bundled.js'
+
+# Single trends page and the columnar series it reads
+TRENDS_PAGE = 'trends.html'
+TRENDS_DATA = 'data/trends.js'
+
+# Marker rendering of the year maps: 'svg' (one DOM element per marker) or
+# 'canvas' (all the vector layers drawn on a canvas, for thousands of markers)
+RENDER_MODES = ['svg', 'canvas']
+# Options of the marker clusters (chunkedLoading keeps the page responsive
+# while tens of thousands of markers are added)
+CLUSTER_OPTIONS = {'chunkedLoading': True, 'disableClusteringAtZoom': 8}
+
+# Directory where the country × year × crime type cube is saved for the workers
+CUBE_DIR = 'crime_cube'
+
+# Choropleth mode of the timeline: the polygons of the base geometry are
+# coloured by the value of the selected category or by the crime index of
+# indice_criminaliter.py. A small header (keys, class breaks) is loaded once
+# and every year is a shard of a few kilobytes.
+CHOROPLETH_HEADER = 'data/choropleth.js'
+CHOROPLETH_INDEX_FILE = 'crime_index_results.csv'
+# Index column of indice_criminaliter.py, then the one of older result files
+CHOROPLETH_INDEX_COLUMNS = ['Normalized_Index', 'Indice de criminalité']
+CHOROPLETH_COLORS = ['#ffffb2', '#fed976', '#feb24c', '#fd8d3c', '#f03b20', '#bd0026']
+
+# Map granularities. 'key' identifies an entity in the data and in the
+# trends links, 'label' is the name displayed for it and 'nuts' the level
+# read from the regional dataset (None for the countries). 'feature_key' is
+# the data column matching the 'feature_property' of the polygons (used by
+# the choropleth). Each granularity has its own site directory and base
+# geometry.
+GEO_LEVELS = {
+    'country': {
+        'key': 'NAME', 'label': 'NAME', 'nuts': None,
+        'geometry': GEOMETRY_SOURCE, 'asset_name': 'europe', 'properties': None,
+        'feature_key': 'ISO3', 'feature_property': 'ISO3',
+        'tiles_source': SHAPES_SOURCE, 'output_dir': 'crime_maps'
+    },
+    'nuts2': {
+        'key': 'GEO', 'label': 'NAME', 'nuts': 2,
+        'geometry': REGION_GEOMETRY_SOURCES[2], 'asset_name': 'nuts2',
+        'properties': [REGION_KEY_PROPERTY, 'NAME_LATN'],
+        'feature_key': 'GEO', 'feature_property': REGION_KEY_PROPERTY,
+        'tiles_source': REGION_GEOMETRY_SOURCES[2], 'output_dir': 'crime_maps_nuts2'
+    },
+    'nuts3': {
+        'key': 'GEO', 'label': 'NAME', 'nuts': 3,
+        'geometry': REGION_GEOMETRY_SOURCES[3], 'asset_name': 'nuts3',
+        'properties': [REGION_KEY_PROPERTY, 'NAME_LATN'],
+        'feature_key': 'GEO', 'feature_property': REGION_KEY_PROPERTY,
+        'tiles_source': REGION_GEOMETRY_SOURCES[3], 'output_dir': 'crime_maps_nuts3'
+    }
+}
+
+# Countries always listed on the rankings page (NA when they have no value)
+# and alternative names normalized before ranking
+RANKING_COUNTRIES = [
+    "Albanie", "Autriche", "Belgique", "Bosnie-Herzégovine", "Bulgarie",
+    "Croatie", "Chypre", "Tchéquie", "Danemark",
+    "Angleterre et Pays de Galles", "Estonie", "Finlande", "France",
+    "Allemagne", "Grèce", "Hongrie", "Islande", "Irlande", "Italie",
+    "Kosovo*", "Lettonie", "Liechtenstein", "Lituanie", "Luxembourg",
+    "Malte", "Monténégro", "Pays-Bas", "Macédoine du Nord",
+    "Irlande du Nord (Royaume-Uni) (NUTS 2021)", "Norvège", "Pologne",
+    "Portugal", "Roumanie", "Écosse (NUTS 2021)", "Serbie", "Slovaquie",
+    "Slovénie", "Espagne", "Suède", "Suisse", "Turquie"
+]
+RANKING_NAME_ALIASES = {
+    "République tchèque": "Tchéquie",
+    "Czech Republic": "Tchéquie",
+    "Kosovo": "Kosovo*",
+    "Kosovo (under UNSCR 1244)": "Kosovo*",
+    "Irlande du Nord": "Irlande du Nord (Royaume-Uni) (NUTS 2021)",
+    "Northern Ireland": "Irlande du Nord (Royaume-Uni) (NUTS 2021)",
+    "Écosse": "Écosse (NUTS 2021)",
+    "Scotland": "Écosse (NUTS 2021)"
+}
+
+# Cube shared with the rendering workers. With the fork start method the
+# children inherit it copy-on-write, otherwise they memory-map CUBE_DIR.
+_SHARED_CUBE = None
+
+class SharedGeoJson(Layer):
+    """
+    GeoJSON layer read from a geometry asset shared by all the year maps.
+
+    The asset is a .js file assigning the geometry (GeoJSON or TopoJSON) to
+    window.EUROPE_GEOMETRY. It is referenced with a <script> tag instead of
+    being inlined, so browsers download and parse it once for every year.
+    """
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }}_data = window.{{ this.variable }};
+            if ({{ this.get_name() }}_data && {{ this.get_name() }}_data.type === 'Topology') {
+                {{ this.get_name() }}_data = topojson.feature(
+                    {{ this.get_name() }}_data,
+                    {{ this.get_name() }}_data.objects[Object.keys({{ this.get_name() }}_data.objects)[0]]
+                );
+            }
+            var {{ this.get_name() }} = L.geoJson({{ this.get_name() }}_data, {
+                style: function() { return {{ this.style|tojson }}; },
+                interactive: false
+            });
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, asset, style, name=None, overlay=False, control=True, show=True):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._name = 'SharedGeoJson'
+        self.asset = asset
+        self.style = style
+        self.variable = JS_VARIABLE
+
+    def render(self, **kwargs):
+        figure = self.get_root()
+        if self.asset.endswith('_topojson.js'):
+            figure.header.add_child(folium.JavascriptLink(TOPOJSON_CLIENT_URL), name='topojson_client')
+        figure.header.add_child(folium.JavascriptLink(self.asset), name='shared_geometry')
+        super().render(**kwargs)
+
+class VectorTileBase(Layer):
+    """
+    Base layer drawn from the vector tiles of the site (see vector_tiles.py),
+    only the tiles visible at the current zoom are downloaded.
+    """
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.vectorGrid.protobuf({{ this.url|tojson }}, {
+                vectorTileLayerStyles: {{ this.layer_styles|tojson }},
+                maxNativeZoom: {{ this.max_native_zoom }},
+                interactive: false
+            });
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, url, style, name=None, overlay=False, control=True, show=True):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._name = 'VectorTileBase'
+        self.url = url
+        self.layer_styles = {SHAPES_LAYER: dict(style, fill=True), **{layer: [] for layer in HIDDEN_TILE_LAYERS}}
+        self.max_native_zoom = TILES_MAXZOOM
+
+    def render(self, **kwargs):
+        self.get_root().header.add_child(folium.JavascriptLink(VECTORGRID_URL), name='vectorgrid')
+        super().render(**kwargs)
+
+def build_geometry_tiles(output_dir, geo_level='country'):
+    """
+    Build tiles.mbtiles in output_dir and export it as tiles/{z}/{x}/{y}.pbf
+
+    Returns:
+        list: Paths of the written archive and tile directory, relative to output_dir
+    """
+    config = GEO_LEVELS[geo_level]
+    archive = os.path.join(output_dir, TILES_FILE)
+    # The crime numbers of the GeoPackage are per country
+    crimes_source = CRIMES_SOURCE if config['nuts'] is None else None
+    build_vector_tiles(archive, config['tiles_source'], SHAPES_TABLE, crimes_source,
+                       keep_properties=config['properties'])
+    export_tile_directory(archive, os.path.join(output_dir, TILES_DIR))
+    return [TILES_FILE, TILES_DIR]
+
+def ensure_geometry_asset(output_dir, level=GEOMETRY_LEVEL, fmt=GEOMETRY_FORMAT, geo_level='country'):
+    """
+    Build the geometry assets if the one of level is missing, return its path
 
-def create_crime_trend_graph(df, country):
+    Returns None when the geometry source of geo_level is not available, the
+    maps are then drawn without the base layer. With fmt 'mvt' the vector
+    tiles are built instead and their URL template is returned.
+    """
+    config = GEO_LEVELS[geo_level]
+    if fmt == 'mvt':
+        if not all([os.path.exists(os.path.join(output_dir, artifact)) for artifact in (TILES_FILE, TILES_DIR)]):
+            if not os.path.exists(config['tiles_source']):
+                print(f"Geometry source not found, maps drawn without borders: {config['tiles_source']}")
+                return None
+            build_geometry_tiles(output_dir, geo_level)
+        return TILES_URL
+    asset = geometry_asset_name(level, fmt, config['asset_name'])
+    if not os.path.exists(os.path.join(output_dir, asset)):
+        if not os.path.exists(config['geometry']):
+            print(f"Geometry source not found, maps drawn without borders: {config['geometry']}")
+            return None
+        build_geometry_assets(output_dir, config['geometry'], fmt=fmt,
+                              name=config['asset_name'], properties=config['properties'])
+    return asset
+
+def trend_page_url(country):
+    """Link to the shared trends page opened on a country (or region code)"""
+    return f'{TRENDS_PAGE}?country={quote(country)}'
+
+def build_trend_series(df, key='NAME', label=None):
     """
-    Create a single HTML file for crime trends per country across all years
+    Columnar yearly series of every country, built with a single groupby
     
     Args:
-        df: DataFrame with crime data
-        country: Name of the country
+        df: DataFrame with key, Year, Crime Type and Value columns
+        key: Column identifying the entity (NAME, or GEO for the regions)
+        label: Column of the displayed names when it differs from key
     
     Returns:
-        str: HTML content for the trends visualization
+        dict: {'years': [...], 'countries': {country: {crime type: [value or None per year]}}}
+        plus 'labels': {key: display name} when label is given
     """
-    # Prepare the data by grouping by country and year
-    country_data = df[df['NAME'] == country].copy()
-    # Sort by year to ensure chronological order
-    country_data = country_data.sort_values('Year')
-    
-    # Convert to list of dictionaries for JSON serialization
-    data_list = []
-    for year in country_data['Year'].unique():
-        year_data = country_data[country_data['Year'] == year]
-        row = {'year': int(year)}
-        for _, crime_row in year_data.iterrows():
-            crime_type = crime_row['Crime Type']
-            value = crime_row['Value']
-            row[crime_type] = float(value) if pd.notna(value) else None
-        data_list.append(row)
-        
-    categories = {
-        'Crimes violents': ['Homicide intentionnel', "Tentative d'homicide volontaire", 'Attaque grave',
-                           'Violence sexuelle', 'Agression sexuelle', 'Viol', 'Exploitation sexuelle'],
-        'Crimes contre la propriété': ['Vol', 'Vol par effraction', 'Vol par effraction de résidences privées',
-                                     "Vol d'un véhicule motorisé ou de pièces de celui-ci", 'Vol qualifié', 'Fraude'],
-        'Crime organisé': ['Participation à un groupe criminel organisé', "Blanchiment d'argent",
-                          'Corruption', 'Actes illicites impliquant des drogues ou des précurseurs contrôlés'],
-        'Cyber et autres': ['Actes contre les systèmes informatiques', 'Pédopornographie', 'Enlèvement', 'pots-de-vin']
-    }
-
-    html_template = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Crime Trends - {country}</title>
-        <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
-        <style>
-            :root {{
-                --primary-color: #3b82f6;
-                --primary-hover: #2563eb;
-                --background-color: #f8fafc;
-                --border-color: #e2e8f0;
-                --text-color: #1e293b;
-                --shadow-color: rgba(0, 0, 0, 0.06);
-                --transition-speed: 0.3s;
-            }}
-            
-            body, html {{ 
-                margin: 0; 
-                padding: 0; 
-                height: 100%; 
-                font-family: 'Inter', system-ui, -apple-system, sans-serif;
-                background-color: var(--background-color);
-                color: var(--text-color);
-            }}
-            
-            .container {{ 
-                width: 100%; 
-                height: 100vh; 
-                display: flex; 
-                flex-direction: column; 
-                padding: 24px; 
-                box-sizing: border-box; 
-                gap: 24px;
-                max-width: 2560px;
-                margin: 0 auto;
-            }}
-            
-            .controls {{ 
-                background: white; 
-                padding: 24px; 
-                border-radius: 16px; 
-                box-shadow: 0 4px 6px var(--shadow-color);
-                transition: all var(--transition-speed);
-            }}
-            
-            .controls:hover {{
-                box-shadow: 0 6px 12px var(--shadow-color);
-            }}
-            
-            .controls-row {{
-                display: flex;
-                align-items: center;
-                gap: 24px;
-                flex-wrap: wrap;
-            }}
-            
-            .view-controls {{
-                display: flex;
-                align-items: center;
-                gap: 20px;
-            }}
-            
-            .content {{
-                flex: 1;
-                min-height: 0;
-                overflow: auto;
-                padding-right: 20px;
-                scrollbar-width: thin;
-                scrollbar-color: var(--primary-color) var(--background-color);
-            }}
-            
-            .content::-webkit-scrollbar {{
-                width: 8px;
-            }}
-            
-            .content::-webkit-scrollbar-track {{
-                background: var(--background-color);
-            }}
-            
-            .content::-webkit-scrollbar-thumb {{
-                background-color: var(--primary-color);
-                border-radius: 4px;
-            }}
-            
-            .category-section {{
-                background: white;
-                border-radius: 16px;
-                padding: 32px;
-                margin-bottom: 24px;
-                box-shadow: 0 4px 6px var(--shadow-color);
-                transition: all var(--transition-speed);
-            }}
-            
-            .category-section:hover {{
-                box-shadow: 0 6px 12px var(--shadow-color);
-            }}
-            
-            .category-title {{
-                font-size: 1.75rem;
-                font-weight: 600;
-                margin-bottom: 24px;
-                padding-bottom: 16px;
-                border-bottom: 2px solid var(--border-color);
-                color: var(--text-color);
-            }}
-            
-            .charts-grid {{
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(600px, 1fr));
-                gap: 32px;
-            }}
-            
-            .chart-wrapper {{ 
-                background: white;
-                border-radius: 12px;
-                padding: 24px;
-                height: 600px;
-                position: relative;
-                transition: all var(--transition-speed);
-            }}
-            
-            .chart-wrapper:hover {{
-                box-shadow: 0 6px 12px var(--shadow-color);
-            }}
-            
-            .chart-container {{
-                position: absolute;
-                top: 24px;
-                left: 24px;
-                right: 24px;
-                bottom: 24px;
-            }}
-            
-            select {{ 
-                padding: 10px 16px;
-                border-radius: 8px;
-                border: 1px solid var(--border-color);
-                font-size: 15px;
-                background: white;
-                cursor: pointer;
-                transition: all var(--transition-speed);
-                color: var(--text-color);
-                min-width: 160px;
-            }}
-            
-            select:hover {{
-                border-color: var(--primary-color);
-            }}
-            
-            select:focus {{
-                outline: none;
-                border-color: var(--primary-color);
-                box-shadow: 0 0 0 3px rgba(59, 130, 246, 0.1);
-            }}
-            
-            .radio-group {{
-                display: flex;
-                gap: 20px;
-                align-items: center;
-            }}
-            
-            .radio-label {{
-                display: flex;
-                align-items: center;
-                gap: 8px;
-                cursor: pointer;
-                font-size: 15px;
-                transition: all var(--transition-speed);
-            }}
-            
-            .radio-label:hover {{
-                color: var(--primary-color);
-            }}
-            
-            .category-buttons {{ 
-                display: flex; 
-                gap: 16px; 
-                flex-wrap: wrap;
-                margin-top: 20px;
-            }}
-            
-            button {{ 
-                padding: 10px 20px;
-                border-radius: 8px;
-                border: 1px solid var(--border-color);
-                background: white;
-                color: var(--text-color);
-                font-size: 15px;
-                cursor: pointer;
-                transition: all var(--transition-speed);
-                font-weight: 500;
-            }}
-            
-            button:hover {{
-                background: var(--primary-color);
-                color: white;
-                border-color: var(--primary-color);
-            }}
-            
-            button.active {{ 
-                background: var(--primary-color);
-                color: white;
-                border-color: var(--primary-color);
-            }}
-            
-            @media (min-width: 2000px) {{
-                .charts-grid {{
-                    grid-template-columns: repeat(3, 1fr);
-                }}
-                
-                .chart-wrapper {{
-                    height: 600px;
-                }}
-            }}
-            
-            @media (max-width: 1400px) {{
-                .charts-grid {{
-                    grid-template-columns: repeat(2, 1fr);
-                }}
-            }}
-            
-            @media (max-width: 1200px) {{
-                .charts-grid {{
-                    grid-template-columns: 1fr;
-                }}
-            }}
-            
-            @media (max-width: 768px) {{
-                .container {{
-                    padding: 16px;
-                }}
-                
-                .controls {{
-                    padding: 20px;
-                }}
-                
-                .chart-wrapper {{
-                    height: 400px;
-                }}
-                
-                .category-title {{
-                    font-size: 1.5rem;
-                }}
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="controls">
-                <div class="controls-row">
-                    <select id="chartType" aria-label="Chart Type">
-                        <option value="lines+markers">Graphique linéaire</option>
-                        <option value="bar">Diagramme à barres</option>
-                    </select>
-                    
-                    <div class="view-controls">
-                        <div class="radio-group" role="radiogroup" aria-label="View Type">
-                            <label class="radio-label">
-                                <input type="radio" name="view" value="category" checked>
-                                Vue des catégories
-                            </label>
-                            <label class="radio-label">
-                                <input type="radio" name="view" value="individuel">
-                                Crimes individuels
-                            </label>
-                        </div>
-                    </div>
-                </div>
-                 
-                <div class="category-buttons" id="categoryButtons" role="toolbar" aria-label="Crime Categories">  <button onclick="window.location.href='index.html'" class="button outline">
-                    <i class="fas fa-arrow-left"></i> Retour à la carte
-                </button></div>
-                              
-            </div>
-            
-            <div class="content">
-                <div id="categoryView">
-                    <div class="chart-wrapper">
-                        <div id="mainChart" class="chart-container"></div>
-                    </div>
-                </div>
-                
-                <div id="individualView" style="display: none;">
-                </div>
-            </div>
-        </div>
-        
-        <script>
-            // Initialize data and state
-            const data = {json.dumps(data_list)};
-            const categories = {json.dumps(categories)};
-            let currentCategory = Object.keys(categories)[0];
-            let currentType = 'lines+markers';
-            
-            
-function createLayout(title) {{
-  return {{
-    title: {{
-      text: title,
-      font: {{
-        size: 20,
-        color: '#1e293b',
-        weight: 600
-      }}
-    }},
-    autosize: true,
-    margin: {{ t: 60, l: 70, r: 150, b: 60 }},
-    plot_bgcolor: 'white',
-    paper_bgcolor: 'white',
-    yaxis: {{
-      title: 'Rate per 100,000 inhabitants',
-      zeroline: true,
-      zerolinecolor: '#94a3b8',
-      zerolinewidth: 1,
-      gridcolor: '#f1f5f9',
-      titlefont: {{ size: 16 }},
-      tickfont: {{ size: 14 }},
-      tickformat: '.1f'
-    }},
-    xaxis: {{
-      title: 'Year',
-      showspikes: true,
-      spikemode: 'across',
-      spikesnap: 'cursor',
-      spikecolor: '#94a3b8',
-      spikethickness: 2,
-      gridcolor: '#f1f5f9',
-      titlefont: {{ size: 16 }},
-      tickfont: {{ size: 14 }}
-    }},
-    hovermode: 'x unified',  // Back to unified mode
-    hoverlabel: {{
-      align: 'left',
-      bgcolor: 'white',  // Solid white background
-      bordercolor: '#64748b',  // Darker border
-      borderwidth: 1,
-      font: {{ 
-        size: 13,
-        color: '#1e293b'  // Darker text
-      }},
-      namelength: -1
-    }},
-    showlegend: true,
-    legend: {{
-      font: {{ size: 12 }},
-      bgcolor: 'rgba(255,255,255,0.9)',
-      bordercolor: '#e2e8f0',
-      borderwidth: 1,
-      borderradius: 4
-    }},
-    transition: {{
-      duration: 500,
-      easing: 'cubic-in-out'
-    }}
-  }};
-}}
-
-function createTrace(crime) {{
-  const trace = {{
-    x: data.map(d => d.year),
-    y: data.map(d => d[crime]),
-    name: crime,
-    type: currentType === 'lines+markers' ? 'scatter' : 'bar',
-    hovertemplate: `<b>${{crime}}</b>: %{{y:.1f}}<extra></extra>`,  // Bold crime name
-    opacity: 0.9,
-  }};
-
-  if (currentType === 'lines+markers') {{
-    trace.mode = 'lines+markers';
-    trace.line = {{
-      width: 3,
-      shape: 'spline',
-      smoothing: 1.3
-    }};
-    trace.marker = {{
-      size: 8,
-      symbol: 'circle',
-    }};
-    trace.connectgaps = true;
-  }} else {{
-    trace.marker = {{
-      line: {{
-        width: 1,
-        color: 'white'
-      }}
-    }};
-  }}
-
-  return trace;
-}}
-            
-            // Rest of the JavaScript remains the same, just add the new configs
-            
-            // Create buttons with smooth transitions
-            function createButtons() {{
-                const container = document.getElementById('categoryButtons');
-                Object.keys(categories).forEach(category => {{
-                    const btn = document.createElement('button');
-                    btn.textContent = category;
-                    btn.onclick = () => updateCurrentCategory(category);
-                    if (category === currentCategory) btn.className = 'active';
-                    container.appendChild(btn);
-                }});
-            }}
-            
-            // Add smooth transitions for view changes
-            function handleViewChange(view) {{
-                const categoryView = document.getElementById('categoryView');
-                const individualView = document.getElementById('individualView');
-                
-                categoryView.style.transition = 'opacity 0.3s ease-in-out';
-                individualView.style.transition = 'opacity 0.3s ease-in-out';
-                
-                if (view === 'category') {{
-                    individualView.style.opacity = 0;
-                    setTimeout(() => {{
-                        individualView.style.display = 'none';
-                        categoryView.style.display = 'block';
-                        setTimeout(() => {{
-                            categoryView.style.opacity = 1;
-                            updateCategoryView();
-                        }}, 50);
-                    }}, 300);
-                }} else {{
-                    categoryView.style.opacity = 0;
-                    setTimeout(() => {{
-                        categoryView.style.display = 'none';
-                        individualView.style.display = 'block';
-                        setTimeout(() => {{
-                            individualView.style.opacity = 1;
-                            updateIndividualView();
-                        }}, 50);
-                    }}, 300);
-                }}
-                
-                localStorage.setItem('preferredView', view);
-            }}
-            
-            // Initialize event listeners and state
-            window.addEventListener('load', () => {{
-                const savedChartType = localStorage.getItem('preferredChartType');
-                const savedView = localStorage.getItem('preferredView');
-                const savedCategory = localStorage.getItem('preferredCategory');
-                
-                // Enhanced initialization with smooth transitions
-                document.body.style.opacity = '0';
-                
-                // Set chart type with animation
-                if (savedChartType) {{
-                    currentType = savedChartType;
-                    document.getElementById('chartType').value = savedChartType;
-                }}
-                
-                // Set view with animation
-                if (savedView) {{
-                    const viewRadio = document.querySelector(`input[name="view"][value="${{savedView}}"]`);
-                    if (viewRadio) {{
-                        viewRadio.checked = true;
-                    }}
-                }}
-                
-                // Set category
-                if (savedCategory && categories[savedCategory]) {{
-                    currentCategory = savedCategory;
-                }}
-                
-                createButtons();
-                
-                // Fade in the entire interface
-                requestAnimationFrame(() => {{
-                    document.body.style.transition = 'opacity 0.5s ease-in-out';
-                    document.body.style.opacity = '1';
-                    handleViewChange(savedView || 'category');
-                }});
-            }});
-            
-            // Enhanced chart type update with smooth transitions
-            function updateChartType(newType) {{
-                const oldType = currentType;
-                currentType = newType;
-                
-                const view = document.querySelector('input[name="view"]:checked').value;
-                
-                // Add transition animation
-                Plotly.animate('mainChart', {{
-                    data: [],
-                    layout: {{}}
-                }}, {{
-                    transition: {{
-                        duration: 500,
-                        easing: 'cubic-in-out'
-                    }},
-                    frame: {{
-                        duration: 500
-                    }}
-                }}).then(() => {{
-                    if (view === 'category') {{
-                        updateCategoryView();
-                    }} else {{
-                        updateIndividualView();
-                    }}
-                }});
-                
-                localStorage.setItem('preferredChartType', newType);
-            }}
-            
-            // Enhanced category update with smooth transitions
-            function updateCurrentCategory(category) {{
-                const oldCategory = currentCategory;
-                currentCategory = category;
-                
-                // Animate button transitions
-                document.querySelectorAll('.category-buttons button').forEach(btn => {{
-                    if (btn.textContent === category) {{
-                        btn.classList.add('active');
-                        btn.style.transform = 'scale(1.05)';
-                        setTimeout(() => btn.style.transform = 'scale(1)', 200);
-                    }} else {{
-                        btn.classList.remove('active');
-                    }}
-                }});
-                
-                const view = document.querySelector('input[name="view"]:checked').value;
-                
-                // Add fade transition
-                const content = document.querySelector('.content');
-                content.style.opacity = '0';
-                
-                setTimeout(() => {{
-                    if (view === 'category') {{
-                        updateCategoryView();
-                    }} else {{
-                        updateIndividualView();
-                    }}
-                    content.style.transition = 'opacity 0.3s ease-in-out';
-                    content.style.opacity = '1';
-                }}, 300);
-                
-                localStorage.setItem('preferredCategory', category);
-            }}
-            
-            // Enhanced category view update with improved animations
-            function updateCategoryView() {{
-                const crimes = categories[currentCategory];
-                const traces = crimes.map(createTrace);
-                
-                const layout = createLayout(`Crime Trends in {country} - ${{currentCategory}}`);
-                
-                Plotly.newPlot('mainChart', traces, layout, {{ 
-                    responsive: true,
-                    displayModeBar: true,
-                    displaylogo: false,
-                    modeBarButtonsToRemove: ['lasso2d', 'select2d'],
-                    toImageButtonOptions: {{
-                        format: 'png',
-                        filename: `crime_trends_{country}_${{currentCategory}}`,
-                        height: 800,
-                        width: 1200,
-                        scale: 2
-                    }}
-                }});
-            }}
-            
-            // Enhanced individual view update with improved animations
-            function updateIndividualView() {{
-                const container = document.getElementById('individualView');
-                container.innerHTML = '';
-                container.style.opacity = '0';
-                
-                const crimes = categories[currentCategory];
-                const section = document.createElement('div');
-                section.className = 'category-section';
-                
-                const title = document.createElement('div');
-                title.className = 'category-title';
-                title.textContent = currentCategory;
-                section.appendChild(title);
-                
-                const grid = document.createElement('div');
-                grid.className = 'charts-grid';
-                
-                crimes.forEach((crime, index) => {{
-                    const wrapper = document.createElement('div');
-                    wrapper.className = 'chart-wrapper';
-                    wrapper.style.opacity = '0';
-                    wrapper.style.transform = 'translateY(20px)';
-                    
-                    const chartDiv = document.createElement('div');
-                    chartDiv.id = `chart_${{crime.replace(/ /g, '_')}}`;
-                    chartDiv.className = 'chart-container';
-                    wrapper.appendChild(chartDiv);
-                    grid.appendChild(wrapper);
-                    
-                    const trace = createTrace(crime);
-                    
-                    // Stagger the animation of individual charts
-                    setTimeout(() => {{
-                        Plotly.newPlot(chartDiv, [trace],
-                            createLayout(crime),
-                            {{ 
-                                responsive: true,
-                                displayModeBar: false,
-                                displaylogo: false
-                            }}
-                        );
-                        
-                        wrapper.style.transition = 'all 0.5s ease-in-out';
-                        wrapper.style.opacity = '1';
-                        wrapper.style.transform = 'translateY(0)';
-                    }}, index * 100);
-                }});
-                
-                section.appendChild(grid);
-                container.appendChild(section);
-                
-                // Fade in the container
-                requestAnimationFrame(() => {{
-                    container.style.transition = 'opacity 0.5s ease-in-out';
-                    container.style.opacity = '1';
-                }});
-            }}
-            
-            // Enhanced resize handler with debounce
-            let resizeTimeout;
-            window.addEventListener('resize', () => {{
-                clearTimeout(resizeTimeout);
-                resizeTimeout = setTimeout(() => {{
-                    const view = document.querySelector('input[name="view"]:checked').value;
-                    if (view === 'category') {{
-                        updateCategoryView();
-                    }} else {{
-                        updateIndividualView();
-                    }}
-                }}, 250);
-            }});
-            
-            // Add smooth transitions for color theme changes
-            function updateColorTheme(isDark) {{
-                document.documentElement.style.transition = 'all 0.3s ease-in-out';
-                if (isDark) {{
-                    document.documentElement.style.setProperty('--background-color', '#1a1a1a');
-                    document.documentElement.style.setProperty('--text-color', '#ffffff');
-                    document.documentElement.style.setProperty('--border-color', '#333333');
-                }} else {{
-                    document.documentElement.style.setProperty('--background-color', '#f8fafc');
-                    document.documentElement.style.setProperty('--text-color', '#1e293b');
-                    document.documentElement.style.setProperty('--border-color', '#e2e8f0');
-                }}
-            }}
-            
-            // Initialize chart type change listener
-            document.getElementById('chartType').addEventListener('change', (e) => {{
-                updateChartType(e.target.value);
-            }});
-            
-            // Initialize view change listeners
-            document.querySelectorAll('input[name="view"]').forEach(radio => {{
-                radio.addEventListener('change', (e) => handleViewChange(e.target.value));
-            }});
-        </script>
-    </body>
-    </html>
+    years = sorted(int(year) for year in df['Year'].unique())
+    # Duplicated rows are summed, a year stays empty when none of its rows has a value
+    table = (df.groupby([key, 'Crime Type', 'Year'])['Value'].sum(min_count=1)
+             .unstack('Year').reindex(columns=years))
+    series = {}
+    for (country, crime), row in zip(table.index, table.to_numpy(dtype=float)):
+        series.setdefault(country, {})[crime] = [None if np.isnan(value) else round(float(value), 4)
+                                                 for value in row]
+    trends = {'years': years, 'countries': series}
+    if label is not None and label != key:
+        names = df.groupby(key)[label].first()
+        trends['labels'] = {code: name for code, name in names.items() if pd.notna(name)}
+    return trends
+
+def create_trends_page(df, output_dir, geo_level='country'):
     """
-    return html_template
+    Create trends.html, the crime trends of every country in one page
+    
+    The page reads the series from data/trends.js, so its code and the data
+    are downloaded once and cached for all the countries. The country is
+    chosen with ?country=<name> (see trend_page_url) or from the page.
+    
+    Returns:
+        list: Paths of the written files, relative to output_dir
+    """
+    categories = {cat_name: cat_info['crimes']
+                  for cat_name, cat_info in get_crime_categories().items() if cat_info is not None}
+    
+    config = GEO_LEVELS[geo_level]
+    os.makedirs(os.path.join(output_dir, 'data'), exist_ok=True)
+    payload = json.dumps(build_trend_series(df, config['key'], config['label']),
+                         separators=(',', ':'), ensure_ascii=False)
+    with open(os.path.join(output_dir, TRENDS_DATA), 'w', encoding='utf-8') as f:
+        f.write(f'window.TRENDS_DATA = {payload};\n')
+    
+    with open('templates/trends_template.html', 'r', encoding='utf-8') as f:
+        template = f.read()
+    trends_html = template.replace('const categories = {};',
+                                   f'const categories = {json.dumps(categories, ensure_ascii=False)};')
+    with open(os.path.join(output_dir, TRENDS_PAGE), 'w', encoding='utf-8') as f:
+        f.write(trends_html)
+    return [TRENDS_PAGE, TRENDS_DATA]
 
 def get_crime_categories():
     """Define and return crime categories with their properties"""
@@ -746,9 +323,15 @@ def create_crime_category_mapping(categories):
                 mapping[crime] = cat_name
     return mapping
 
-def process_year_data(df, year):
-    """Process and clean data for a specific year"""
-    year_data = df[df['Year'] == year].copy()
+def process_year_data(df, year, data_type=DATA_TYPE_RATE):
+    """Process and clean data for a specific year
+
+    When df is None only the requested year is read from the dataset.
+    """
+    if df is None:
+        year_data = load_crimes(years=[year], data_types=[data_type])
+    else:
+        year_data = df[df['Year'] == year].copy()
     numeric_columns = ['Value', 'lat', 'lon']
     for col in numeric_columns:
         year_data[col] = pd.to_numeric(year_data[col], errors='coerce')
@@ -767,13 +350,11 @@ def create_base_map(year_data, categories):
         'fillOpacity': 0.3
     }
     
-    # Create GeoJSON layer with custom style function
-    geojson = folium.GeoJson(
-        'europe.geojson',
+    # Create GeoJSON layer from the shared, simplified geometry asset
+    geojson = SharedGeoJson(
+        geometry_asset_name(GEOMETRY_LEVEL, GEOMETRY_FORMAT),
+        geojson_style,
         name='Europe',
-        style_function=lambda x: geojson_style,
-        tooltip=None,
-        popup=None,
         overlay=False  # This makes it a base layer
     )
     
@@ -818,71 +399,9 @@ def calculate_category_totals(country_data, categories):
             totals[cat_name] = 'NA' if pd.isna(total) else total
     return totals
 
-def create_category_popup_content(country, year, crimes, total, graph_file, category):
-    """Generate HTML content for popup with table/graph toggle and sorted data"""
-    total_display = "NA" if total == 'NA' or pd.isna(total) else f"{total:.2f}"
-    
-    # Prépare les données pour le graphique avec gestion des erreurs
-    data_rows = []
-    for crime in crimes:
-        if pd.notna(crime['Value']):
-            try:
-                value = float(crime['Value'])
-                if value >= 0:  # Vérifie que la valeur est valide
-                    data_rows.append({
-                        'type': crime['Crime Type'],
-                        'value': value
-                    })
-            except (ValueError, TypeError):
-                continue
-    
-    # Trie les données par valeur croissante
-    data_rows.sort(key=lambda x: x['value'])
-    
-    # Création du HTML pour le graphique
-    graph_html = """
-        <div class="chart-container">
-    """
-    
-    # Trouve la valeur maximum pour l'échelle avec gestion des erreurs
-    try:
-        if data_rows:  # Vérifie si nous avons des données valides
-            max_value = max(crime['value'] for crime in data_rows)
-            
-            # Si max_value est 0, on évite la division par zéro
-            if max_value == 0:
-                max_value = 1
-                
-            for row in data_rows:
-                percentage = (row['value'] / max_value) * 100
-                graph_html += f"""
-                    <div class="chart-row">
-                        <div class="chart-label" title="{row['type']}">{row['type']}</div>
-                        <div class="chart-bar-container">
-                            <div class="chart-bar" style="width: {percentage}%">
-                                <span class="chart-value">{row['value']:.2f}</span>
-                            </div>
-                        </div>
-                    </div>
-                """
-        else:
-            graph_html += """
-                <div class="no-data-message">
-                    Aucune donnée disponible pour ce graphique
-                </div>
-            """
-    except Exception as e:
-        graph_html += f"""
-            <div class="error-message">
-                Erreur lors de la génération du graphique: {str(e)}
-            </div>
-        """
-    
-    graph_html += "</div>"
-    
-    popup_content = f"""
-    <style>
-        .popup-container {{
+# Stylesheet of the crime popups, shared by the inline and lazy popup modes
+POPUP_CSS = """
+        .popup-container {
             min-width: 600px;
             max-width: 90vw;
             max-height: 80vh;
@@ -891,9 +410,9 @@ def create_category_popup_content(country, year, crimes, total, graph_file, cate
             position: relative;
             padding: 16px;
             box-sizing: border-box;
-        }}
+        }
         
-        .view-toggle {{
+        .view-toggle {
             background-color: #6495ED;
             color: white;
             padding: 8px 16px;
@@ -907,58 +426,58 @@ def create_category_popup_content(country, year, crimes, total, graph_file, cate
             width: 100%;
             font-weight: 500;
             transition: all 0.2s ease;
-        }}
+        }
         
-        .view-toggle:hover {{
+        .view-toggle:hover {
             background-color: #2F4F4F;
-        }}
+        }
         
-        .no-data-message, .error-message {{
+        .no-data-message, .error-message {
             text-align: center;
             padding: 20px;
             background-color: #f5f5f5;
             border-radius: 4px;
             margin: 10px 0;
             color: #666;
-        }}
+        }
         
-        .error-message {{
+        .error-message {
             background-color: #fff3f3;
             color: #d32f2f;
-        }}
+        }
         
-        .chart-container {{
+        .chart-container {
             margin-top: 20px;
             transition: all 0.3s ease;
-        }}
+        }
         
-        .chart-row {{
+        .chart-row {
             display: flex;
             margin-bottom: 16px;  /* Increased from 12px */
             align-items: center;
             animation: fadeIn 0.5s ease-out;
-        }}
-        @keyframes fadeIn {{
-            from {{ opacity: 0; transform: translateY(10px); }}
-            to {{ opacity: 1; transform: translateY(0); }}
-        }}
+        }
+        @keyframes fadeIn {
+            from { opacity: 0; transform: translateY(10px); }
+            to { opacity: 1; transform: translateY(0); }
+        }
         
-        .chart-label {{
+        .chart-label {
             width: 150px;
             padding-right: 10px;
             text-overflow: ellipsis;
             overflow: hidden;
             white-space: nowrap;
-        }}
+        }
         
-        .chart-bar-container {{
+        .chart-bar-container {
             flex-grow: 1;
             background-color: #f0f0f0;
             border-radius: 4px;
             overflow: hidden;
-        }}
+        }
         
-        .chart-bar {{
+        .chart-bar {
             background-color: #2196F3;
             height: 24px;
             display: flex;
@@ -969,30 +488,30 @@ def create_category_popup_content(country, year, crimes, total, graph_file, cate
             transition: width 0.6s ease;
             min-width: 40px;
             position: relative;
-        }}
+        }
         
-        .chart-value {{
+        .chart-value {
             margin-left: auto;
             font-weight: 500;
             text-shadow: 1px 1px 2px rgba(0,0,0,0.2);
-        }}
+        }
         
-        #graphView, #tableView {{
+        #graphView, #tableView {
             display: none;
-        }}
+        }
         
-        #graphView.active, #tableView.active {{
+        #graphView.active, #tableView.active {
             display: block;
-        }}
+        }
         
-        .button-container {{
+        .button-container {
             display: flex;
             gap: 12px;
             margin: 15px 0;
             flex-wrap: wrap;
-        }}
+        }
         
-        .popup-button {{
+        .popup-button {
             padding: 8px 16px;
             border: none;
             cursor: pointer;
@@ -1002,48 +521,113 @@ def create_category_popup_content(country, year, crimes, total, graph_file, cate
             box-shadow: 0 2px 4px rgba(0,0,0,0.1);
             flex: 1;
             min-width: 140px;
-        }}
+        }
         
-        .trends-button {{
+        .trends-button {
             background-color: #4CAF50;
             color: white;
-        }}
+        }
         
-        .data-table {{
+        .data-table {
             width: 100%;
             border-collapse: collapse;
             margin-top: 10px;
-        }}
+        }
         
         .data-table th,
-        .data-table td {{
+        .data-table td {
             padding: 8px;
             text-align: left;
             border-bottom: 1px solid #ddd;
-        }}
+        }
         
-        .data-table th {{
+        .data-table th {
             background-color: #f0f0f0;
-        }}
+        }
         
-        @media screen and (max-width: 480px) {{
-            .button-container {{
+        @media screen and (max-width: 480px) {
+            .button-container {
                 flex-direction: column;
-            }}
+            }
             
-            .popup-button {{
+            .popup-button {
                 width: 100%;
-            }}
+            }
             
-            .chart-label {{
+            .chart-label {
                 width: 100px;
-            }}
+            }
             
-            .chart-value {{
+            .chart-value {
                 font-size: 11px;
-            }}
-        }}
-    </style>
+            }
+        }
+"""
+
+def create_category_popup_content(country, year, crimes, total, graph_file, category):
+    """Generate HTML content for popup with table/graph toggle and sorted data"""
+    total_display = "NA" if total == 'NA' or pd.isna(total) else f"{total:.2f}"
+    
+    # Prépare les données pour le graphique avec gestion des erreurs
+    data_rows = []
+    for crime in crimes:
+        if pd.notna(crime['Value']):
+            try:
+                value = float(crime['Value'])
+                if value >= 0:  # Vérifie que la valeur est valide
+                    data_rows.append({
+                        'type': crime['Crime Type'],
+                        'value': value
+                    })
+            except (ValueError, TypeError):
+                continue
+    
+    # Trie les données par valeur croissante
+    data_rows.sort(key=lambda x: x['value'])
+    
+    # Création du HTML pour le graphique
+    graph_html = """
+        <div class="chart-container">
+    """
+    
+    # Trouve la valeur maximum pour l'échelle avec gestion des erreurs
+    try:
+        if data_rows:  # Vérifie si nous avons des données valides
+            max_value = max(crime['value'] for crime in data_rows)
+            
+            # Si max_value est 0, on évite la division par zéro
+            if max_value == 0:
+                max_value = 1
+                
+            for row in data_rows:
+                percentage = (row['value'] / max_value) * 100
+                graph_html += f"""
+                    <div class="chart-row">
+                        <div class="chart-label" title="{row['type']}">{row['type']}</div>
+                        <div class="chart-bar-container">
+                            <div class="chart-bar" style="width: {percentage}%">
+                                <span class="chart-value">{row['value']:.2f}</span>
+                            </div>
+                        </div>
+                    </div>
+                """
+        else:
+            graph_html += """
+                <div class="no-data-message">
+                    Aucune donnée disponible pour ce graphique
+                </div>
+            """
+    except Exception as e:
+        graph_html += f"""
+            <div class="error-message">
+                Erreur lors de la génération du graphique: {str(e)}
+            </div>
+        """
+    
+    graph_html += "</div>"
+    
+    popup_content = f"""
+    <style>{POPUP_CSS}    </style>
     
     <div class="popup-container">
         <div class="popup-header">
@@ -1419,16 +1003,344 @@ def get_marker_color(value):
     else:
         return '#c5e1a5'  # Minimal
 
-def create_year_map(df, year, output_dir):
-    """Main function to create map for a specific year with dynamic category popups"""
+def marker_radii(values, min_radius=5, max_radius=20):
+    """calculate_marker_radius of a whole array of values"""
+    values = np.asarray(values, dtype=float)
+    radii = np.clip(values / 100, min_radius, max_radius)
+    return np.where(np.isnan(values) | (values <= 0), min_radius, radii)
+
+def marker_colors(values):
+    """get_marker_color of a whole array of values"""
+    values = np.asarray(values, dtype=float)
+    return np.select([np.isnan(values), values > 8000, values > 4000, values > 1000],
+                     ['#9e9e9e', '#d32f2f', '#f57c00', '#fdd835'], '#c5e1a5')
+
+def build_year_payload(cube, year):
+    """
+    Compact description of one year used by the lazy popups: per country the
+    present (crime type index, value) pairs, the category totals and the
+    radius/color of each marker, without any HTML.
+
+    Totals, radii and colors are computed on whole arrays, so the cost per
+    country is only the one of writing its rows.
+    """
+    y = cube.year_index[int(year)]
+    categories = ['Tous les crimes'] + cube.categories
+    entities = cube.countries_in_year(year)
+    entities = entities[~(np.isnan(cube.lat[entities]) | np.isnan(cube.lon[entities]))]
+    
+    # One column per category, 'Tous les crimes' first
+    totals = np.column_stack([cube.totals[entities, y], cube.category_totals[entities, y, :]])
+    totals = [[None if np.isnan(total) else round(total, 4) for total in column]
+              for column in totals.T.tolist()]
+    
+    values = cube.values[entities, y, :].tolist()
+    present = cube.present[entities, y, :]
+    payload = {
+        'year': int(year),
+        'crimeTypes': cube.crime_types,
+        'categories': {cat_name: np.flatnonzero(cube.category_matrix[:, j]).tolist()
+                       for j, cat_name in enumerate(cube.categories)},
+        'countries': [{
+            'name': cube.labels[c],
+            'graph': trend_page_url(cube.countries[c]),
+            'lat': lat,
+            'lon': lon
+        } for c, lat, lon in zip(entities.tolist(), cube.lat[entities].tolist(), cube.lon[entities].tolist())],
+        'rows': [[[k, None if np.isnan(row[k]) else round(row[k], 4)] for k in np.flatnonzero(mask).tolist()]
+                 for row, mask in zip(values, present)],
+        'totals': {},
+        'markers': {}
+    }
+    for cat_name, column in zip(categories, totals):
+        payload['totals'][cat_name] = column
+        column = np.array(column, dtype=float)
+        marked = np.flatnonzero(~np.isnan(column))
+        payload['markers'][cat_name] = [
+            [i, radius, color] for i, radius, color in
+            zip(marked.tolist(), marker_radii(column[marked]).tolist(), marker_colors(column[marked]).tolist())
+        ]
+    return payload
+
+def write_year_data(cube, year, output_dir):
+    """
+    Write data/year_{year}.js, which registers the year payload in
+    window.CRIME_DATA. A script file (rather than a .json fetched at runtime)
+    keeps the pages working when opened from file://.
+
+    Returns:
+        str: Path of the data file relative to output_dir
+    """
+    data_file = f'data/year_{int(year)}.js'
+    os.makedirs(os.path.join(output_dir, 'data'), exist_ok=True)
+    payload = json.dumps(build_year_payload(cube, year), separators=(',', ':'), ensure_ascii=False)
+    with open(os.path.join(output_dir, data_file), 'w', encoding='utf-8') as f:
+        f.write(f'window.CRIME_DATA = window.CRIME_DATA || {{}};\nwindow.CRIME_DATA[{int(year)}] = {payload};\n')
+    return data_file
+
+def get_lazy_popup_js():
+    """Return the JavaScript rendering the popup table and bar chart from the year payload"""
+    return """
+    function escapeCrimeHtml(text) {
+        return String(text).replace(/[&<>"']/g, function(ch) {
+            return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[ch];
+        });
+    }
+    
+    function renderCrimePopup(data, c, category) {
+        const country = data.countries[c];
+        let rows = data.rows[c];
+        if (category !== 'Tous les crimes') {
+            const members = new Set(data.categories[category]);
+            rows = rows.filter(row => members.has(row[0]));
+        }
+        const total = data.totals[category][c];
+        const totalDisplay = total === null ? 'NA' : total.toFixed(2);
+        
+        // Bar chart sorted by increasing value
+        const bars = rows.filter(row => row[1] !== null && row[1] >= 0)
+                         .map(row => ({type: data.crimeTypes[row[0]], value: row[1]}))
+                         .sort((a, b) => a.value - b.value);
+        let graphHtml = '<div class="chart-container">';
+        if (bars.length) {
+            const maxValue = Math.max(...bars.map(bar => bar.value)) || 1;
+            bars.forEach(bar => {
+                const type = escapeCrimeHtml(bar.type);
+                graphHtml += `
+                    <div class="chart-row">
+                        <div class="chart-label" title="${type}">${type}</div>
+                        <div class="chart-bar-container">
+                            <div class="chart-bar" style="width: ${(bar.value / maxValue) * 100}%">
+                                <span class="chart-value">${bar.value.toFixed(2)}</span>
+                            </div>
+                        </div>
+                    </div>`;
+            });
+        } else {
+            graphHtml += `
+                <div class="no-data-message">
+                    Aucune donnée disponible pour ce graphique
+                </div>`;
+        }
+        graphHtml += '</div>';
+        
+        let tableHtml = '';
+        rows.forEach(row => {
+            tableHtml += `
+                <tr>
+                    <td>${escapeCrimeHtml(data.crimeTypes[row[0]])}</td>
+                    <td>${row[1] === null ? 'NA' : row[1].toFixed(2)}</td>
+                </tr>`;
+        });
+        if (!rows.some(row => row[1] !== null)) {
+            tableHtml += `
+                <tr>
+                    <td colspan="2" style="text-align: center;">Aucune donnée disponible</td>
+                </tr>`;
+        }
+        
+        return `
+        <div class="popup-container">
+            <div class="popup-header">
+                <h4 style="margin: 0 0 5px 0;">${escapeCrimeHtml(country.name)} - ${data.year}</h4>
+                <h5 style="margin: 0;">${escapeCrimeHtml(category)}</h5>
+                <p style="margin: 5px 0;"><strong>Taux total:</strong> ${totalDisplay}</p>
+            </div>
+            <div class="button-container">
+                <button onclick="window.open('${country.graph}', '_blank')"
+                        class="popup-button trends-button">
+                    Voir les tendances
+                </button>
+                <button id="rankingsButton"
+                        onclick="window.open('rankings.html', '_blank')"
+                        class="popup-button">
+                    Voir les classements européens
+                </button>
+            </div>
+            <button onclick="document.getElementById('graphView').classList.toggle('active');
+                            document.getElementById('tableView').classList.toggle('active');
+                            this.textContent = this.textContent.includes('graphique') ?
+                                'Voir le tableau' : 'Voir le graphique';"
+                    class="view-toggle">
+                Voir le graphique
+            </button>
+            <div id="tableView" class="active">
+                <table class="data-table">
+                    <tr>
+                        <th>Type de crime</th>
+                        <th>Taux</th>
+                    </tr>
+                    ${tableHtml}
+                </table>
+            </div>
+            <div id="graphView">
+                ${graphHtml}
+            </div>
+        </div>`;
+    }
+    """
+
+class LazyCrimeMarkers(MacroElement):
+    """
+    Circle markers of every category created in the browser from the year
+    payload (see write_year_data).
+
+    Each category layer is data driven: markers only carry the index of
+    their country and a single click handler per layer opens a popup whose
+    HTML is built at that moment. Markers are added in one call, which lets
+    marker clusters index them in chunks.
+    """
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            (function() {
+                var data = window.CRIME_DATA[{{ this.year }}];
+                var map = {{ this._parent.get_name() }};
+                var groups = {
+                {%- for cat_name, group in this.groups.items() %}
+                    {{ cat_name|tojson }}: {{ group.get_name() }},
+                {%- endfor %}
+                };
+                Object.keys(data.markers).forEach(function(category) {
+                    var group = groups[category];
+                    var layers = data.markers[category].map(function(marker) {
+                        var country = data.countries[marker[0]];
+                        return L.circleMarker([country.lat, country.lon], {
+                            radius: marker[1],
+                            color: 'black',
+                            weight: 1,
+                            fill: true,
+                            fillColor: marker[2],
+                            fillOpacity: 0.7,
+                            entity: marker[0]
+                        });
+                    });
+                    group.on('click', function(e) {
+                        if (e.layer.options.entity === undefined) return;
+                        L.popup({maxWidth: 300})
+                            .setLatLng(e.layer.getLatLng())
+                            .setContent(renderCrimePopup(data, e.layer.options.entity, category))
+                            .openOn(map);
+                    });
+                    if (group.addLayers) {
+                        group.addLayers(layers);
+                    } else {
+                        layers.forEach(function(layer) { group.addLayer(layer); });
+                    }
+                });
+            })();
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, year, groups):
+        super().__init__()
+        self._name = 'LazyCrimeMarkers'
+        self.year = int(year)
+        self.groups = groups
+
+def add_inline_markers(cube, year, layer_groups):
+    """Add the markers of every category with their pre-rendered popups"""
+    y = cube.year_index[int(year)]
+    all_crimes_group = layer_groups['Tous les crimes']
+    for c in cube.countries_in_year(year):
+        country = cube.labels[c]
+        try:
+            if np.isnan(cube.lat[c]) or np.isnan(cube.lon[c]):
+                continue
+            location = [float(cube.lat[c]), float(cube.lon[c])]
+            
+            # Popups link to the country in the shared trends page
+            graph_file = trend_page_url(cube.countries[c])
+            
+            # Totals per category are precomputed in the cube
+            category_data = {}
+            for cat_name in cube.categories:
+                total = cube.category_totals[c, y, cube.category_index[cat_name]]
+                category_data[cat_name] = {
+                    'total': 'NA' if pd.isna(total) else float(total),
+                    'crimes': cube.crime_rows(c, y, cat_name)
+                }
+            
+            total_crime = float(cube.totals[c, y])
+            
+            # Create HTML content for each category
+            popup_contents = {
+                'Tous les crimes': create_category_popup_content(country, year, cube.crime_rows(c, y), 
+                                                            total_crime, graph_file, 'Tous les crimes')
+            }
+            for cat_name, cat_info in category_data.items():
+                popup_contents[cat_name] = create_category_popup_content(country, year, cat_info['crimes'], 
+                                                                        cat_info['total'], graph_file, cat_name)
+            
+            # Create markers for each category with hidden popup data
+            marker_data = {
+                'country': country,
+                'popups': popup_contents,
+                'graph_file': graph_file
+            }
+            
+            # Tous les crimes marker
+            if pd.notna(total_crime):
+                marker = folium.CircleMarker(
+                    location=location,
+                    radius=calculate_marker_radius(total_crime),
+                    popup=folium.Popup(popup_contents['Tous les crimes'], max_width=300),
+                    color='black',
+                    weight=1,
+                    fill=True,
+                    fillColor=get_marker_color(total_crime),
+                    fillOpacity=0.7,
+                    html=f'<div class="marker-data" style="display:none;" data-info=\'{json.dumps(marker_data)}\'></div>'
+                )
+                all_crimes_group.add_child(marker)
+            
+            # Category-specific markers
+            for cat_name, cat_info in category_data.items():
+                cat_total = cat_info['total']
+                if cat_total != 'NA' and pd.notna(cat_total):
+                    cat_marker = folium.CircleMarker(
+                        location=location,
+                        radius=calculate_marker_radius(cat_total),
+                        popup=folium.Popup(popup_contents[cat_name], max_width=300),
+                        color='black',
+                        weight=1,
+                        fill=True,
+                        fillColor=get_marker_color(cat_total),
+                        fillOpacity=0.7,
+                        html=f'<div class="marker-data" style="display:none;" data-info=\'{json.dumps(marker_data)}\'></div>'
+                    )
+                    layer_groups[cat_name].add_child(cat_marker)
+            
+        except Exception as e:
+            print(f"Error processing {country}: {str(e)}")
+            continue
+
+def create_year_map(cube, year, output_dir, data_type=DATA_TYPE_RATE, popup_mode='inline', geo_level='country',
+                    render_mode='svg', cluster=False, geometry_format=GEOMETRY_FORMAT):
+    """Main function to create map for a specific year with dynamic category popups
+
+    cube may be None, in which case only the rows of this year are loaded.
+
+    popup_mode 'inline' pre-renders every popup in the page. 'lazy' writes a
+    compact data/year_{year}.js file instead and renders the popups in the
+    browser when they are opened, with no Python work per country: use it
+    for the regional levels (see GEO_LEVELS), which have thousands of markers.
+
+    render_mode 'canvas' draws the markers on a canvas instead of one SVG
+    element each (see RENDER_MODES) and cluster groups the markers of each
+    category with Leaflet.markercluster. geometry_format is the format of
+    the base layer (see ensure_geometry_asset).
+    """
     # Initialize and process data
     categories = get_crime_categories()
-    crime_mapping = create_crime_category_mapping(categories)
-    year_data = process_year_data(df, year)
-    year_data['Category'] = year_data['Crime Type'].map(lambda x: crime_mapping.get(x, 'Cyber & Other'))
+    if cube is None:
+        config = GEO_LEVELS[geo_level]
+        year_data = load_map_data(data_type, geo_level, years=[year])
+        cube = CrimeCube.from_frame(year_data, categories, config['key'], config['label'])
     
     # Create base map without tiles
-    m = folium.Map(location=[48, 2], zoom_start=4, tiles=None)
+    m = folium.Map(location=[48, 2], zoom_start=4, tiles=None, prefer_canvas=(render_mode == 'canvas'))
 
     # Add GeoJSON layer with blue styling as a base layer
     geojson_style = {
@@ -1438,13 +1350,13 @@ def create_year_map(df, year, output_dir):
         'fillOpacity': 0.3
     }
     
-    # Create GeoJSON layer with custom style function
-    geojson = folium.GeoJson(
-        'europe.geojson',
+    # Create GeoJSON layer from the shared, simplified geometry asset
+    geometry_asset = ensure_geometry_asset(output_dir, fmt=geometry_format, geo_level=geo_level)
+    base_layer = VectorTileBase if geometry_asset == TILES_URL else SharedGeoJson
+    geojson = base_layer(
+        geometry_asset,
+        geojson_style,
         name='Europe',
-        style_function=lambda x: geojson_style,
-        tooltip=None,
-        popup=None,
         overlay=False  # This makes it a base layer instead of an overlay
     )
     
@@ -1711,107 +1623,45 @@ def create_year_map(df, year, output_dir):
     </style>
     """
     m.get_root().html.add_child(folium.Element(custom_geojson_style))
-    geojson.add_to(m)
+    if geometry_asset is not None:
+        geojson.add_to(m)
 
-    # Create mutually exclusive layer groups
+    # Create mutually exclusive layer groups (marker clusters when enabled)
     layer_groups = {}
+    if cluster:
+        make_group = lambda name: plugins.MarkerCluster(name=name, options=CLUSTER_OPTIONS)
+    else:
+        make_group = lambda name: folium.FeatureGroup(name=name)
     
     # Create "Tous les crimes" layer
-    all_crimes_group = folium.FeatureGroup(name="Tous les crimes")
+    all_crimes_group = make_group("Tous les crimes")
     layer_groups['Tous les crimes'] = all_crimes_group
     
     # Create category-specific layer groups
     for cat_name, cat_info in categories.items():
         if cat_info is not None:
-            layer_groups[cat_name] = folium.FeatureGroup(name=cat_name)
+            layer_groups[cat_name] = make_group(cat_name)
     
-    # Process each country
-    for country in year_data['NAME'].unique():
-        try:
-            country_data = year_data[year_data['NAME'] == country]
-            if country_data['lat'].isna().all() or country_data['lon'].isna().all():
-                continue
-            
-            # Use country-specific graph file instead of year-specific
-            graph_file = f'graph_{country.replace(" ", "_")}.html'
-            graph_path = os.path.join(output_dir, graph_file)
-            
-            # Only create graph file if it doesn't exist
-            if not os.path.exists(graph_path):
-                graph_html = create_crime_trend_graph(df, country)
-                with open(graph_path, 'w', encoding='utf-8') as f:
-                    f.write(graph_html)
-            
-            # Calculate totals and prepare data for each category
-            category_data = {}
-            for cat_name, cat_info in categories.items():
-                if cat_info is not None:
-                    cat_crimes = cat_info['crimes']
-                    cat_data = country_data[country_data['Crime Type'].isin(cat_crimes)]
-                    total = cat_data['Value'].sum()
-                    category_data[cat_name] = {
-                        'total': 'NA' if pd.isna(total) else total,
-                        'crimes': cat_data.to_dict('records')
-                    }
-            
-            total_crime = country_data['Value'].sum()
-            
-            # Create HTML content for each category
-            popup_contents = {
-                'Tous les crimes': create_category_popup_content(country, year, country_data.to_dict('records'), 
-                                                            total_crime, graph_file, 'Tous les crimes')
-            }
-            for cat_name, cat_info in category_data.items():
-                popup_contents[cat_name] = create_category_popup_content(country, year, cat_info['crimes'], 
-                                                                        cat_info['total'], graph_file, cat_name)
-            
-            # Create markers for each category with hidden popup data
-            marker_data = {
-                'country': country,
-                'popups': popup_contents,
-                'graph_file': graph_file
-            }
-            
-            # Tous les crimes marker
-            if pd.notna(total_crime):
-                marker = folium.CircleMarker(
-                    location=[country_data['lat'].iloc[0], country_data['lon'].iloc[0]],
-                    radius=calculate_marker_radius(total_crime),
-                    popup=folium.Popup(popup_contents['Tous les crimes'], max_width=300),
-                    color='black',
-                    weight=1,
-                    fill=True,
-                    fillColor=get_marker_color(total_crime),
-                    fillOpacity=0.7,
-                    html=f'<div class="marker-data" style="display:none;" data-info=\'{json.dumps(marker_data)}\'></div>'
-                )
-                all_crimes_group.add_child(marker)
-            
-            # Category-specific markers
-            for cat_name, cat_info in category_data.items():
-                cat_total = cat_info['total']
-                if cat_total != 'NA' and pd.notna(cat_total):
-                    cat_marker = folium.CircleMarker(
-location=[country_data['lat'].iloc[0], country_data['lon'].iloc[0]],
-                        radius=calculate_marker_radius(cat_total),
-                        popup=folium.Popup(popup_contents[cat_name], max_width=300),
-                        color='black',
-                        weight=1,
-                        fill=True,
-                        fillColor=get_marker_color(cat_total),
-                        fillOpacity=0.7,
-                        html=f'<div class="marker-data" style="display:none;" data-info=\'{json.dumps(marker_data)}\'></div>'
-                    )
-                    layer_groups[cat_name].add_child(cat_marker)
-            
-        except Exception as e:
-            print(f"Error processing {country}: {str(e)}")
-            continue
+    # Trends page linked from the popups, built here when a map is rendered alone
+    if not os.path.exists(os.path.join(output_dir, TRENDS_PAGE)):
+        create_trends_page(load_map_data(data_type, geo_level), output_dir, geo_level)
+    
+    # Lazy popups are rendered in the browser from the year data file
+    if popup_mode != 'lazy':
+        add_inline_markers(cube, year, layer_groups)
     
     # Add all crime layer groups to map
     for group in layer_groups.values():
         group.add_to(m)
     
+    if popup_mode == 'lazy':
+        data_file = write_year_data(cube, year, output_dir)
+        m.get_root().header.add_child(folium.JavascriptLink(data_file), name='year_data')
+        m.get_root().html.add_child(folium.Element(
+            f'<style>{POPUP_CSS}</style>\n<script>{get_lazy_popup_js()}</script>'
+        ))
+        m.add_child(LazyCrimeMarkers(year, layer_groups))
+    
     # Add custom JavaScript for mutually exclusive layer control and popup updates
     custom_js = """
     <script>
@@ -2007,66 +1857,478 @@ def create_main_page(years, output_dir):
     with open(os.path.join(output_dir, 'index.html'), 'w', encoding='utf-8') as f:
         f.write(main_html)
 
-def create_rankings_page(df, output_dir):
-    """Create the rankings page with embedded data"""
-    # Read the rankings page template
-    with open('templates/rankings_template.html', 'r', encoding='utf-8') as f:
-        template = f.read()
+def load_crime_index(path=CHOROPLETH_INDEX_FILE):
+    """
+    Crime index per country and year written by indice_criminaliter.py
+
+    Returns:
+        DataFrame with Country, Year (int) and Index columns, or None when the
+        index has not been computed
+    """
+    if not os.path.exists(path):
+        return None
+    index_df = pd.read_csv(path, encoding='utf-8')
+    column = next((col for col in CHOROPLETH_INDEX_COLUMNS if col in index_df.columns), None)
+    if column is None:
+        print(f"No index column in {path}, expected one of {CHOROPLETH_INDEX_COLUMNS}")
+        return None
+    return pd.DataFrame({
+        'Country': index_df['Country'],
+        # Years are ISO 8601 dates (2022-01-01T00:00:00)
+        'Year': pd.to_datetime(index_df['Year']).dt.year,
+        'Index': pd.to_numeric(index_df[column], errors='coerce')
+    })
+
+def quantile_breaks(values, classes=len(CHOROPLETH_COLORS)):
+    """Upper bounds of the first classes-1 colour classes, from the quantiles of values"""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return []
+    return np.unique(np.quantile(values, np.linspace(0, 1, classes + 1)[1:-1]).round(4)).tolist()
+
+def _nullable(values):
+    """List of rounded values, None for NaN (JSON null)"""
+    return [None if np.isnan(value) else round(value, 4) for value in values.tolist()]
+
+def build_choropleth_data(cube, feature_codes, index=None):
+    """
+    Per-year arrays colouring the polygons of the base geometry
+
+    Entities are matched to the polygons by code (ISO3 or NUTS code). Codes
+    shared by several entities are left out rather than mixing their rates.
+    The class breaks are computed over all the years, so that a colour means
+    the same value whatever the year.
+
+    Args:
+        cube: CrimeCube of the map data
+        feature_codes: Series entity key -> polygon code
+        index: DataFrame with code, Year and Index columns (country level only)
+
+    Returns:
+        tuple: (header, {year: shard}) where the header holds the codes and
+        the breaks, and each shard {'values': {category: [...]}, 'index': [...]}
+        one value (or None) per code
+    """
+    codes = feature_codes.reindex(cube.countries)
+    counts = codes.value_counts()
+    selected = np.flatnonzero(codes.notna().to_numpy() & codes.map(counts).eq(1).to_numpy())
+    keys = codes.iloc[selected].tolist()
+
+    # Totals of cells without any row are missing, not 0
+    present = cube.present[selected]
+    category_present = (present.astype(float) @ cube.category_matrix) > 0
+    values = {'Tous les crimes': np.where(present.any(axis=2), cube.totals[selected], np.nan)}
+    for j, cat_name in enumerate(cube.categories):
+        values[cat_name] = np.where(category_present[:, :, j], cube.category_totals[selected, :, j], np.nan)
+
+    header = {
+        'keys': keys,
+        'colors': CHOROPLETH_COLORS,
+        'breaks': {cat_name: quantile_breaks(table) for cat_name, table in values.items()}
+    }
+    index_table = None
+    if index is not None and not index.empty:
+        index_table = (index.pivot_table(index='code', columns='Year', values='Index', aggfunc='first')
+                       .reindex(index=keys, columns=cube.years).to_numpy(dtype=float))
+        header['breaks']['index'] = quantile_breaks(index_table)
+
+    shards = {}
+    for y, year in enumerate(cube.years):
+        shard = {'values': {cat_name: _nullable(table[:, y]) for cat_name, table in values.items()}}
+        if index_table is not None:
+            shard['index'] = _nullable(index_table[:, y])
+        shards[year] = shard
+    return header, shards
+
+def create_choropleth_data(df, cube, output_dir, geo_level='country'):
+    """
+    Write data/choropleth.js and the data/choropleth_{year}.js shards read by
+    the choropleth mode of timeline.html
+
+    Returns:
+        list: Paths of the written files, relative to output_dir
+    """
+    config = GEO_LEVELS[geo_level]
+    feature_codes = df.groupby(config['key'])[config['feature_key']].first()
+    index = None
+    if config['nuts'] is None:
+        index = load_crime_index()
+        if index is not None:
+            # The index is keyed by country name, matched through both name columns
+            names = pd.concat([df[['Country', 'ISO3']],
+                               df[['NAME', 'ISO3']].rename(columns={'NAME': 'Country'})])
+            names = names.drop_duplicates('Country').set_index('Country')['ISO3']
+            index = index.assign(code=index['Country'].map(names)).dropna(subset=['code'])
+
+    header, shards = build_choropleth_data(cube, feature_codes, index)
+    header['property'] = config['feature_property']
+    os.makedirs(os.path.join(output_dir, 'data'), exist_ok=True)
+    with open(os.path.join(output_dir, CHOROPLETH_HEADER), 'w', encoding='utf-8') as f:
+        f.write(f'window.CHOROPLETH = {json.dumps(header, separators=(",", ":"), ensure_ascii=False)};\n')
+    files = [CHOROPLETH_HEADER]
+    for year, shard in shards.items():
+        data_file = f'data/choropleth_{year}.js'
+        payload = json.dumps(shard, separators=(',', ':'), ensure_ascii=False)
+        with open(os.path.join(output_dir, data_file), 'w', encoding='utf-8') as f:
+            f.write(f'window.CHOROPLETH_DATA = window.CHOROPLETH_DATA || {{}};\n'
+                    f'window.CHOROPLETH_DATA[{year}] = {payload};\n')
+        files.append(data_file)
+    return files
+
+def create_timeline_page(years, output_dir, geometry_asset=None, geo_level='country', render_mode='svg',
+                         choropleth=False):
+    """
+    Create timeline.html, a single-page alternative to index.html
+    
+    One Leaflet map (two in comparison mode) keeps the base geometry loaded
+    and only swaps its markers when the year changes. Year data comes from
+    the data/year_{year}.js shards written by the lazy year maps, the
+    adjacent years being prefetched during playback.
+    
+    Args:
+        years: List of years to display
+        output_dir: Directory to save the output HTML file
+        geometry_asset: Geometry .js asset (defaults to GEOMETRY_LEVEL)
+        geo_level: Granularity of the maps (see GEO_LEVELS)
+        render_mode: 'svg' or 'canvas' marker rendering (see RENDER_MODES)
+        choropleth: Offer the choropleth mode (needs the files written by
+            create_choropleth_data and a GeoJSON/TopoJSON geometry)
+    """
+    if geometry_asset is None:
+        geometry_asset = ensure_geometry_asset(output_dir, geo_level=geo_level)
+    years_js_array = "[" + ",".join(str(int(year)) for year in years) + "]"
+    category_colors = {cat_name: (cat_info['color'] if cat_info else '#333333')
+                       for cat_name, cat_info in get_crime_categories().items()}
+    
+    geometry_scripts = f'<script src="{geometry_asset}"></script>' if geometry_asset else ''
+    if geometry_asset == TILES_URL:
+        tiles = {'url': TILES_URL, 'layer': SHAPES_LAYER, 'hidden': HIDDEN_TILE_LAYERS, 'maxNativeZoom': TILES_MAXZOOM}
+        geometry_scripts = (f'<script src="{VECTORGRID_URL}"></script>\n    '
+                            f'<script>window.EUROPE_TILES = {json.dumps(tiles)};</script>')
+    elif geometry_asset and geometry_asset.endswith('_topojson.js'):
+        geometry_scripts = f'<script src="{TOPOJSON_CLIENT_URL}"></script>\n    ' + geometry_scripts
     
-    # Convert DataFrame to JSON
-    df_json = df.to_json(orient='records')
+    with open('templates/timeline_template.html', 'r', encoding='utf-8') as f:
+        template = f.read()
     
-    # Insert the data into the template
-    rankings_html = template.replace(
-        'let crimeData = [];',
-        f'let crimeData = {df_json};'
+    timeline_html = template.replace('const years = [];', f'const years = {years_js_array};')
+    timeline_html = timeline_html.replace(
+        'const categoryColors = {};',
+        f'const categoryColors = {json.dumps(category_colors, ensure_ascii=False)};'
+    )
+    timeline_html = timeline_html.replace('<!-- GEOMETRY_ASSETS -->', geometry_scripts)
+    timeline_html = timeline_html.replace(
+        '<!-- CHOROPLETH_ASSETS -->',
+        f'<script src="{CHOROPLETH_HEADER}"></script>' if choropleth else ''
     )
+    timeline_html = timeline_html.replace('const preferCanvas = false;',
+                                          f'const preferCanvas = {json.dumps(render_mode == "canvas")};')
+    timeline_html = timeline_html.replace(
+        '<!-- POPUP_ASSETS -->',
+        f'<style>{POPUP_CSS}</style>\n    <script>{get_lazy_popup_js()}</script>'
+    )
+    
+    with open(os.path.join(output_dir, 'timeline.html'), 'w', encoding='utf-8') as f:
+        f.write(timeline_html)
+
+def build_rankings(df, countries=RANKING_COUNTRIES, aliases=RANKING_NAME_ALIASES):
+    """
+    Pre-aggregate the rankings page.
+    
+    For each year, countries are sorted by decreasing value for every crime
+    type, every category ('category:<name>') and all crimes ('all'). Names
+    are normalized with aliases and the countries of the countries list
+    without a value are listed apart.
+    
+    Args:
+        df: DataFrame with NAME, Year, Crime Type and Value columns
+        countries: Names always listed (RANKING_COUNTRIES, or every region)
+        aliases: Dict alternative name -> listed name
+    
+    Returns:
+        dict: year -> {key: {'ranked': [[name, value], ...], 'missing': [name, ...]}}
+    """
+    rates = df[['NAME', 'Year', 'Crime Type', 'Value']].copy()
+    if aliases:
+        rates['NAME'] = rates['NAME'].replace(aliases)
+    rates['Year'] = rates['Year'].astype(int)
+    
+    crime_category = {crime: f'category:{cat_name}'
+                      for cat_name, cat_info in get_crime_categories().items() if cat_info is not None
+                      for crime in cat_info['crimes']}
+    
+    # Same aggregation as the page used to do: totals of the non-missing
+    # values, a country with no value at all has no total
+    by_crime = rates.dropna(subset=['Value']).rename(columns={'Crime Type': 'Key'})
+    by_category = rates.assign(Key=rates['Crime Type'].map(crime_category)).dropna(subset=['Key'])
+    by_category = by_category.groupby(['Year', 'Key', 'NAME'])['Value'].sum(min_count=1).reset_index()
+    all_crimes = rates.groupby(['Year', 'NAME'])['Value'].sum(min_count=1).reset_index().assign(Key='all')
+    
+    ranked = pd.concat([by_crime[['Year', 'Key', 'NAME', 'Value']], by_category, all_crimes])
+    ranked = ranked.dropna(subset=['Value']).sort_values(['Year', 'Key', 'Value'], ascending=[True, True, False],
+                                                         kind='stable')
+    
+    # Every key gets an entry, even when no country has a value for it
+    keys = ['all'] + list(dict.fromkeys(crime_category.values())) + sorted(rates['Crime Type'].dropna().unique())
+    rankings = {int(year): {key: [] for key in keys} for year in sorted(rates['Year'].unique())}
+    for (year, key), group in ranked.groupby(['Year', 'Key'], sort=False):
+        rankings[int(year)][key] = [[name, round(float(value), 4)]
+                                    for name, value in zip(group['NAME'], group['Value'])]
+    
+    for year_rankings in rankings.values():
+        for key, rows in year_rankings.items():
+            present = {name for name, _ in rows}
+            year_rankings[key] = {
+                'ranked': rows,
+                'missing': [name for name in countries if name not in present]
+            }
+    return rankings
+
+def create_rankings_page(df, output_dir, geo_level='country'):
+    """
+    Create the rankings page and its data shards
+    
+    The page embeds no data: each year is written to data/rankings_{year}.js
+    as pre-sorted rankings (see build_rankings) and loaded on demand.
+    Regions are ranked as "<name> (<code>)", every region of the data being
+    listed.
+    
+    Returns:
+        list: Paths of the written files, relative to output_dir
+    """
+    config = GEO_LEVELS[geo_level]
+    if config['nuts'] is None:
+        rankings = build_rankings(df)
+    else:
+        codes = df[config['key']].astype(str)
+        names = df[config['label']].astype(str).where(df[config['label']].notna(), codes)
+        named = df.assign(NAME=names + ' (' + codes + ')')
+        rankings = build_rankings(named, sorted(named['NAME'].unique()), aliases=None)
+    
+    os.makedirs(os.path.join(output_dir, 'data'), exist_ok=True)
+    written = ['rankings.html']
+    for year, year_rankings in rankings.items():
+        shard = f'data/rankings_{year}.js'
+        payload = json.dumps(year_rankings, separators=(',', ':'), ensure_ascii=False)
+        with open(os.path.join(output_dir, shard), 'w', encoding='utf-8') as f:
+            f.write(f'window.RANKINGS_DATA = window.RANKINGS_DATA || {{}};\n'
+                    f'window.RANKINGS_DATA[{year}] = {payload};\n')
+        written.append(shard)
+    
+    # Read the rankings page template
+    with open('templates/rankings_template.html', 'r', encoding='utf-8') as f:
+        rankings_html = f.read()
     
     # Save the rankings page
     with open(os.path.join(output_dir, 'rankings.html'), 'w', encoding='utf-8') as f:
         f.write(rankings_html)
-
-def create_temporal_crime_map(csv_file):
-    """Main function to create the temporal crime map"""
-    df = pd.read_csv(csv_file, encoding='utf-8') #adding utf-8
-    df['Year'] = df['Year'].astype(int)
-    df['Value'] = pd.to_numeric(df['Value'], errors='coerce')
-    df['lat'] = pd.to_numeric(df['lat'], errors='coerce')
-    df['lon'] = pd.to_numeric(df['lon'], errors='coerce')
+    return written
+
+def load_map_data(data_type=DATA_TYPE_RATE, geo_level='country', years=None):
+    """Load the rows used by the map pages, in a stable order"""
+    config = GEO_LEVELS[geo_level]
+    # Year, Value, lat and lon are already numeric in the columnar dataset
+    if config['nuts'] is None:
+        df = load_crimes(years=years, data_types=[data_type])
+    else:
+        # Only the partitions of the requested NUTS level are read
+        df = load_regions(years=years, data_types=[data_type], levels=[config['nuts']])
     df = df.dropna(subset=['lat', 'lon'])
+    # Stable row order so that the slice hashes do not depend on file layout
+    return df.sort_values([config['key'], 'Year', 'Crime Type']).reset_index(drop=True)
+
+def _init_render_worker(cube_dir):
+    """Worker initializer for platforms without fork: memory-map the saved cube"""
+    global _SHARED_CUBE
+    _SHARED_CUBE = CrimeCube.load(cube_dir)
+
+def _render_year_task(task):
+    """Write map_{year}.html from the shared cube"""
+    year, output_dir, data_type, popup_mode, geo_level, render_mode, cluster, geometry_format = task
+    print(f"Creating map for year {year}")
+    create_year_map(_SHARED_CUBE, year, output_dir, data_type, popup_mode, geo_level, render_mode, cluster,
+                    geometry_format)
+    return f'map_{year}.html'
+
+def run_render_tasks(func, tasks, workers, cube_dir=CUBE_DIR):
+    """
+    Run rendering tasks sequentially or on a process pool.
+
+    Results are returned in task order whatever the completion order, so the
+    build is deterministic. Workers read the module-level _SHARED_CUBE: it is
+    inherited through fork when available, otherwise each worker memory-maps
+    the cube saved in cube_dir.
+    """
+    if workers <= 1 or len(tasks) <= 1:
+        return [func(task) for task in tasks]
+    
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+        initializer, initargs = None, ()
+    else:
+        context = multiprocessing.get_context('spawn')
+        _SHARED_CUBE.save(cube_dir)
+        initializer, initargs = _init_render_worker, (cube_dir,)
+    
+    with context.Pool(min(workers, len(tasks)), initializer, initargs) as pool:
+        return pool.map(func, tasks, chunksize=1)
+
+def create_temporal_crime_map(data_type=DATA_TYPE_RATE, force=False, workers=1, popup_mode='inline',
+                              geo_level='country', render_mode='svg', cluster=False,
+                              geometry_format=GEOMETRY_FORMAT):
+    """
+    Main function to create the temporal crime map
+
+    The build is incremental: each page is regenerated only when the hash of
+    its input slice (year rows, template version) differs from the
+    one recorded in crime_maps/build_manifest.json, and pages that are no
+    longer produced are deleted.
+
+    Args:
+        data_type: Data type to map
+        force: Rebuild every page regardless of the manifest
+        workers: Number of processes rendering the year maps
+        popup_mode: 'inline' (popups pre-rendered in each map) or 'lazy'
+            (popups rendered in the browser from data/year_{year}.js, which
+            also enables the single-page timeline.html)
+        geo_level: 'country', 'nuts2' or 'nuts3' (see GEO_LEVELS), each
+            written to its own directory
+        render_mode: 'svg' or 'canvas' marker rendering (see RENDER_MODES)
+        cluster: Group the markers with Leaflet.markercluster
+        geometry_format: Base layer of the maps, 'geojson', 'topojson' or
+            'mvt' (vector tiles)
+    """
+    global _SHARED_CUBE
+    config = GEO_LEVELS[geo_level]
+    df = load_map_data(data_type, geo_level)
+    if df.empty:
+        print(f"No {geo_level} data to map")
+        return
+    _SHARED_CUBE = CrimeCube.from_frame(df, get_crime_categories(), config['key'], config['label'])
     
-    output_dir = 'crime_maps'
+    output_dir = config['output_dir']
     os.makedirs(output_dir, exist_ok=True)
+    manifest = BuildManifest(output_dir)
     
     # Create the rankings page first
-    create_rankings_page(df, output_dir)
-    
-    # Create graph files for all countries first
-    countries = df['NAME'].unique()
-    print(f"Creating trend graphs for {len(countries)} countries")
-    for country in countries:
-        graph_file = f'graph_{country.replace(" ", "_")}.html'
-        graph_path = os.path.join(output_dir, graph_file)
-        if not os.path.exists(graph_path):
-            graph_html = create_crime_trend_graph(df, country)
-            with open(graph_path, 'w', encoding='utf-8') as f:
-                f.write(graph_html)
+    rankings_hash = fingerprint(df, TEMPLATE_VERSION, file_fingerprint('templates/rankings_template.html'))
+    rankings_files = ['rankings.html'] + [f'data/rankings_{int(year)}.js' for year in sorted(df['Year'].unique())]
+    if force or any([manifest.is_stale(artifact, rankings_hash) for artifact in rankings_files]):
+        rankings_files = create_rankings_page(df, output_dir, geo_level)
+    for artifact in rankings_files:
+        manifest.record(artifact, rankings_hash)
+    
+    # Create the trends page of all countries before the maps linking to it
+    trends_hash = fingerprint(df, TEMPLATE_VERSION, file_fingerprint('templates/trends_template.html'))
+    trends_files = [TRENDS_PAGE, TRENDS_DATA]
+    if force or any([manifest.is_stale(artifact, trends_hash) for artifact in trends_files]):
+        print(f"Creating trends page for {df[config['key']].nunique()} {geo_level} entities")
+        trends_files = create_trends_page(df, output_dir, geo_level)
+    for artifact in trends_files:
+        manifest.record(artifact, trends_hash)
     
     # Create maps for each year
     years = sorted(df['Year'].unique())
+    # Shared geometry assets, rebuilt when the source or the settings change
+    # (none when the regional geometry is not available)
+    geometry_source, asset_name = config['geometry'], config['asset_name']
+    if geometry_format == 'mvt':
+        geometry_source = config['tiles_source']
+    if geometry_format == 'mvt' and os.path.exists(geometry_source):
+        sources = [geometry_source] + ([CRIMES_SOURCE] if config['nuts'] is None else [])
+        geometry_hash = fingerprint([file_fingerprint(source) for source in sources if os.path.exists(source)],
+                                    TILES_MINZOOM, TILES_MAXZOOM, TILES_EXTENT, config['properties'])
+        tiles_files = [TILES_FILE, TILES_DIR]
+        if force or any([manifest.is_stale(artifact, geometry_hash) for artifact in tiles_files]):
+            build_geometry_tiles(output_dir, geo_level)
+        for artifact in tiles_files:
+            manifest.record(artifact, geometry_hash)
+        geometry_asset = TILES_URL
+    elif os.path.exists(geometry_source):
+        geometry_hash = fingerprint(file_fingerprint(geometry_source), TOLERANCES, QUANTIZATION,
+                                    geometry_format, config['properties'])
+        geometry_files = [f'assets/{asset_name}_{level}.{geometry_format}' for level in TOLERANCES]
+        geometry_files += [geometry_asset_name(level, geometry_format, asset_name) for level in TOLERANCES]
+        if force or any([manifest.is_stale(asset, geometry_hash) for asset in geometry_files]):
+            build_geometry_assets(output_dir, geometry_source, fmt=geometry_format,
+                                  name=asset_name, properties=config['properties'])
+        for asset in geometry_files:
+            manifest.record(asset, geometry_hash)
+        geometry_asset = geometry_asset_name(GEOMETRY_LEVEL, geometry_format, asset_name)
+    else:
+        print(f"Geometry source not found, maps drawn without borders: {geometry_source}")
+        geometry_hash, geometry_asset = None, None
     print(f"Processing maps for years: {years}")
-    for year in years:
-        print(f"Creating map for year {year}")
-        create_year_map(df, year, output_dir)
+    year_tasks, map_hashes = [], {}
+    for year, year_df in df.groupby('Year', sort=True):
+        map_file = f'map_{year}.html'
+        map_hash = fingerprint(year_df, TEMPLATE_VERSION, geometry_hash, GEOMETRY_LEVEL, popup_mode,
+                               render_mode, cluster)
+        data_file = f'data/year_{year}.js'
+        if force or manifest.is_stale(map_file, map_hash) or (
+                popup_mode == 'lazy' and manifest.is_stale(data_file, map_hash)):
+            year_tasks.append((int(year), output_dir, data_type, popup_mode, geo_level, render_mode, cluster,
+                               geometry_format))
+            map_hashes[map_file] = map_hash
+        elif popup_mode == 'lazy':
+            manifest.record(data_file, map_hash)
+    for map_file in run_render_tasks(_render_year_task, year_tasks, workers):
+        manifest.record(map_file, map_hashes[map_file])
+        if popup_mode == 'lazy':
+            year = map_file[len('map_'):-len('.html')]
+            manifest.record(f'data/year_{year}.js', map_hashes[map_file])
+    
+    main_hash = fingerprint([int(year) for year in years], file_fingerprint('templates/main_page_template.html'))
+    if force or manifest.is_stale('index.html', main_hash):
+        create_main_page(years, output_dir)
+        manifest.record('index.html', main_hash)
     
-    create_main_page(years, output_dir)
+    # The single-page timeline reads the year data files of the lazy maps
+    if popup_mode == 'lazy':
+        # Choropleth arrays, only usable with a GeoJSON/TopoJSON base layer
+        choropleth = geometry_asset is not None and geometry_asset != TILES_URL
+        if choropleth:
+            index_source = file_fingerprint(CHOROPLETH_INDEX_FILE) \
+                if config['nuts'] is None and os.path.exists(CHOROPLETH_INDEX_FILE) else None
+            choropleth_hash = fingerprint(df, TEMPLATE_VERSION, index_source, config['feature_property'],
+                                          CHOROPLETH_COLORS)
+            choropleth_files = [CHOROPLETH_HEADER] + [f'data/choropleth_{int(year)}.js' for year in years]
+            if force or any([manifest.is_stale(artifact, choropleth_hash) for artifact in choropleth_files]):
+                choropleth_files = create_choropleth_data(df, _SHARED_CUBE, output_dir, geo_level)
+            for artifact in choropleth_files:
+                manifest.record(artifact, choropleth_hash)
+        timeline_hash = fingerprint([int(year) for year in years], TEMPLATE_VERSION, geometry_asset, render_mode,
+                                    choropleth, file_fingerprint('templates/timeline_template.html'))
+        if force or manifest.is_stale('timeline.html', timeline_hash):
+            create_timeline_page(years, output_dir, geometry_asset, geo_level, render_mode, choropleth)
+            manifest.record('timeline.html', timeline_hash)
+    
+    for artifact in manifest.remove_orphans():
+        print(f"Removed orphaned page: {artifact}")
+    manifest.save()
     print(f"Maps created in directory: {output_dir}")
 
 if __name__ == "__main__":
-    csv_file = "merged_crimes_per_hundred_thousand_french.csv"
-    
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Crime maps of Europe")
+    parser.add_argument('geo_level', nargs='?', choices=list(GEO_LEVELS), default='country')
+    parser.add_argument('--lazy', action='store_true',
+                        help="popups rendered in the browser from data/year_{year}.js, with timeline.html")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="processes rendering the year maps (0: one per CPU)")
+    parser.add_argument('--geometry-format', choices=['geojson', 'topojson', 'mvt'], default=GEOMETRY_FORMAT,
+                        help="base layer of the maps, mvt: vector tiles served over http")
+    args = parser.parse_args()
+
+    # Regional maps have thousands of markers, draw them on a canvas
+    render_mode = 'svg' if args.geo_level == 'country' else 'canvas'
     try:
-        create_temporal_crime_map(csv_file)
+        create_temporal_crime_map(DATA_TYPE_RATE, workers=args.workers or os.cpu_count() or 1,
+                                  popup_mode='lazy' if args.lazy else 'inline',
+                                  geo_level=args.geo_level, render_mode=render_mode,
+                                  geometry_format=args.geometry_format)
         print("Maps created successfully")
     except Exception as e:
         print(f"Error: {str(e)}")
\ No newline at end of file
@@ -1,9 +1,10 @@
 import pandas as pd
 import plotly.express as px
 import plotly.io as pio
+from crime_dataset import load_crimes, DATA_TYPE_RATE
 
 # Load the data
-data = pd.read_csv("merged_crimes_per_hundred_thousand_french.csv")
+data = load_crimes(data_types=[DATA_TYPE_RATE])
 
 # Calculate mean for each crime type per country
 numeric_cols = data.select_dtypes(include='number').columns
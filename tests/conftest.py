@@ -0,0 +1,10 @@
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(TESTS_DIR)
+
+# The scripts import each other by module name, as when run from the repository
+for path in [BASE_DIR, os.path.join(BASE_DIR, 'country_indice_per_date'), os.path.join(BASE_DIR, 'benchmarks')]:
+    if path not in sys.path:
+        sys.path.insert(0, path)
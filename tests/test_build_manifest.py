@@ -0,0 +1,52 @@
+import pandas as pd
+
+from build_manifest import BuildManifest, fingerprint
+
+
+def test_fingerprint_follows_the_content():
+    df = pd.DataFrame({'Country': ['France', 'Croatie'], 'Value': [1.0, 2.0]})
+    assert fingerprint(df, 'a', 3) == fingerprint(df.copy(), 'a', 3)
+    assert fingerprint(df, 'a', 3) != fingerprint(df.assign(Value=[1.0, 2.5]), 'a', 3)
+    assert fingerprint(df, 'a', 3) != fingerprint(df.rename(columns={'Value': 'Valeur'}), 'a', 3)
+    assert fingerprint('ab', 'c') != fingerprint('a', 'bc')
+    # The index is not part of the content
+    assert fingerprint(df) == fingerprint(df.set_axis([5, 6]))
+
+
+def test_artifacts_are_rebuilt_when_missing_or_changed(tmp_path):
+    manifest = BuildManifest(str(tmp_path))
+    assert manifest.is_stale('index.html', 'v1')
+    (tmp_path / 'index.html').write_text('<html></html>')
+    manifest.record('index.html', 'v1')
+    manifest.save()
+
+    manifest = BuildManifest(str(tmp_path))
+    assert not manifest.is_stale('index.html', 'v1')
+    assert manifest.is_stale('index.html', 'v2')
+    (tmp_path / 'index.html').unlink()
+    assert manifest.is_stale('index.html', 'v1')
+
+
+def test_orphaned_files_and_directories_are_removed(tmp_path):
+    manifest = BuildManifest(str(tmp_path))
+    for artifact in ['map_2020.html', 'tiles.mbtiles']:
+        (tmp_path / artifact).write_text('')
+        manifest.record(artifact, 'v1')
+    (tmp_path / 'tiles' / '0' / '0').mkdir(parents=True)
+    (tmp_path / 'tiles' / '0' / '0' / '0.pbf').write_bytes(b'')
+    manifest.record('tiles', 'v1')
+    manifest.save()
+
+    # Next build: GeoJSON base layer instead of the vector tiles
+    manifest = BuildManifest(str(tmp_path))
+    assert not manifest.is_stale('map_2020.html', 'v1')
+    assert manifest.remove_orphans() == ['tiles', 'tiles.mbtiles']
+    manifest.save()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['build_manifest.json', 'map_2020.html']
+    assert list(BuildManifest(str(tmp_path)).artifacts) == ['map_2020.html']
+
+
+def test_unreadable_manifest_rebuilds_everything(tmp_path):
+    (tmp_path / 'index.html').write_text('')
+    (tmp_path / 'build_manifest.json').write_text('{not json')
+    assert BuildManifest(str(tmp_path)).is_stale('index.html', 'v1')
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from crime_cube import CrimeCube
+
+CATEGORIES = {
+    'Violences': {'crimes': ['Viol', 'Homicide intentionnel']},
+    'Vols': {'crimes': ['Vol']},
+    'Toutes': None,
+}
+
+
+def crime_table():
+    return pd.DataFrame({
+        'NAME': ['France', 'France', 'France', 'Croatie', 'Croatie', None, 'Croatie'],
+        'Year': [2020, 2020, 2020, 2020, 2021, 2020, 2021],
+        'Crime Type': ['Vol', 'Vol', 'Viol', 'Vol', 'Viol', 'Vol', 'Viol'],
+        'Value': [10.0, 5.0, 2.0, np.nan, 3.0, 100.0, np.nan],
+        'lat': [46.6, 46.6, 46.6, 45.8, 45.8, 0.0, 45.8],
+        'lon': [2.4, 2.4, 2.4, 16.0, 16.0, 0.0, 16.0],
+    })
+
+
+def test_duplicated_rows_are_summed():
+    cube = CrimeCube.from_frame(crime_table(), CATEGORIES)
+    # Rows without a name are left out
+    assert cube.countries == ['Croatie', 'France']
+    france, croatia = cube.country_index['France'], cube.country_index['Croatie']
+    vol, viol = cube.crime_types.index('Vol'), cube.crime_types.index('Viol')
+    assert cube.values[france, cube.year_index[2020], vol] == 15.0
+    assert cube.values[croatia, cube.year_index[2021], viol] == 3.0
+    assert cube.totals[france, cube.year_index[2020]] == 17.0
+    assert cube.category_totals[france, cube.year_index[2020], cube.category_index['Violences']] == 2.0
+
+
+def test_cells_without_value_stay_missing():
+    cube = CrimeCube.from_frame(crime_table(), CATEGORIES)
+    croatia, vol = cube.country_index['Croatie'], cube.crime_types.index('Vol')
+    assert np.isnan(cube.values[croatia, cube.year_index[2020], vol])
+    assert cube.present[croatia, cube.year_index[2020], vol]
+    assert not cube.present[croatia, cube.year_index[2021], vol]
+    assert cube.totals[croatia, cube.year_index[2020]] == 0.0
+
+
+def test_saved_cube_loads_the_same(tmp_path):
+    cube = CrimeCube.from_frame(crime_table(), CATEGORIES)
+    cube.save(str(tmp_path))
+    loaded = CrimeCube.load(str(tmp_path))
+    assert loaded.countries == cube.countries and loaded.crime_types == cube.crime_types
+    np.testing.assert_array_equal(loaded.values, cube.values)
+    np.testing.assert_array_equal(loaded.present, cube.present)
@@ -0,0 +1,144 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import calcule_INDICE
+import crime_index
+import indice_criminaliter
+from crime_dataset import clean_crimes
+from crime_index import WEIGHTS_FILE, compute_indices, load_weights
+from index_cache import IndexCache
+from synthetic_data import generate_dataset
+
+
+# --- Row-wise implementations of the scripts before crime_index.py ---------
+
+def reference_indice_criminaliter(merged_df, weights_df, population_df):
+    """calculate_crime_index of indice_criminaliter.py before the engine"""
+    merged_df = merged_df.copy()
+    merged_df['value'] = pd.to_numeric(merged_df['value'].replace(':', np.nan), errors='coerce')
+    merged_df = merged_df.merge(population_df[['country', 'year', 'population']], on=['country', 'year'],
+                                how='inner')
+    country_totals = merged_df.groupby(['country', 'year', 'crime_type']).agg({
+        'value': 'sum', 'population': 'first', 'lat': 'first', 'lon': 'first'
+    }).reset_index()
+    country_totals['Crime_Rate'] = (country_totals['value'] / country_totals['population']) * 100000
+    weights_dict = dict(zip(weights_df['Crime'], weights_df['Poids (1-10)']))
+    country_totals['Weighted_Value'] = country_totals.apply(
+        lambda row: row['Crime_Rate'] * weights_dict.get(row['crime_type'], 0)
+        if pd.notnull(row['Crime_Rate']) else 0,
+        axis=1
+    )
+    crime_index = country_totals.groupby(['country', 'year']).agg({
+        'Weighted_Value': 'sum', 'lat': 'first', 'lon': 'first'
+    }).reset_index()
+    crime_index.columns = ['Country', 'Year', 'Crime_Index', 'Latitude', 'Longitude']
+    crime_index['Normalized_Index'] = (crime_index['Crime_Index'] / crime_index['Crime_Index'].max()) * 100
+    crime_index = crime_index[['Country', 'Year', 'Normalized_Index', 'Latitude', 'Longitude']]
+    crime_index['Year'] = crime_index['Year'].apply(lambda year: datetime(int(year), 1, 1).isoformat())
+    return crime_index.sort_values(['Country', 'Year'], ascending=[True, False])
+
+
+def reference_calcule_indice(df, population_df):
+    """calculate_crime_index of calcule_INDICE.py before the engine"""
+    df_processed = df.copy()
+    df_processed['value'] = pd.to_numeric(df_processed['value'], errors='coerce')
+    df_processed['crime_type'] = df_processed['crime_type'].str.lower().str.strip()
+    df_processed['weight'] = df_processed['crime_type'].map(calcule_INDICE.get_crime_weights())
+    df_processed['weighted_infractions'] = df_processed['value'] * df_processed['weight']
+    df_processed = df_processed.merge(population_df[['country', 'year', 'population']], on=['country', 'year'],
+                                      how='inner')
+    df_processed = df_processed.dropna(subset=['weighted_infractions', 'population'])
+    result = (df_processed.groupby(['country', 'year'])
+              .agg({'weighted_infractions': 'sum', 'population': 'first'})
+              .reset_index())
+    result['crime_index'] = result['weighted_infractions'] / result['population']
+    return result[['country', 'year', 'crime_index', 'weighted_infractions']]
+
+
+# --- Inputs ------------------------------------------------------------------
+
+@pytest.fixture(scope='module')
+def inputs():
+    """
+    Small synthetic number table with the irregularities of the real one:
+    missing values, duplicated rows, a crime type written in capitals and a
+    country without population.
+    """
+    dataset = generate_dataset(n_regions=6, years=range(2015, 2019), seed=3)
+    numbers = clean_crimes(dataset['numbers'])
+    duplicates = numbers.iloc[::7].copy()
+    capitals = numbers[numbers['Crime Type'] == 'Vol'].iloc[:5].copy()
+    capitals['Crime Type'] = 'VOL'
+    orphan = numbers.iloc[:3].copy()
+    orphan['Country'] = 'Atlantide'
+    numbers = pd.concat([numbers, duplicates, capitals, orphan], ignore_index=True)
+    numbers.columns = numbers.columns.str.strip().str.lower().str.replace(' ', '_')
+    population = dataset['population'].copy()
+    population.columns = population.columns.str.strip().str.lower()
+    return numbers, population, dataset['weights']
+
+
+@pytest.mark.parametrize('weights_source', ['synthetic', 'poids_crimes.csv'])
+def test_indice_criminaliter_matches_reference(inputs, weights_source):
+    numbers, population, weights = inputs
+    if weights_source == 'poids_crimes.csv':
+        weights = pd.read_csv(WEIGHTS_FILE, encoding='utf-8')
+    expected = reference_indice_criminaliter(numbers, weights, population).reset_index(drop=True)
+    result = indice_criminaliter.calculate_crime_index(numbers.copy(), weights, population,
+                                                       use_cache=False).reset_index(drop=True)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, rtol=1e-12)
+
+
+def test_calcule_indice_matches_reference(inputs):
+    numbers, population, _ = inputs
+    expected = reference_calcule_indice(numbers, population)
+    result = calcule_INDICE.calculate_crime_index(numbers.copy(), population, use_cache=False)
+    expected = expected.sort_values(['country', 'year']).reset_index(drop=True)
+    result = result.sort_values(['country', 'year']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, rtol=1e-12)
+
+
+def test_weights_are_matched_exactly(inputs):
+    numbers, population, weights = inputs
+    crimes = numbers.rename(columns=indice_criminaliter.ENGINE_COLUMNS)
+    population = population.rename(columns=indice_criminaliter.ENGINE_COLUMNS)
+    base = compute_indices(crimes, population, weights, formulas=['per_capita'], normalizations=[])
+    # 'VOL' is not the 'Vol' of the weights: adding a weight for it changes the index
+    extra = load_weights(weights)
+    extra['VOL'] = 100.0
+    changed = compute_indices(crimes, population, extra, formulas=['per_capita'], normalizations=[])
+    assert (changed['per_capita'] >= base['per_capita']).all()
+    assert (changed['per_capita'] > base['per_capita']).any()
+
+
+def test_cached_results_are_reused_and_invalidated(inputs, tmp_path, monkeypatch):
+    numbers, population, weights = inputs
+    crimes = numbers.rename(columns=indice_criminaliter.ENGINE_COLUMNS)
+    population = population.rename(columns=indice_criminaliter.ENGINE_COLUMNS)
+    cache = IndexCache(str(tmp_path))
+    computed = []
+    from_frame = crime_index.CrimeMatrix.from_frame
+
+    def counting_from_frame(*args, **kwargs):
+        computed.append(1)
+        return from_frame(*args, **kwargs)
+
+    monkeypatch.setattr(crime_index.CrimeMatrix, 'from_frame', counting_from_frame)
+    first = compute_indices(crimes, population, weights, cache=cache)
+    second = compute_indices(crimes, population, weights, cache=cache)
+    assert len(computed) == 1
+    pd.testing.assert_frame_equal(second, first)
+
+    # Other weights, other data or another formula version are not served from the cache
+    changed_weights = weights.assign(**{'Poids (1-10)': weights['Poids (1-10)'] + 1})
+    compute_indices(crimes, population, changed_weights, cache=cache)
+    assert len(computed) == 2
+    changed_crimes = crimes.assign(Value=crimes['Value'] * 2)
+    compute_indices(changed_crimes, population, weights, cache=cache)
+    assert len(computed) == 3
+    monkeypatch.setattr(crime_index, 'FORMULA_VERSION', crime_index.FORMULA_VERSION + 1)
+    compute_indices(crimes, population, weights, cache=cache)
+    assert len(computed) == 4
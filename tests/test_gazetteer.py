@@ -0,0 +1,111 @@
+import re
+import unicodedata
+
+import pandas as pd
+import pytest
+
+from gazetteer import EUROPE_FILE, resolve, resolve_code, unresolved
+
+
+# --- Per-row lookups of the scripts before gazetteer.py ----------------------
+
+def normalize_string(s):
+    return ''.join(c for c in unicodedata.normalize('NFD', s)
+                   if unicodedata.category(c) != 'Mn').lower()
+
+
+def extract_coordinates(coord_string):
+    lat_match = re.search(r'lat:\s*([-\d.]+)', coord_string)
+    lon_match = re.search(r'lon:\s*([-\d.]+)', coord_string)
+    lat = float(lat_match.group(1)) if lat_match else None
+    lon = float(lon_match.group(1)) if lon_match else None
+    return pd.Series({'lat': lat, 'lon': lon})
+
+
+@pytest.fixture(scope='module')
+def get_country_data():
+    """get_country_data of annexe/merge-csv-files.py"""
+    europe_df = pd.read_csv(EUROPE_FILE)
+    europe_df[['lat', 'lon']] = europe_df['Coordinate'].apply(extract_coordinates)
+    country_data = {normalize_string(row['NAME']): row.to_dict() for _, row in europe_df.iterrows()}
+    country_data['england and wales'] = {
+        'FIPS': 'UKEW', 'ISO2': 'XE', 'ISO3': 'XEW', 'UN': '826', 'NAME': 'England and Wales',
+        'lat': 52.3555, 'lon': -1.1743
+    }
+    name_variations = {
+        'czechia': 'czech republic',
+        'Turkey': 'Türkiye',
+        'The former Yugoslav Republic of Macedonia': 'North Macedonia',
+    }
+
+    def lookup(country):
+        normalized_country = normalize_string(country)
+        if normalized_country in name_variations:
+            normalized_country = name_variations[normalized_country]
+        return country_data.get(normalized_country, {})
+    return lookup
+
+
+# ISO3 codes of historical-population-scraper.py, by French name
+SCRAPER_CODES = {
+    "Albanie": "ALB", "Autriche": "AUT", "Belgique": "BEL", "Bosnie-Herzégovine": "BIH", "Bulgarie": "BGR",
+    "Croatie": "HRV", "Chypre": "CYP", "Tchéquie": "CZE", "Danemark": "DNK", "Estonie": "EST",
+    "Finlande": "FIN", "France": "FRA", "Allemagne": "DEU", "Grèce": "GRC", "Hongrie": "HUN",
+    "Islande": "ISL", "Irlande": "IRL", "Italie": "ITA", "Kosovo": "XKX", "Lettonie": "LVA",
+    "Liechtenstein": "LIE", "Lituanie": "LTU", "Luxembourg": "LUX", "Malte": "MLT", "Monténégro": "MNE",
+    "Pays-Bas": "NLD", "Macédoine du Nord": "MKD", "Norvège": "NOR", "Pologne": "POL", "Portugal": "PRT",
+    "Roumanie": "ROU", "Serbie": "SRB", "Slovaquie": "SVK", "Slovénie": "SVN", "Espagne": "ESP",
+    "Suède": "SWE", "Suisse": "CHE", "Turquie": "TUR"
+}
+
+# Codes that add-country-codes.py filled in for the names missing from europe.csv
+ADDED_CODES = {
+    "Tchéquie": {"FIPS": "EZ", "ISO2": "CZ", "ISO3": "CZE"},
+    "Kosovo": {"FIPS": "KV", "ISO2": "XK", "ISO3": "XKX"},
+    "Irlande du Nord": {"FIPS": "UK", "ISO2": "GB-NIR", "ISO3": "GBR"},
+    "Écosse": {"FIPS": "UK", "ISO2": "GB-SCT", "ISO3": "GBR"},
+    "Turquie": {"FIPS": "TU", "ISO2": "TR", "ISO3": "TUR"}
+}
+
+
+def test_resolve_matches_the_merge_lookup(get_country_data):
+    names = pd.read_csv(EUROPE_FILE)['NAME'].tolist()
+    # Other spellings, as written in the Eurostat tables
+    names += [name.upper() for name in names[:5]] + ['England and Wales', 'Czechia']
+    resolved = resolve(names)
+    for name, (_, row) in zip(names, resolved.iterrows()):
+        expected = get_country_data(name)
+        assert expected, name
+        for column in ['FIPS', 'ISO2', 'ISO3', 'NAME']:
+            assert row[column] == expected[column], (name, column)
+        assert int(row['UN']) == int(expected['UN']), name
+        assert row['lat'] == pytest.approx(expected['lat']) and row['lon'] == pytest.approx(expected['lon']), name
+
+
+def test_resolve_matches_the_scraper_codes():
+    resolved = resolve(list(SCRAPER_CODES), ['ISO3'])['ISO3']
+    assert resolved.tolist() == list(SCRAPER_CODES.values())
+
+
+def test_resolve_matches_the_added_codes():
+    resolved = resolve(list(ADDED_CODES), ['FIPS', 'ISO2', 'ISO3'])
+    assert resolved.to_dict('records') == list(ADDED_CODES.values())
+
+
+def test_resolve_aliases():
+    aliases = ['Türkiye', 'Turkey', 'Turquie', 'TUR', 'TR', 'Kosovo*', 'Kosovo (under UNSCR 1244)', 'UK', 'EL',
+               'The former Yugoslav Republic of Macedonia', 'Écosse (NUTS 2021)', 'Scotland']
+    assert resolve(aliases, ['ISO2'])['ISO2'].tolist() == ['TR', 'TR', 'TR', 'TR', 'TR', 'XK', 'XK', 'GB', 'GR',
+                                                           'MK', 'GB-SCT', 'GB-SCT']
+    # GBR is shared by the United Kingdom and its parts, it identifies none of them
+    assert resolve_code('GBR', 'ISO2') is None
+
+
+def test_resolve_keeps_the_index_and_missing_names():
+    names = pd.Series(['France', None, 'Atlantide', 'France'], index=[10, 20, 30, 40])
+    resolved = resolve(names, ['ISO3', 'UN'])
+    assert resolved.index.tolist() == [10, 20, 30, 40]
+    assert resolved['ISO3'].tolist()[::3] == ['FRA', 'FRA']
+    assert resolved['ISO3'].iloc[1:3].isna().all()
+    assert str(resolved['UN'].dtype) == 'Int64'
+    assert unresolved(names) == ['Atlantide']
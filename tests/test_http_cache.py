@@ -0,0 +1,94 @@
+import os
+import time
+
+import pytest
+import requests
+
+from http_cache import HttpCache, OfflineError
+
+
+class FakeSession:
+    """requests.Session stand-in answering from a list of (status, body, headers)"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        self.calls.append({'url': url, 'params': params, 'headers': headers or {}})
+        status, body, response_headers = self.responses.pop(0)
+        response = requests.Response()
+        response.status_code = status
+        response._content = body
+        response.url = url
+        response.headers = requests.structures.CaseInsensitiveDict(response_headers)
+        return response
+
+    def close(self):
+        pass
+
+
+URL = 'https://api.worldbank.org/v2/country/FRA/indicator/SP.POP.TOTL'
+
+
+def test_fresh_entries_are_served_without_request(tmp_path):
+    session = FakeSession([(200, b'[1, 2]', {'ETag': '"a"'})])
+    cache = HttpCache(str(tmp_path), session=session)
+    first = cache.get(URL, params={'format': 'json', 'date': '2020'})
+    # The parameter order is not part of the key
+    second = cache.get(URL, params={'date': '2020', 'format': 'json'})
+    assert not first.from_cache and second.from_cache
+    assert second.content == b'[1, 2]' and second.headers['ETag'] == '"a"'
+    assert len(session.calls) == 1
+
+
+def test_stale_entries_are_revalidated(tmp_path):
+    session = FakeSession([(200, b'[1]', {'ETag': '"a"'}), (304, b'', {}), (200, b'[2]', {'ETag': '"b"'})])
+    cache = HttpCache(str(tmp_path), ttl=0, session=session)
+    cache.get(URL)
+    revalidated = cache.get(URL)
+    assert revalidated.from_cache and revalidated.content == b'[1]'
+    assert session.calls[1]['headers']['If-None-Match'] == '"a"'
+    changed = cache.get(URL)
+    assert not changed.from_cache and changed.content == b'[2]'
+
+
+def test_rejected_responses_are_not_cached(tmp_path):
+    # The World Bank answers some errors with a 200 and an error message
+    error = b'[{"message": [{"id": "120", "value": "Invalid value"}]}]'
+    session = FakeSession([(200, error, {}), (200, b'[{"page": 1}, []]', {})])
+    cache = HttpCache(str(tmp_path), session=session)
+    valid = lambda response: 'message' not in response.text
+    assert not cache.get(URL, validate=valid).from_cache
+    assert not cache.get(URL, validate=valid).from_cache
+    assert cache.get(URL, validate=valid).from_cache
+    assert len(session.calls) == 2
+
+
+def test_cached_entries_rejected_later_are_requested_again(tmp_path):
+    session = FakeSession([(200, b'error', {}), (200, b'[1]', {})])
+    cache = HttpCache(str(tmp_path), session=session)
+    cache.get(URL)
+    response = cache.get(URL, validate=lambda response: response.content != b'error')
+    assert not response.from_cache and response.content == b'[1]'
+    assert len(session.calls) == 2
+
+
+def test_errors_are_not_cached_and_offline_mode(tmp_path):
+    session = FakeSession([(500, b'', {})])
+    cache = HttpCache(str(tmp_path), session=session)
+    assert cache.get(URL).status_code == 500
+    with pytest.raises(OfflineError):
+        HttpCache(str(tmp_path), offline=True, session=FakeSession([])).get(URL)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    session = FakeSession([(200, b'x' * 10, {}), (200, b'y' * 10, {})])
+    cache = HttpCache(str(tmp_path), max_bytes=15, session=session)
+    cache.get(URL, params={'date': '2019'})
+    # Last used an hour ago
+    body_path = cache._paths(cache.key(URL, {'date': '2019'}))[0]
+    os.utime(body_path, (time.time() - 3600, time.time() - 3600))
+    cache.get(URL, params={'date': '2020'})
+    assert cache.size() == 10
+    assert HttpCache(str(tmp_path), offline=True).get(URL, params={'date': '2020'}).content == b'y' * 10
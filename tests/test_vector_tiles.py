@@ -0,0 +1,164 @@
+import gzip
+import sqlite3
+import struct
+import contextlib
+
+from vector_tiles import EXTENT, _field_types, encode_tile, export_tile_directory
+
+
+# --- Minimal protobuf reader of the Mapbox Vector Tile messages ------------
+
+def read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, offset
+
+
+def read_fields(data):
+    """(field number, value) pairs of a message, bytes for length-delimited fields"""
+    fields, offset = [], 0
+    while offset < len(data):
+        key, offset = read_varint(data, offset)
+        number, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, offset = read_varint(data, offset)
+        elif wire_type == 1:
+            value, offset = data[offset:offset + 8], offset + 8
+        elif wire_type == 2:
+            length, offset = read_varint(data, offset)
+            value, offset = data[offset:offset + length], offset + length
+        else:
+            raise ValueError(f"Unexpected wire type {wire_type}")
+        fields.append((number, value))
+    return fields
+
+
+def read_packed(data):
+    values, offset = [], 0
+    while offset < len(data):
+        value, offset = read_varint(data, offset)
+        values.append(value)
+    return values
+
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def decode_value(data):
+    number, value = read_fields(data)[0]
+    if number == 1:
+        return value.decode('utf-8')
+    if number == 3:
+        return struct.unpack('<d', value)[0]
+    if number == 6:
+        return unzigzag(value)
+    if number == 7:
+        return bool(value)
+    raise ValueError(f"Unexpected value field {number}")
+
+
+def decode_geometry(geometry_type, commands):
+    """Points, or rings without their closing point, in tile coordinates"""
+    parts, ring = [], []
+    x = y = i = 0
+    while i < len(commands):
+        command_id, count = commands[i] & 0x7, commands[i] >> 3
+        i += 1
+        if command_id == 7:
+            parts.append(ring)
+            ring = []
+            continue
+        for _ in range(count):
+            x += unzigzag(commands[i])
+            y += unzigzag(commands[i + 1])
+            i += 2
+            if geometry_type == 1:
+                parts.append((x, y))
+            else:
+                ring.append((x, y))
+    return parts
+
+
+def decode_tile(data):
+    """{layer name: (extent, [(id, geometry type, parts, properties)])}"""
+    layers = {}
+    for number, layer in read_fields(data):
+        assert number == 3
+        fields = read_fields(layer)
+        name = next(value.decode('utf-8') for number, value in fields if number == 1)
+        keys = [value.decode('utf-8') for number, value in fields if number == 3]
+        values = [decode_value(value) for number, value in fields if number == 4]
+        extent = next(value for number, value in fields if number == 5)
+        features = []
+        for feature in (value for number, value in fields if number == 2):
+            feature_fields = dict(read_fields(feature))
+            tags = read_packed(feature_fields.get(2, b''))
+            properties = {keys[tags[i]]: values[tags[i + 1]] for i in range(0, len(tags), 2)}
+            geometry_type = feature_fields[3]
+            features.append((feature_fields[1], geometry_type,
+                             decode_geometry(geometry_type, read_packed(feature_fields[4])), properties))
+        layers[name] = (extent, features)
+    return layers
+
+
+LAYERS = {
+    'countries': [
+        (1, 3, [[(0, 0), (4096, 0), (4096, 4096), (0, 4096)], [(10, 10), (10, 20), (20, 20), (20, 10)]],
+         {'cntry_name': 'Croatia', 'crimes_2020': 1234, 'rate': 12.5, 'coastal': True, 'missing': None}),
+        (2, 3, [[(-64, -64), (100, -64), (100, 100)]],
+         {'cntry_name': 'Île-de-France', 'crimes_2020': -3, 'rate': float('nan'), 'coastal': False}),
+    ],
+    'crime_points': [
+        (3, 1, [(2048, 1024)], {'name': 'Croatia', 'crimes_2020': 1234}),
+    ],
+}
+
+
+def test_encoded_tile_round_trips():
+    decoded = decode_tile(encode_tile(LAYERS))
+    assert list(decoded) == list(LAYERS)
+    for name, features in LAYERS.items():
+        extent, decoded_features = decoded[name]
+        assert extent == EXTENT
+        assert len(decoded_features) == len(features)
+        for (feature_id, geometry_type, parts, properties), decoded_feature in zip(features, decoded_features):
+            # Null and NaN properties are left out of the tile
+            kept = {key: value for key, value in properties.items() if value is not None and value == value}
+            assert decoded_feature == (feature_id, geometry_type, parts, kept)
+
+
+def test_empty_layers_are_left_out():
+    assert list(decode_tile(encode_tile({'countries': LAYERS['countries'], 'crime_points': []}))) == ['countries']
+
+
+def test_field_types_follow_the_values():
+    fields = _field_types(properties for _, _, _, properties in LAYERS['countries'])
+    assert fields == {'cntry_name': 'String', 'crimes_2020': 'Number', 'rate': 'Number', 'coastal': 'Boolean',
+                      'missing': 'String'}
+    assert _field_types([{'code': 1}, {'code': 'FR'}]) == {'code': 'String'}
+
+
+def test_export_replaces_the_tile_directory(tmp_path):
+    archive = tmp_path / 'tiles.mbtiles'
+    tile = encode_tile(LAYERS)
+    with contextlib.closing(sqlite3.connect(archive)) as connection:
+        connection.execute('CREATE TABLE tiles (zoom_level integer, tile_column integer, tile_row integer, '
+                           'tile_data blob)')
+        # TMS row 0 of zoom 1 is the y = 1 row of the XYZ scheme
+        connection.execute('INSERT INTO tiles VALUES (1, 0, 0, ?)', (gzip.compress(tile),))
+        connection.commit()
+    stale = tmp_path / 'tiles' / '5' / '3'
+    stale.mkdir(parents=True)
+    (stale / '7.pbf').write_bytes(b'')
+
+    assert export_tile_directory(str(archive), str(tmp_path / 'tiles')) == 1
+    written = sorted(path.relative_to(tmp_path / 'tiles').as_posix()
+                     for path in (tmp_path / 'tiles').rglob('*.pbf'))
+    assert written == ['1/0/1.pbf']
+    assert (tmp_path / 'tiles' / '1' / '0' / '1.pbf').read_bytes() == tile
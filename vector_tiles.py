@@ -0,0 +1,669 @@
+import os
+import re
+import gzip
+import json
+import math
+import shutil
+import struct
+import sqlite3
+import contextlib
+import numpy as np
+import pandas as pd
+
+from geometry_assets import _Topology, _polygons, to_geojson, QUANTIZATION
+
+# Country shapes and the crime numbers placed by QGIS, used until now only
+# through the QGIS projects
+SHAPES_SOURCE = 'europa.gpkg'
+SHAPES_TABLE = 'country_shapes'
+CRIMES_SOURCE = 'EU_merge_crime_number.gpkg'
+CRIMES_TABLE = 'merged_crimes_number'
+# Shape properties matched against the Country column of the crime table
+SHAPE_NAME_PROPERTIES = ['cntry_name', 'join_name']
+# Names of the crime table that differ from the ones of the shapes
+CRIME_NAME_ALIASES = {
+    'Czechia': 'Czech Republic',
+    'North Macedonia': 'Macedonia',
+    'Türkiye': 'Turkey'
+}
+
+# Archive written in the site directory and URL of the tiles, served from
+# the archive (serve_tiles) or from the exported z/x/y directory
+TILES_FILE = 'tiles.mbtiles'
+TILES_DIR = 'tiles'
+TILES_URL = TILES_DIR + '/{z}/{x}/{y}.pbf'
+SHAPES_LAYER = 'countries'
+POINTS_LAYER = 'crime_points'
+
+MINZOOM = 0
+MAXZOOM = 7
+# Tile grid, clipping buffer (both in tile units) and simplification
+# tolerance in pixels of the zoom level
+EXTENT = 4096
+BUFFER = 64
+SIMPLIFY_PIXELS = 1.0
+
+# Half the width of the Web Mercator world, in meters
+MERCATOR_HALF = 20037508.342789244
+MAX_LATITUDE = 85.0511287798
+
+
+# --- Reading the sources ---------------------------------------------------
+
+def _read_wkb(data, offset=0):
+    """Decode one WKB geometry at offset, return (GeoJSON geometry, next offset)"""
+    order = '<' if data[offset] == 1 else '>'
+    geometry_type = struct.unpack_from(f'{order}I', data, offset + 1)[0]
+    offset += 5
+    # ISO (1001, 2001, 3001) and EWKB (high bits) Z/M variants
+    dims = 2
+    if geometry_type & 0x80000000:
+        dims += 1
+    if geometry_type & 0x40000000:
+        dims += 1
+    geometry_type &= 0x0FFFFFFF
+    if geometry_type > 1000:
+        dims = 2 + (geometry_type // 1000 in (1, 2)) + (geometry_type // 1000 == 3) * 2
+        geometry_type %= 1000
+
+    def points(count):
+        nonlocal offset
+        values = struct.unpack_from(f'{order}{count * dims}d', data, offset)
+        offset += 8 * count * dims
+        return [[values[i], values[i + 1]] for i in range(0, len(values), dims)]
+
+    def count():
+        nonlocal offset
+        n = struct.unpack_from(f'{order}I', data, offset)[0]
+        offset += 4
+        return n
+
+    if geometry_type == 1:
+        return {'type': 'Point', 'coordinates': points(1)[0]}, offset
+    if geometry_type == 2:
+        return {'type': 'LineString', 'coordinates': points(count())}, offset
+    if geometry_type == 3:
+        return {'type': 'Polygon', 'coordinates': [points(count()) for _ in range(count())]}, offset
+
+    parts = []
+    for _ in range(count()):
+        part, offset = _read_wkb(data, offset)
+        parts.append(part['coordinates'])
+    multi_type = {4: 'MultiPoint', 5: 'MultiLineString', 6: 'MultiPolygon'}.get(geometry_type)
+    if multi_type is None:
+        raise ValueError(f"Unsupported WKB geometry type: {geometry_type}")
+    return {'type': multi_type, 'coordinates': parts}, offset
+
+
+def gpkg_geometry(blob):
+    """Decode a GeoPackage geometry blob (GP header + WKB), None for empty geometries"""
+    if blob is None or blob[:2] != b'GP':
+        return None
+    flags = blob[3]
+    if flags & 0x10:
+        return None
+    envelope_size = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}[(flags >> 1) & 0x07]
+    return _read_wkb(blob, 8 + envelope_size)[0]
+
+
+def _geometry_column(connection, table):
+    """Geometry column and srs id of a GeoPackage table"""
+    return connection.execute(
+        'SELECT column_name, srs_id FROM gpkg_geometry_columns WHERE table_name = ?', (table,)
+    ).fetchone()
+
+
+def read_gpkg(path, table):
+    """
+    Features of a GeoPackage table.
+
+    Returns:
+        tuple: (list of GeoJSON-like features, srs id)
+    """
+    with contextlib.closing(sqlite3.connect(path)) as connection:
+        column, srs_id = _geometry_column(connection, table)
+        cursor = connection.execute(f'SELECT * FROM "{table}"')
+        names = [description[0] for description in cursor.description]
+        features = []
+        for row in cursor:
+            record = dict(zip(names, row))
+            geometry = gpkg_geometry(record.pop(column))
+            if geometry is not None:
+                features.append({'type': 'Feature', 'properties': record, 'geometry': geometry})
+    return features, srs_id
+
+
+def read_features(source, table=None):
+    """Features of a GeoPackage table or of a GeoJSON file (EPSG:4326)"""
+    if source.endswith('.gpkg'):
+        return read_gpkg(source, table)
+    with open(source, 'r', encoding='utf-8') as f:
+        return [feature for feature in json.load(f)['features'] if feature.get('geometry')], 4326
+
+
+def mercator(coordinates):
+    """Project an (n, 2) array of lon/lat degrees to Web Mercator meters"""
+    coordinates = np.asarray(coordinates, dtype=float)
+    lat = np.clip(coordinates[:, 1], -MAX_LATITUDE, MAX_LATITUDE)
+    x = coordinates[:, 0] * MERCATOR_HALF / 180
+    y = np.log(np.tan(np.pi / 4 + np.radians(lat) / 2)) * MERCATOR_HALF / np.pi
+    return np.column_stack([x, y])
+
+
+def crime_totals(path=CRIMES_SOURCE, table=CRIMES_TABLE):
+    """
+    Yearly number of recorded offences per country of the crime table.
+
+    Returns:
+        tuple: (DataFrame indexed by country with one crimes_<year> column
+                per year, Series country -> point geometry blob, srs id)
+    """
+    with contextlib.closing(sqlite3.connect(path)) as connection:
+        column, srs_id = _geometry_column(connection, table)
+        df = pd.read_sql_query(f'SELECT Country, Year, Value, "{column}" AS geom FROM "{table}"', connection)
+    df['Value'] = pd.to_numeric(df['Value'].replace(':', None), errors='coerce')
+    df['Country'] = df['Country'].replace(CRIME_NAME_ALIASES)
+    totals = df.pivot_table(index='Country', columns='Year', values='Value', aggfunc='sum')
+    # pivot_table drops the all-missing cells, a country without values has no total
+    totals.columns = [f'crimes_{int(year)}' for year in totals.columns]
+    totals = totals.reindex(sorted(df['Country'].unique()))
+    return totals, df.groupby('Country')['geom'].first(), srs_id
+
+
+# --- Mapbox Vector Tile encoding (protobuf written by hand) ----------------
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _field(number, wire_type, payload):
+    """Encode a protobuf field: varint value (0), 64-bit (1) or bytes (2)"""
+    key = _varint((number << 3) | wire_type)
+    if wire_type == 0:
+        return key + _varint(payload)
+    if wire_type == 1:
+        return key + payload
+    return key + _varint(len(payload)) + payload
+
+
+def _packed(number, values):
+    return _field(number, 2, b''.join(_varint(value) for value in values))
+
+
+def _encode_value(value):
+    """Layer value message of a property"""
+    if isinstance(value, (bool, np.bool_)):
+        return _field(7, 0, int(value))
+    if isinstance(value, (int, np.integer)):
+        return _field(6, 0, _zigzag(int(value)))
+    if isinstance(value, (float, np.floating)):
+        return _field(3, 1, struct.pack('<d', float(value)))
+    return _field(1, 2, str(value).encode('utf-8'))
+
+
+def _field_type(value):
+    """TileJSON type of a property value, as encoded by _encode_value"""
+    if isinstance(value, (bool, np.bool_)):
+        return 'Boolean'
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return 'Number'
+    return 'String'
+
+
+def _field_types(rows):
+    """TileJSON fields of property dicts, 'String' for keys of mixed (or only null) values"""
+    types = {}
+    for row in rows:
+        for key, value in row.items():
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                types.setdefault(key, None)
+                continue
+            field_type = _field_type(value)
+            types[key] = field_type if types.get(key) in (None, field_type) else 'String'
+    return {key: field_type or 'String' for key, field_type in types.items()}
+
+
+def _command(command_id, count):
+    return (command_id & 0x7) | (count << 3)
+
+
+def _geometry_commands(geometry_type, parts):
+    """
+    Command integers of a feature: parts are points (type 1) or rings
+    (type 3), in integer tile coordinates.
+    """
+    commands = []
+    cx = cy = 0
+    if geometry_type == 1:
+        commands.append(_command(1, len(parts)))
+        for x, y in parts:
+            commands += [_zigzag(x - cx), _zigzag(y - cy)]
+            cx, cy = x, y
+        return commands
+    for ring in parts:
+        x, y = ring[0]
+        commands += [_command(1, 1), _zigzag(x - cx), _zigzag(y - cy)]
+        cx, cy = x, y
+        commands.append(_command(2, len(ring) - 1))
+        for x, y in ring[1:]:
+            commands += [_zigzag(x - cx), _zigzag(y - cy)]
+            cx, cy = x, y
+        commands.append(_command(7, 1))
+    return commands
+
+
+def encode_layer(name, features, extent=EXTENT):
+    """
+    Encode a tile layer.
+
+    Args:
+        name: Layer name
+        features: List of (id, geometry type, parts, properties)
+        extent: Tile extent
+
+    Returns:
+        bytes: The Layer message
+    """
+    keys, values = {}, {}
+    encoded_features = []
+    for feature_id, geometry_type, parts, properties in features:
+        tags = []
+        for key, value in properties.items():
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            encoded = _encode_value(value)
+            tags += [keys.setdefault(key, len(keys)), values.setdefault(encoded, len(values))]
+        message = _field(1, 0, int(feature_id))
+        if tags:
+            message += _packed(2, tags)
+        message += _field(3, 0, geometry_type) + _packed(4, _geometry_commands(geometry_type, parts))
+        encoded_features.append(message)
+
+    layer = _field(15, 0, 2) + _field(1, 2, name.encode('utf-8'))
+    layer += b''.join(_field(2, 2, feature) for feature in encoded_features)
+    layer += b''.join(_field(3, 2, key.encode('utf-8')) for key in keys)
+    layer += b''.join(_field(4, 2, value) for value in values)
+    return layer + _field(5, 0, extent)
+
+
+def encode_tile(layers):
+    """Tile message from {layer name: features} (see encode_layer)"""
+    return b''.join(_field(3, 2, encode_layer(name, features)) for name, features in layers.items() if features)
+
+
+# --- Tiling ----------------------------------------------------------------
+
+def _clip_edge(points, axis, bound, keep_greater):
+    """One Sutherland-Hodgman step: clip an open ring against an axis-aligned line"""
+    if len(points) == 0:
+        return points
+    coordinate = points[:, axis]
+    inside = coordinate >= bound if keep_greater else coordinate <= bound
+    if inside.all():
+        return points
+    if not inside.any():
+        return points[:0]
+    previous = np.roll(points, 1, axis=0)
+    crossing = inside != np.roll(inside, 1)
+    denominator = coordinate - previous[:, axis]
+    t = np.divide(bound - previous[:, axis], denominator, out=np.zeros(len(points)), where=crossing)
+    intersections = previous + t[:, None] * (points - previous)
+    # Each edge previous -> point yields its intersection (if any) then the point (if inside)
+    counts = crossing.astype(int) + inside.astype(int)
+    positions = np.cumsum(counts) - counts
+    clipped = np.empty((counts.sum(), 2))
+    clipped[positions[crossing]] = intersections[crossing]
+    clipped[positions[inside] + crossing[inside]] = points[inside]
+    return clipped
+
+
+def _clip_ring(ring, low, high):
+    """Clip an open ring to the square [low, high]²"""
+    for axis in (0, 1):
+        ring = _clip_edge(ring, axis, low, True)
+        ring = _clip_edge(ring, axis, high, False)
+    return ring
+
+
+def _tile_ring(ring, exterior):
+    """
+    Integer tile ring without repeated points, wound as the MVT spec wants
+    (exteriors positive, holes negative in tile coordinates), None if it
+    collapsed.
+    """
+    ring = np.round(ring).astype(np.int64)
+    keep = np.any(ring != np.roll(ring, 1, axis=0), axis=1)
+    ring = ring[keep]
+    if len(ring) < 3:
+        return None
+    x, y = ring[:, 0], ring[:, 1]
+    area = int((x * np.roll(y, -1) - np.roll(x, -1) * y).sum())
+    if area == 0:
+        return None
+    if (area > 0) != exterior:
+        ring = ring[::-1]
+    return ring.tolist()
+
+
+def _tile_polygons(polygons, z, x, y, bounds):
+    """Rings of a projected feature inside tile z/x/y, None if nothing is left"""
+    size = 2 * MERCATOR_HALF / 2 ** z
+    min_x, max_y = -MERCATOR_HALF + x * size, MERCATOR_HALF - y * size
+    scale = EXTENT / size
+    # Ring bounding boxes in tile units, to skip the rings away from the tile
+    parts = []
+    for polygon, polygon_bounds in zip(polygons, bounds):
+        rings = []
+        for i, (ring, (left, bottom, right, top)) in enumerate(zip(polygon, polygon_bounds)):
+            if (right - min_x) * scale < -BUFFER or (left - min_x) * scale > EXTENT + BUFFER or \
+                    (max_y - bottom) * scale < -BUFFER or (max_y - top) * scale > EXTENT + BUFFER:
+                if i == 0:
+                    break
+                continue
+            local = np.column_stack([(ring[:, 0] - min_x) * scale, (max_y - ring[:, 1]) * scale])
+            local = _clip_ring(local, -BUFFER, EXTENT + BUFFER)
+            tile_ring = _tile_ring(local, exterior=(i == 0)) if len(local) else None
+            if tile_ring is None:
+                if i == 0:
+                    break
+                continue
+            rings.append(tile_ring)
+        parts.extend(rings)
+    return parts or None
+
+
+def _tile_range(left, bottom, right, top, z):
+    """Range of the tiles x and y of zoom z covering a bounding box in meters"""
+    size = 2 * MERCATOR_HALF / 2 ** z
+    last = 2 ** z - 1
+    x0 = min(last, max(0, int((left + MERCATOR_HALF) // size)))
+    x1 = min(last, max(0, int((right + MERCATOR_HALF) // size)))
+    y0 = min(last, max(0, int((MERCATOR_HALF - top) // size)))
+    y1 = min(last, max(0, int((MERCATOR_HALF - bottom) // size)))
+    return range(x0, x1 + 1), range(y0, y1 + 1)
+
+
+def _projected_polygons(geometry):
+    """Polygons of a lon/lat geometry as lists of open projected rings, with their bounds"""
+    projected, bounds = [], []
+    for polygon in _polygons(geometry):
+        rings = [mercator(ring[:-1] if ring[0] == ring[-1] else ring) for ring in polygon]
+        projected.append(rings)
+        bounds.append([(ring[:, 0].min(), ring[:, 1].min(), ring[:, 0].max(), ring[:, 1].max())
+                       for ring in rings])
+    return projected, bounds
+
+
+def shape_tiles(features, z, properties):
+    """
+    Polygon features of every tile of zoom z, simplified for that zoom.
+
+    Args:
+        features: Lon/lat polygon features
+        z: Zoom level
+        properties: Function feature -> tile properties
+
+    Returns:
+        dict: (x, y) -> list of (id, 3, rings, properties)
+    """
+    topology = _Topology(features, QUANTIZATION)
+    # One pixel of zoom z, in degrees of longitude
+    tolerance = SIMPLIFY_PIXELS * 360 / (2 ** z * EXTENT)
+    simplified = to_geojson(topology, features, topology.simplified_arcs(tolerance))['features']
+
+    tiles = {}
+    for feature_id, feature in enumerate(simplified, start=1):
+        polygons, bounds = _projected_polygons(feature['geometry'])
+        left = min(b[0][0] for b in bounds)
+        bottom = min(b[0][1] for b in bounds)
+        right = max(b[0][2] for b in bounds)
+        top = max(b[0][3] for b in bounds)
+        xs, ys = _tile_range(left, bottom, right, top, z)
+        tile_properties = properties(feature)
+        for x in xs:
+            for y in ys:
+                rings = _tile_polygons(polygons, z, x, y, bounds)
+                if rings is not None:
+                    tiles.setdefault((x, y), []).append((feature_id, 3, rings, tile_properties))
+    return tiles
+
+
+def point_tiles(points, z):
+    """
+    Point features of every tile of zoom z.
+
+    Args:
+        points: List of (id, x meters, y meters, properties)
+
+    Returns:
+        dict: (x, y) -> list of (id, 1, [[px, py]], properties)
+    """
+    size = 2 * MERCATOR_HALF / 2 ** z
+    tiles = {}
+    for feature_id, mx, my, properties in points:
+        x = int((mx + MERCATOR_HALF) // size)
+        y = int((MERCATOR_HALF - my) // size)
+        if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            continue
+        px = int(round((mx - (-MERCATOR_HALF + x * size)) / size * EXTENT))
+        py = int(round(((MERCATOR_HALF - y * size) - my) / size * EXTENT))
+        tiles.setdefault((x, y), []).append((feature_id, 1, [[px, py]], properties))
+    return tiles
+
+
+# --- MBTiles archive -------------------------------------------------------
+
+def _create_mbtiles(path, metadata):
+    """Create an empty MBTiles archive with its metadata"""
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE metadata (name TEXT, value TEXT);
+        CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB);
+        CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row);
+    """)
+    connection.executemany('INSERT INTO metadata VALUES (?, ?)', list(metadata.items()))
+    return connection
+
+
+def build_vector_tiles(output_path, source=SHAPES_SOURCE, table=SHAPES_TABLE,
+                       crimes_source=CRIMES_SOURCE, crimes_table=CRIMES_TABLE,
+                       minzoom=MINZOOM, maxzoom=MAXZOOM, keep_properties=None):
+    """
+    Render the shapes and the yearly crime numbers into an MBTiles archive.
+
+    Each zoom level is simplified with a tolerance of SIMPLIFY_PIXELS
+    pixels (borders shared by two countries stay identical, see
+    geometry_assets._Topology), then clipped to the tiles it covers.
+
+    Args:
+        output_path: MBTiles file to write
+        source: GeoPackage (table) or GeoJSON file of the polygons, in EPSG:4326
+        table: GeoPackage table of the polygons
+        crimes_source: GeoPackage of the crime numbers (None to skip the
+            crime attributes and points, e.g. for the NUTS regions)
+        crimes_table: Table of the crime numbers
+        minzoom, maxzoom: Zoom levels written
+        keep_properties: Shape properties copied in the tiles (None keeps all)
+
+    Returns:
+        int: Number of tiles written
+    """
+    features, srs_id = read_features(source, table)
+    if srs_id != 4326:
+        raise ValueError(f"Shapes must be in EPSG:4326, {source} is in {srs_id}")
+    features = [feature for feature in features if feature['geometry']['type'] in ('Polygon', 'MultiPolygon')]
+
+    totals, points = None, []
+    if crimes_source is not None and os.path.exists(crimes_source):
+        totals, point_blobs, points_srs = crime_totals(crimes_source, crimes_table)
+        for feature_id, (country, blob) in enumerate(point_blobs.items(), start=1):
+            geometry = gpkg_geometry(blob)
+            if geometry is None or geometry['type'] != 'Point':
+                continue
+            mx, my = geometry['coordinates']
+            if points_srs == 4326:
+                mx, my = mercator([geometry['coordinates']])[0]
+            point_properties = {'name': country}
+            point_properties.update(totals.loc[country].to_dict())
+            points.append((feature_id, mx, my, point_properties))
+
+    def properties(feature):
+        values = feature['properties']
+        kept = {key: value for key, value in values.items()
+                if keep_properties is None or key in keep_properties}
+        if totals is not None:
+            for name_property in SHAPE_NAME_PROPERTIES:
+                name = values.get(name_property)
+                if name in totals.index:
+                    kept.update(totals.loc[name].to_dict())
+                    break
+        return kept
+
+    # Bounds and layer description read by the clients
+    exteriors = np.array([point[:2] for feature in features
+                          for polygon in _polygons(feature['geometry']) for point in polygon[0]])
+    bounds = [exteriors[:, 0].min(), max(exteriors[:, 1].min(), -MAX_LATITUDE),
+              exteriors[:, 0].max(), min(exteriors[:, 1].max(), MAX_LATITUDE)]
+    shape_fields = _field_types(properties(feature) for feature in features)
+    vector_layers = [{'id': SHAPES_LAYER, 'fields': shape_fields, 'minzoom': minzoom, 'maxzoom': maxzoom}]
+    if points:
+        vector_layers.append({'id': POINTS_LAYER, 'fields': _field_types(point[3] for point in points),
+                              'minzoom': minzoom, 'maxzoom': maxzoom})
+    metadata = {
+        'name': os.path.splitext(os.path.basename(source))[0],
+        'format': 'pbf',
+        'type': 'overlay',
+        'minzoom': str(minzoom),
+        'maxzoom': str(maxzoom),
+        'bounds': ','.join(f'{value:.6f}' for value in bounds),
+        'center': f'{(bounds[0] + bounds[2]) / 2:.6f},{(bounds[1] + bounds[3]) / 2:.6f},{minzoom}',
+        'json': json.dumps({'vector_layers': vector_layers}, ensure_ascii=False)
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    connection = _create_mbtiles(output_path, metadata)
+    written = 0
+    try:
+        for z in range(minzoom, maxzoom + 1):
+            shapes = shape_tiles(features, z, properties)
+            crime_points = point_tiles(points, z)
+            rows = []
+            for x, y in sorted(set(shapes) | set(crime_points)):
+                tile = encode_tile({SHAPES_LAYER: shapes.get((x, y), []),
+                                    POINTS_LAYER: crime_points.get((x, y), [])})
+                # MBTiles rows are numbered from the south (TMS scheme)
+                rows.append((z, x, 2 ** z - 1 - y, gzip.compress(tile, mtime=0)))
+            connection.executemany('INSERT INTO tiles VALUES (?, ?, ?, ?)', rows)
+            written += len(rows)
+            print(f"Zoom {z}: {len(rows)} tiles")
+        connection.commit()
+    finally:
+        connection.close()
+    print(f"Vector tiles saved: {output_path} ({written} tiles)")
+    return written
+
+
+def export_tile_directory(mbtiles_path, output_dir):
+    """
+    Write the tiles of an archive as output_dir/{z}/{x}/{y}.pbf (not
+    compressed), so that any static web server can serve them. The previous
+    content of output_dir is deleted first, tiles no longer in the archive
+    are not served.
+
+    Returns:
+        int: Number of files written
+    """
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    count = 0
+    with contextlib.closing(sqlite3.connect(mbtiles_path)) as connection:
+        for z, x, row, data in connection.execute('SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles'):
+            y = 2 ** z - 1 - row
+            os.makedirs(os.path.join(output_dir, str(z), str(x)), exist_ok=True)
+            with open(os.path.join(output_dir, str(z), str(x), f'{y}.pbf'), 'wb') as f:
+                f.write(gzip.decompress(data))
+            count += 1
+    return count
+
+
+TILE_PATH = re.compile(r'^/tiles/(\d+)/(\d+)/(\d+)\.pbf$')
+
+
+def serve_tiles(site_dir='crime_maps', mbtiles_path=None, port=8000):
+    """
+    Serve a site directory on http://localhost:<port>/, the vector tiles
+    being read from the MBTiles archive (browsers do not load tiles from
+    file:// pages).
+    """
+    import functools
+    from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+    mbtiles_path = mbtiles_path or os.path.join(site_dir, TILES_FILE)
+
+    class TileHandler(SimpleHTTPRequestHandler):
+        def do_GET(self):
+            match = TILE_PATH.match(self.path.split('?')[0])
+            if match is None:
+                return super().do_GET()
+            z, x, y = (int(value) for value in match.groups())
+            with contextlib.closing(sqlite3.connect(mbtiles_path)) as connection:
+                row = connection.execute(
+                    'SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?',
+                    (z, x, 2 ** z - 1 - y)
+                ).fetchone()
+            if row is None:
+                self.send_response(204)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-protobuf')
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(row[0])))
+            self.end_headers()
+            self.wfile.write(row[0])
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), functools.partial(TileHandler, directory=site_dir))
+    print(f"Serving {site_dir} on http://127.0.0.1:{port}/ (tiles from {mbtiles_path})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Vector tiles of the GeoPackages")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="Build the MBTiles archive")
+    build.add_argument('--output', default=os.path.join('crime_maps', TILES_FILE))
+    build.add_argument('--minzoom', type=int, default=MINZOOM)
+    build.add_argument('--maxzoom', type=int, default=MAXZOOM)
+    build.add_argument('--export', default=None, help="Also write the tiles as <dir>/{z}/{x}/{y}.pbf")
+    serve = subparsers.add_parser('serve', help="Serve a site directory and its tiles")
+    serve.add_argument('site_dir', nargs='?', default='crime_maps')
+    serve.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_vector_tiles(args.output, minzoom=args.minzoom, maxzoom=args.maxzoom)
+        if args.export:
+            export_tile_directory(args.output, args.export)
+    else:
+        serve_tiles(args.site_dir, port=args.port)